@@ -1,21 +1,42 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
-from typing import Any, Dict, List
+import time
+from contextlib import ExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 from common import INDEX  # same Index instance
-from competitor_agent import analyze_competitors, find_similar_competitors
+from competitor_agent import (analyze_competitors, find_similar_competitors,
+                              stream_competitor_report)
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from serpapi import GoogleSearch
-from services import upsert_from_url
-from utils import canonicalize_url
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from job_queue import PRIORITY_INTERACTIVE, IngestWorkers, default_queue, job_summary
+from pipeline import IngestionPipeline, IngestItem
+from report_sections import REPORT_MODE, REPORT_MODES, is_degraded
+from result_cache import IndexVersion, ResultCache, result_key
+from search_client import SEARCH
+from tracing import METRICS, PROMETHEUS_CONTENT_TYPE, REQUEST_ID, new_request_id, span
+from utils import iterate_blocking, run_blocking
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Run the ingest workers (queue mode) for as long as the app is up."""
+    if INGEST_MODE == "queue" and WORKERS.concurrency > 0:
+        WORKERS.start()
+    try:
+        yield
+    finally:
+        await WORKERS.stop()
+
+
+app = FastAPI(lifespan=_lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # set your frontend origin(s) in prod
@@ -24,28 +45,77 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-_UPSERT_LOCK = asyncio.Lock()
-_SEEN_HOSTS: set[str] = set()  # per-process guard to avoid duplicates in one run
+# Shared across requests: dedups concurrent ingestion of the same company and
+# remembers hosts already ingested by this process.
+PIPELINE = IngestionPipeline(INDEX)
+
+# "queue" (default): requests enqueue new candidates on the durable job queue
+# and answer from what is already indexed; INGEST_WORKERS background workers
+# per process drain the queue. "inline": ingest inside the request as before.
+INGEST_MODE = os.getenv("INGEST_MODE", "queue")
+JOB_QUEUE = default_queue()
+WORKERS = IngestWorkers(
+    JOB_QUEUE, PIPELINE, concurrency=int(os.getenv("INGEST_WORKERS", "2"))
+)
+
+# Reports with failed sections are only kept briefly, so the next request retries them.
+DEGRADED_RESULT_TTL = float(os.getenv("RESULT_CACHE_DEGRADED_TTL", "60"))
+
+
+def _result_ttl(result: Dict[str, Any]) -> Optional[float]:
+    return DEGRADED_RESULT_TTL if is_degraded(result["report"]) else None
+
+
+# Full search-and-analyze results, keyed on the request and the index version
+RESULT_CACHE = ResultCache(
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "900")),
+    stale_ttl=float(os.getenv("RESULT_CACHE_STALE_TTL", "3600")),
+    ttl_for=_result_ttl,
+)
+INDEX_VERSION = IndexVersion(INDEX)
+
+
+@app.middleware("http")
+async def _trace_request(request: Request, call_next: Any) -> Response:
+    """
+    Tag everything a request does with its ID (honours an incoming
+    X-Request-ID). The request span ends when the response body has been
+    sent, so streamed responses are timed in full.
+    """
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = REQUEST_ID.set(request_id)
+    try:
+        with ExitStack() as stack:
+            current = stack.enter_context(span("request", method=request.method))
+            response = await call_next(request)
+            route = request.scope.get("route")
+            current.set(route=getattr(route, "path", request.url.path),
+                        http_status=response.status_code)
+            # From here on the span belongs to the body; a failure above still ends it.
+            response.body_iterator = _end_span_after(response.body_iterator, stack.pop_all())
+    finally:
+        REQUEST_ID.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+async def _end_span_after(body: AsyncIterator[bytes], spans: ExitStack) -> AsyncIterator[bytes]:
+    """Pass ``body`` through, then close ``spans`` (as cancelled if the client left)."""
+    with spans:
+        async for chunk in body:
+            yield chunk
 
 
 def find_competitor_websites(query: str, num_results: int = 10) -> List[Dict[str, Any]]:
-    """SerpAPI Google search to get organic results."""
-    params = {
-        "engine": "google",
-        "q": query,
-        "num": num_results,
-        "api_key": os.getenv("SERPAPI_KEY"),
-    }
-    search = GoogleSearch(params)
-    results = search.get_dict()
-    return results.get("organic_results", []) or []
+    """SerpAPI Google search to get organic results (cached, rate-limited)."""
+    return SEARCH.organic_results(query, num_results, kind="competitors")
 
 
-@app.post("/search-and-analyze")
-async def search_and_analyze(request: Request) -> Dict[str, Any]:
-    data = await request.json()
+def _parse_request(data: Dict[str, Any]) -> Tuple[str, str, int, str]:
     company_name = data.get("company_name")
     company_desc = data.get("company_description")
+    # "single", "map_reduce" or "auto" (map-reduce for larger top_k); see report_sections
+    report_mode = data.get("report_mode") or REPORT_MODE
     # Allow the frontend to control how many competitors to retrieve
     try:
         top_k = int(data.get("top_k", 10))
@@ -53,38 +123,250 @@ async def search_and_analyze(request: Request) -> Dict[str, Any]:
         top_k = 10
     # clamp to a safe range
     top_k = max(1, min(top_k, 50))
+    return company_name, company_desc, top_k, report_mode
+
 
+def _request_error(company_name: str, company_desc: str, report_mode: str) -> str:
     if not company_name or not company_desc:
-        return {"error": "Missing company_name or company_description."}
+        return "Missing company_name or company_description."
+    if report_mode not in REPORT_MODES:
+        return f"report_mode must be one of {', '.join(REPORT_MODES)}."
+    return ""
+
+
+async def _ingest_candidates(
+    organic: List[Dict[str, Any]], refresh: bool = False
+) -> Dict[str, Any]:
+    """
+    Queue (or, in inline mode, upsert) search results, deduped per company ID.
+    With ``refresh``, indexed sites past the freshness window are re-crawled.
+    Returns a summary for the response.
+    """
+    items = [
+        IngestItem(
+            url=r["link"],
+            snippet=r.get("snippet", ""),
+            extra_metadata={"source": "serpapi", "rank": i},
+            refresh=refresh,
+        )
+        for i, r in enumerate(organic)
+        if r.get("link")
+    ]
+    if INGEST_MODE == "inline":
+        return (await PIPELINE.ingest_many(items)).summary()
+    job_ids = await run_blocking(
+        JOB_QUEUE.enqueue_many, items, priority=PRIORITY_INTERACTIVE
+    )
+    return job_summary(await run_blocking(JOB_QUEUE.get_many, job_ids))
+
+
+def _event(event: str, **fields: Any) -> bytes:
+    return (json.dumps({"event": event, **fields}) + "\n").encode("utf-8")
+
+
+def _ignore(_: bytes) -> None:
+    pass
+
+
+async def _stream_report(
+    company_name: str, company_desc: str, matches: List[Dict[str, Any]], report_mode: str,
+    emit: Callable[[bytes], None],
+) -> str:
+    # Context building (or the map-reduce sections) runs before the first token.
+    report = stream_competitor_report(company_name, matches, company_desc, report_mode)
+    parts: List[str] = []
+    deltas = iterate_blocking(report)
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            emit(_event("token", text=delta))
+    finally:
+        # On failure or cancellation this closes the report generator and the OpenAI stream.
+        await deltas.aclose()
+    return "".join(parts)
+
+
+async def _analyze(
+    company_name: str, company_desc: str, top_k: int, report_mode: str,
+    refresh: bool = False, *, emit: Optional[Callable[[bytes], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Search, ingest, retrieve and report. With ``emit``, NDJSON progress
+    events and report tokens are passed to it as they happen.
+    """
+    send = emit or _ignore
+    timings: Dict[str, float] = {}
+    clock = time.perf_counter()
+
+    def lap(stage: str, **fields: Any) -> None:
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = round(now - clock, 4)
+        clock = now
+        send(_event("progress", stage=stage, status="done", **fields))
 
     # 1) Find candidate sites
-    organic = find_competitor_websites("top donor advised fund providers", 10)
-
-    # 2) Upsert (idempotent) with a lock + seen set (per-process)
-    async with _UPSERT_LOCK:
-        for i, r in enumerate(organic):
-            url = r.get("link")
-            snippet = r.get("snippet", "")
-            if not url:
-                continue
-            host = canonicalize_url(url)
-            if host in _SEEN_HOSTS:
-                continue
-            _SEEN_HOSTS.add(host)
-
-            upsert_from_url(
-                index=INDEX,
-                url=url,
-                snippet=snippet,
-                extra_metadata={"source": "serpapi", "rank": i},
-            )
+    send(_event("progress", stage="search", status="started"))
+    organic = await run_blocking(
+        find_competitor_websites, "top donor advised fund providers", 10
+    )
+    lap("search", results=len(organic))
+
+    # 2) Queue (or upsert) new candidates
+    send(_event("progress", stage="ingest", status="started"))
+    ingest = await _ingest_candidates(organic, refresh)
+    lap("ingest", **ingest)
 
     # 3) Retrieve similar
-    matches = find_similar_competitors(company_desc, top_k=top_k)
+    send(_event("progress", stage="retrieve", status="started"))
+    matches = await run_blocking(find_similar_competitors, company_desc, top_k=top_k)
+    lap("retrieve", matches=len(matches))
 
     # 4) Analyze with LLM
-    report = analyze_competitors(company_name, matches)
+    send(_event("progress", stage="report", status="started"))
+    if emit is None:
+        report = await run_blocking(
+            analyze_competitors, company_name, matches, company_desc, report_mode
+        )
+    else:
+        report = await _stream_report(company_name, company_desc, matches, report_mode, emit)
+    lap("report")
 
     return {
         "report": report,
+        "ingest": ingest,
+        "timings": timings,
     }
+
+
+async def _store_result(
+    company_name: str, company_desc: str, top_k: int, report_mode: str,
+    result: Dict[str, Any],
+) -> None:
+    """Cache a result under the index version it ended up being computed against."""
+    counts = result["ingest"]["counts"]
+    if counts.get("upserted") or counts.get("unchanged"):
+        # The pipeline bumped the index generation.
+        INDEX_VERSION.invalidate()
+    version = await INDEX_VERSION.get()
+    RESULT_CACHE.put(
+        result_key(company_name, company_desc, top_k, version, report_mode), result
+    )
+
+
+async def _cached_analysis(
+    company_name: str, company_desc: str, top_k: int, report_mode: str,
+    refresh: bool = False, *, emit: Optional[Callable[[bytes], None]] = None,
+) -> Tuple[Dict[str, Any], str]:
+    """
+    The result for a request and its cache status (hit, stale, miss, shared
+    or refresh). ``emit`` only hears from a computation the caller waits for.
+    """
+    async def compute(refresh: bool = False) -> Dict[str, Any]:
+        result = await _analyze(
+            company_name, company_desc, top_k, report_mode, refresh, emit=emit
+        )
+        await _store_result(company_name, company_desc, top_k, report_mode, result)
+        return result
+
+    if refresh:
+        # Bypass the result cache and re-crawl candidates past the freshness window.
+        return await compute(refresh=True), "refresh"
+    key = result_key(
+        company_name, company_desc, top_k, await INDEX_VERSION.get(), report_mode
+    )
+    if RESULT_CACHE.peek(key) is not None:
+        # A stale hit is refreshed in the background, after the caller is served.
+        emit = None
+    return await RESULT_CACHE.get_or_compute(key, compute)
+
+
+@app.post("/search-and-analyze")
+async def search_and_analyze(request: Request) -> Dict[str, Any]:
+    data = await request.json()
+    company_name, company_desc, top_k, report_mode = _parse_request(data)
+    error = _request_error(company_name, company_desc, report_mode)
+    if error:
+        return {"error": error}
+
+    result, status = await _cached_analysis(
+        company_name, company_desc, top_k, report_mode, bool(data.get("refresh"))
+    )
+    return {**result, "cache": status}
+
+
+async def _stream_events(
+    company_name: str, company_desc: str, top_k: int, report_mode: str,
+    refresh: bool = False,
+) -> AsyncIterator[bytes]:
+    """Same steps as /search-and-analyze, emitted as NDJSON progress and token events."""
+    events: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+    task = asyncio.ensure_future(_cached_analysis(
+        company_name, company_desc, top_k, report_mode, refresh, emit=events.put_nowait
+    ))
+    task.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        event = await events.get()
+        while event is not None:
+            yield event
+            event = await events.get()
+        result, status = task.result()
+        if status not in ("miss", "refresh"):
+            # Someone else's computation: send the whole report at once.
+            yield _event("progress", stage="cache", status=status)
+            yield _event("token", text=result["report"])
+        yield _event("done")
+    except Exception as exc:  # pylint: disable=broad-except
+        # Headers are already sent, so surface failures in-band instead of a 500.
+        print(f"Streaming report failed: {exc}")
+        yield _event("error", message=str(exc))
+    finally:
+        # A computation that has started keeps running (shielded) and is cached.
+        task.cancel()
+
+
+@app.post("/search-and-analyze/stream")
+async def search_and_analyze_stream(request: Request) -> StreamingResponse:
+    """
+    Streaming variant of /search-and-analyze (NDJSON, one event per line):
+    progress events for search/ingest/retrieve, then report tokens as they
+    arrive, then a final "done" (or "error") event. A cached report is sent
+    as a single token event.
+    """
+    data = await request.json()
+    company_name, company_desc, top_k, report_mode = _parse_request(data)
+    error = _request_error(company_name, company_desc, report_mode)
+    if error:
+        return StreamingResponse(
+            iter([_event("error", message=error)]),
+            media_type="application/x-ndjson",
+        )
+    return StreamingResponse(
+        _stream_events(
+            company_name, company_desc, top_k, report_mode, bool(data.get("refresh"))
+        ),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/jobs")
+async def job_counts() -> Dict[str, Any]:
+    """Number of ingestion jobs per status."""
+    return {"mode": INGEST_MODE, "counts": await run_blocking(JOB_QUEUE.counts)}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: int) -> Dict[str, Any]:
+    """Status of one ingestion job (IDs are returned under "ingest" by the search endpoints)."""
+    job = await run_blocking(JOB_QUEUE.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    job.pop("lease", None)  # only for the worker holding it
+    return job
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Prometheus metrics of this process: stage spans, dependencies, caches, LLM tokens."""
+    return PlainTextResponse(METRICS.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,179 @@
+"""
+Compare the full-description report prompt against the token-budgeted
+passage context (context_builder) for several ``top_k`` values.
+
+Builds a synthetic corpus in a temporary LocalIndex: each company gets a
+~5000-char site text made of shared industry boilerplate plus a few
+company-specific facts, stored as a company vector and passage vectors the
+same way the ingestion pipeline does. Reports prompt tokens, coverage
+(matched companies, and their key facts, present in the prompt), context
+build time and end-to-end latency against fakes.FakeChatCompletions, whose
+time to first token grows with prompt size. From the backend folder:
+
+    python -m benchmarks.context --companies 60 --top-k 5 10 25 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from chunking import chunk_text, count_tokens
+from context_builder import CONTEXT_TOKEN_BUDGET, build_competitor_context, format_context
+from fakes import FakeChatCompletions, fake_embedding
+from vector_store import LocalIndex
+
+QUERY = (
+    "Donor advised fund sponsor offering an intuitive donor portal, a mobile app, "
+    "low account minimums and grant recommendations to charities."
+)
+
+BOILERPLATE = [
+    "We are committed to making charitable giving simple and impactful.",
+    "Our team of philanthropic specialists is here to help you every step of the way.",
+    "Giving is a powerful way to support the causes you care about most.",
+    "Contributions may be eligible for an immediate tax deduction.",
+    "Please consult your tax advisor regarding your specific situation.",
+    "Investment returns are not guaranteed and may lose value.",
+    "Join thousands of donors who trust us with their charitable dollars.",
+    "Learn more about our history, leadership and governance.",
+    "Read our latest annual report and giving trends research.",
+    "Sign up for our newsletter to receive updates and giving tips.",
+]
+
+FACTS = [
+    "{name} offers a donor portal with one-click grant recommendations to charities.",
+    "{name} has a mobile app for iOS and Android to track contributions and grants.",
+    "{name} requires an initial contribution of ${minimum} to open a donor advised fund.",
+    "{name} charges an annual administrative fee of {fee}% on fund balances.",
+    "{name} accepts gifts of stock, crypto and private business interests.",
+]
+
+
+def _site_text(name: str, rng: random.Random, chars: int = 5000) -> str:
+    facts = [
+        fact.format(name=name, minimum=rng.choice([0, 500, 5000, 25000]),
+                    fee=rng.choice(["0.6", "0.85", "1.0"]))
+        for fact in rng.sample(FACTS, 3)
+    ]
+    sentences: List[str] = []
+    while sum(len(s) + 1 for s in sentences) < chars:
+        sentences.append(rng.choice(BOILERPLATE))
+    for fact in facts:
+        sentences.insert(rng.randrange(len(sentences) // 2), fact)
+    return " ".join(sentences)[:chars]
+
+
+def _build_corpus(index: LocalIndex, companies: int, seed: int) -> Dict[str, List[str]]:
+    """Store companies as the pipeline does; returns the key facts per company ID."""
+    rng = random.Random(seed)
+    facts: Dict[str, List[str]] = {}
+    vectors: List[Dict[str, Any]] = []
+    for c in range(companies):
+        cid, name = f"site::{c}", f"Fund {c}"
+        content = _site_text(name, rng)
+        facts[cid] = [s for s in content.split(". ") if s.startswith(name)]
+        passages = chunk_text(content)
+        for i, passage in enumerate(passages):
+            vectors.append({
+                "id": f"{cid}#p{i}",
+                "values": fake_embedding(passage),
+                "metadata": {"kind": "passage", "parent_id": cid, "name": name,
+                             "url": f"https://fund{c}.example", "position": i,
+                             "text": passage},
+            })
+        vectors.append({
+            "id": cid,
+            "values": fake_embedding(content),
+            "metadata": {"kind": "site", "name": name, "url": f"https://fund{c}.example",
+                         "description": content, "passages": len(passages)},
+        })
+    index.upsert(vectors=vectors)
+    return facts
+
+
+def _messages(context: str) -> List[Dict[str, str]]:
+    # Same shape as competitor_agent.build_report_messages (fixed text trimmed).
+    return [
+        {"role": "system", "content": "You are a precise SaaS market research assistant."},
+        {"role": "user", "content": f"Analyze competitors in detail.\n\n{context}"},
+    ]
+
+
+def _coverage(context: str, matches: List[Dict[str, Any]],
+              facts: Dict[str, List[str]]) -> Tuple[float, float]:
+    companies = sum(f"{m['metadata']['name']}:" in context for m in matches)
+    wanted = [fact for m in matches for fact in facts[m["id"]]]
+    found = sum(fact[:60] in context for fact in wanted)
+    return companies / max(1, len(matches)), found / max(1, len(wanted))
+
+
+def _measure(
+    llm: FakeChatCompletions, index: LocalIndex, matches: List[Dict[str, Any]],
+    facts: Dict[str, List[str]], *, mode: str, budget: int,
+) -> Dict[str, Any]:
+    """Build one context ("legacy" or "budgeted"), send it, and score what it kept."""
+    start = time.perf_counter()
+    if mode == "legacy":
+        entries = [(m["metadata"]["name"], m["metadata"]["description"]) for m in matches]
+    else:
+        entries = build_competitor_context(
+            index, fake_embedding(QUERY), matches, token_budget=budget
+        )
+    context = format_context(entries)
+    built = time.perf_counter() - start
+    messages = _messages(context)
+    llm.create(model="gpt-5", messages=messages)
+    total = time.perf_counter() - start
+
+    company_cov, fact_cov = _coverage(context, matches, facts)
+    return {
+        "prompt_tokens": sum(count_tokens(m["content"]) for m in messages),
+        "company_coverage": round(company_cov, 3),
+        "fact_coverage": round(fact_cov, 3),
+        "context_ms": round(built * 1000, 2),
+        "end_to_end_s": round(total, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--companies", type=int, default=60)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 25, 50])
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--output-tokens", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    llm = FakeChatCompletions(latency=0.3, output_tokens=args.output_tokens)
+    query_vec = fake_embedding(QUERY)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalIndex(tmp, dim=len(query_vec))
+        facts = _build_corpus(index, args.companies, args.seed)
+        for top_k in args.top_k:
+            matches = index.query(
+                vector=query_vec, top_k=top_k, include_metadata=True,
+                filter={"kind": {"$ne": "passage"}},
+            )["matches"]
+            for mode in ("legacy", "budgeted"):
+                rows.append({"top_k": top_k, "mode": mode, **_measure(
+                    llm, index, matches, facts, mode=mode, budget=args.budget
+                )})
+
+    for row in rows:
+        print(json.dumps(row))
+    print()
+    for top_k in args.top_k:
+        legacy, budgeted = (r for r in rows if r["top_k"] == top_k)
+        print(f"top_k={top_k:3d}: prompt {legacy['prompt_tokens']:6d} -> "
+              f"{budgeted['prompt_tokens']:5d} tokens "
+              f"({legacy['prompt_tokens'] / budgeted['prompt_tokens']:.1f}x smaller), "
+              f"latency {legacy['end_to_end_s']:.2f}s -> {budgeted['end_to_end_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Landing-page-only scraping vs the multi-page SiteCrawler.
+
+Serves synthetic DAF-provider sites from a local HTTP server, one per
+loopback address (127.0.0.2, 127.0.0.3, ...), each with a short landing
+page, about/fees/mobile-app pages, a blog, robots.txt and a sitemap. Reports
+text collected per site, how many sites would still need the SerpAPI
+enrichment fallback (under MIN_CONTENT_CHARS), pages fetched and crawl time.
+From the backend folder:
+
+    python -m benchmarks.crawl --sites 20 --latency 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from crawler import SiteCrawler
+from disk_cache import DiskCache
+from http_client import Fetcher
+
+# Same threshold as embed_and_store.MIN_CONTENT_CHARS (not imported: it needs API keys).
+MIN_CONTENT_CHARS = 500
+
+PAGES = {
+    "/about/": "{name} is an independent public charity sponsoring donor advised funds. "
+               "Founded in {year}, it serves {donors} donors across the country.",
+    "/fees/": "Opening a {name} account takes an initial contribution of ${minimum}. "
+              "The annual administrative fee is {fee}% of assets, lower above $500,000.",
+    "/mobile-app/": "The {name} mobile app for iOS and Android shows balances, "
+                    "contribution history and lets donors recommend grants anywhere.",
+    "/donor-portal/": "The {name} donor portal supports one-click grant recommendations, "
+                      "recurring grants, successor planning and advisor access.",
+    "/blog/giving-tuesday/": "Ten tips for giving this season.",
+}
+
+
+def _site_page(site: int, path: str) -> str:
+    name = f"Fund {site}"
+    if path == "/":
+        links = "".join(f'<a href="{p}">{p.strip("/").replace("-", " ")}</a>' for p in PAGES)
+        return (f"<html><body><nav>{links}</nav><h1>{name}</h1>"
+                f"<p>Give smarter with {name}.</p></body></html>")
+    if path == "/robots.txt":
+        return "User-agent: *\nDisallow: /admin/\n"
+    if path == "/sitemap.xml":
+        locs = "".join(f"<url><loc>http://127.0.0.{site + 2}:{{port}}{p}</loc></url>"
+                       for p in PAGES)
+        return f'<?xml version="1.0"?><urlset>{locs}</urlset>'
+    template = PAGES.get(path)
+    if template is None:
+        return ""
+    text = template.format(name=name, year=1990 + site % 30, donors=1000 * (site + 1),
+                           minimum=[0, 500, 5000][site % 3], fee=["0.6", "1.0"][site % 2])
+    filler = " ".join(f"{name} detail {i} about programs and services." for i in range(8))
+    return f"<html><body><h2>{path}</h2><p>{text} {filler}</p></body></html>"
+
+
+def _serve(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 (http.server API)
+            time.sleep(latency)
+            host = self.headers.get("Host", "127.0.0.2").split(":")[0]
+            site = int(host.rsplit(".", 1)[-1]) - 2
+            body = _site_page(site, self.path).replace("{port}", str(server.server_port))
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, *_: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _run(crawler: SiteCrawler, urls: List[str]) -> Dict[str, float]:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(crawler.crawl(url) for url in urls))
+    elapsed = time.perf_counter() - start
+    chars = [len(r.text) for r in results]
+    return {
+        "mean_chars": round(statistics.mean(chars)),
+        "need_enrichment": sum(c < MIN_CONTENT_CHARS for c in chars),
+        "pages_fetched": sum(len(r.pages) for r in results),
+        "wall_s": round(elapsed, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--max-pages", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = _serve(args.latency)
+    urls = [f"http://127.0.0.{i + 2}:{server.server_port}/" for i in range(args.sites)]
+    try:
+        for label, max_pages in (("landing-only", 1), ("crawl", args.max_pages)):
+            with tempfile.TemporaryDirectory() as tmp:
+                fetcher = Fetcher(cache=DiskCache(f"{tmp}/http.sqlite3"))
+                crawler = SiteCrawler(fetcher, max_pages=max_pages)
+                stats = asyncio.run(_run(crawler, urls))
+            print(f"{label:13s} " + " ".join(f"{k}={v}" for k, v in stats.items()))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare one-request-per-text embedding against the EmbeddingBatcher.
+
+Runs offline against fakes.FakeOpenAI. From the backend folder:
+
+    python -m benchmarks.embeddings --callers 32 --texts 20
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from embedding_batcher import EmbeddingBatcher
+from fakes import FakeOpenAI
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _drive(embed: Callable[[str], list], callers: int, texts: int) -> Dict[str, float]:
+    latencies: List[float] = []
+
+    def caller(worker: int) -> None:
+        for i in range(texts):
+            start = time.perf_counter()
+            embed(f"caller {worker} text {i} about donor advised funds")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(caller, range(callers)))
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 3),
+        "texts_per_sec": round(callers * texts / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--callers", type=int, default=32)
+    parser.add_argument("--texts", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-wait", type=float, default=0.02)
+    args = parser.parse_args()
+
+    direct = FakeOpenAI(latency=args.latency)
+
+    def embed_direct(text: str) -> list:
+        return direct.embeddings.create(model="fake", input=[text]).data[0].embedding
+
+    stats = _drive(embed_direct, args.callers, args.texts)
+    print(f"direct : {stats} round_trips={direct.embeddings.calls}")
+
+    batched = FakeOpenAI(latency=args.latency)
+    batcher = EmbeddingBatcher(batched, max_wait=args.max_wait)
+    stats = _drive(batcher.embed, args.callers, args.texts)
+    print(f"batched: {stats} round_trips={batched.embeddings.calls}")
+
+
+if __name__ == "__main__":
+    main()
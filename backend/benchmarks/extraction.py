@@ -0,0 +1,80 @@
+"""
+Compare HTML extractors on the saved fixtures in benchmarks/fixtures/html.
+
+Throughput is pages/sec and MB/sec of HTML; quality is the share of
+expected content phrases that made it into the output (recall) and the
+share of boilerplate phrases that leaked in (leak). From the backend folder:
+
+    python -m benchmarks.extraction --repeat 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+from extractors import EXTRACTORS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+
+
+def load_fixtures() -> Tuple[List[Tuple[str, str]], Dict[str, Dict[str, List[str]]]]:
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    pages = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+                pages.append((name, f.read()))
+    return pages, expected
+
+
+def _ratio(phrases: List[str], text: str) -> float:
+    if not phrases:
+        return 0.0
+    return sum(phrase in text for phrase in phrases) / len(phrases)
+
+
+def _quality(
+    extract: Callable[[str, int], str], pages: List[Tuple[str, str]],
+    expected: Dict[str, Dict[str, List[str]]], max_chars: int,
+) -> Tuple[float, float]:
+    """Mean recall of must_include phrases and leak of must_exclude phrases."""
+    recall, leak = [], []
+    for page, html in pages:
+        text = extract(html, max_chars)
+        phrases = expected.get(page, {})
+        recall.append(_ratio(phrases.get("must_include", []), text))
+        leak.append(_ratio(phrases.get("must_exclude", []), text))
+    return sum(recall) / len(recall), sum(leak) / len(leak)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-chars", type=int, default=5000)
+    args = parser.parse_args()
+
+    pages, expected = load_fixtures()
+    total_bytes = sum(len(html.encode("utf-8")) for _, html in pages)
+
+    for name, extract in EXTRACTORS.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for _, html in pages:
+                extract(html, args.max_chars)
+        elapsed = time.perf_counter() - start
+
+        recall, leak = _quality(extract, pages, expected, args.max_chars)
+        runs = args.repeat * len(pages)
+        print(
+            f"{name:10s} pages/s={runs / elapsed:8.1f} "
+            f"MB/s={total_bytes * args.repeat / elapsed / 1e6:6.2f} "
+            f"recall={recall:.2f} leak={leak:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
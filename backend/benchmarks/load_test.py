@@ -0,0 +1,239 @@
+"""
+End-to-end load test of ``POST /search-and-analyze`` against local stand-ins.
+
+Starts the OpenAI / Pinecone / SerpAPI / site stand-ins (benchmarks.stand_ins),
+runs the API under uvicorn in a subprocess pointed at them, warms it up
+(and waits for queued ingestion to drain), then sends ``--requests``
+requests at ``--concurrency``. Prints and saves a JSON summary: latency
+percentiles, throughput, cache statuses, per-stage timings (``ingest.*``
+stages are summed over the sites in a request's batch) and stand-in call
+counts. ``--compare`` prints the change against an earlier run.
+From the backend folder:
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 \\
+        --output bench-results/after.json --compare bench-results/before.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from benchmarks.stand_ins import StandIns
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _distribution(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    return {
+        "p50": round(_percentile(samples, 50), 4),
+        "p95": round(_percentile(samples, 95), 4),
+        "p99": round(_percentile(samples, 99), 4),
+        "mean": round(statistics.mean(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def _start_app(env: Dict[str, str], port: int, workers: int) -> subprocess.Popen:
+    # The caller terminates it once the load run is over.
+    proc = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited with code {proc.returncode}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/jobs", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API did not start within 60s")
+
+
+def _wait_for_jobs(base_url: str, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = requests.get(f"{base_url}/jobs", timeout=10).json().get("counts", {})
+        if not counts.get("queued") and not counts.get("running"):
+            return
+        time.sleep(0.5)
+    print("Ingestion jobs still pending; measuring anyway", file=sys.stderr)
+
+
+def _payload(i: int, distinct: int, top_k: int) -> Dict[str, Any]:
+    variant = i % distinct if distinct else i
+    return {
+        "company_name": "Vanguard Charitable",
+        "company_description": (
+            "Donor advised fund sponsor with low minimums, an online donor portal, "
+            f"a mobile app and grant recommendations (variant {variant})."
+        ),
+        "top_k": top_k,
+    }
+
+
+def _drive(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+
+    def one(i: int) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            resp = session.post(
+                f"{base_url}/search-and-analyze",
+                json=_payload(i, args.distinct, args.top_k),
+                timeout=args.timeout,
+            )
+            body = resp.json()
+            ok = resp.ok and "error" not in body
+        except (requests.RequestException, ValueError) as exc:
+            body, ok = {"error": str(exc)}, False
+        return {"latency": time.perf_counter() - start, "ok": ok, "body": body}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        samples = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = [s for s in samples if s["ok"]]
+    errors = [s["body"].get("error") for s in samples if not s["ok"]]
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_s": _distribution([s["latency"] for s in ok]),
+        **_breakdown([s["body"] for s in ok]),
+    }
+
+
+def _breakdown(bodies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cache statuses and per-stage timing distributions of successful responses."""
+    cache: Dict[str, int] = {}
+    stages: Dict[str, List[float]] = {}
+    for body in bodies:
+        cache[body.get("cache", "?")] = cache.get(body.get("cache", "?"), 0) + 1
+        if body.get("cache") in ("hit", "stale", "shared"):
+            continue  # stage timings belong to the request that computed the result
+        for stage, seconds in (body.get("timings") or {}).items():
+            stages.setdefault(stage, []).append(seconds)
+        for stage, seconds in ((body.get("ingest") or {}).get("timings") or {}).items():
+            stages.setdefault(f"ingest.{stage}", []).append(seconds)
+    return {
+        "cache": cache,
+        "stages_s": {stage: _distribution(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def _compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    def change(new: Optional[float], old: Optional[float]) -> str:
+        if not old or new is None:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    rows = [("throughput_rps", current["throughput_rps"], baseline.get("throughput_rps"))]
+    for pct in ("p50", "p95", "p99"):
+        rows.append((f"latency {pct}", current["latency_s"].get(pct),
+                     baseline.get("latency_s", {}).get(pct)))
+    for stage, dist in current["stages_s"].items():
+        rows.append((f"{stage} p50", dist.get("p50"),
+                     baseline.get("stages_s", {}).get(stage, {}).get("p50")))
+    print("\nvs baseline:")
+    for label, new, old in rows:
+        print(f"  {label:28s} {old!s:>10} -> {new!s:>10}  {change(new, old)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="distinct request bodies (0 = all distinct, no result-cache hits)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--ingest-mode", choices=("queue", "inline"), default="queue")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.5)
+    parser.add_argument("--chat-token-latency", type=float, default=0.002)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--pinecone-latency", type=float, default=0.02)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--site-latency", type=float, default=0.1)
+    parser.add_argument("--output", default=os.path.join("bench-results", "load_test.json"))
+    parser.add_argument("--compare", help="earlier --output file to diff against")
+    args = parser.parse_args()
+
+    with StandIns(
+        embed_latency=args.embed_latency, chat_latency=args.chat_latency,
+        chat_token_latency=args.chat_token_latency, output_tokens=args.output_tokens,
+        pinecone_latency=args.pinecone_latency, search_latency=args.search_latency,
+        site_latency=args.site_latency,
+    ) as stand_ins:
+        port = _free_port()
+        env = {**stand_ins.env(), "INGEST_MODE": args.ingest_mode}
+        app = _start_app(env, port, args.workers)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for i in range(args.warmup):
+                requests.post(f"{base_url}/search-and-analyze",
+                              json=_payload(-1 - i, 0, args.top_k), timeout=args.timeout)
+            if args.ingest_mode == "queue":
+                _wait_for_jobs(base_url)
+            before = stand_ins.counters()
+            result = _drive(base_url, args)
+            after = stand_ins.counters()
+        finally:
+            app.terminate()
+            app.wait(timeout=30)
+
+    summary = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **result,
+        "upstream_calls": {k: count - before[k] for k, count in after.items()},
+    }
+    print(json.dumps(summary, indent=2))
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Saved {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            _compare(summary, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
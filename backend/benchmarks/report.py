@@ -0,0 +1,128 @@
+"""
+Single-call report vs map-reduce report (report_sections) for several
+``top_k`` values.
+
+Uses a fakes.FakeChatCompletions-based model whose output grows with the
+number of competitors it is asked to cover (``--tokens-per-competitor``
+each; the reduce call writes one ranking line per competitor plus a short
+overview). Map-reduce is timed cold (empty section cache), warm (every
+section cached, only the reduce call runs) and with one competitor's
+content changed. From the backend folder:
+
+    python -m benchmarks.report --top-k 5 10 25 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+from disk_cache import DiskCache
+from fakes import FakeChatCompletions
+from report_sections import (REPORT_CRITERIA, SECTION_CONCURRENCY, SYSTEM_MESSAGE,
+                             SectionedReporter)
+
+WORDS = ("donor", "advised", "fund", "grant", "portal", "mobile", "fees", "charity",
+         "minimum", "investment", "advisor", "giving", "account", "app", "support")
+
+
+class _ReportModel:
+    """``openai.OpenAI`` stand-in whose completion length follows the competitors covered."""
+
+    def __init__(self, names: List[str], latency: float, token_latency: float,
+                 tokens_per_competitor: int) -> None:
+        self.names = names
+        self.latency = latency
+        self.token_latency = token_latency
+        self.tokens_per_competitor = tokens_per_competitor
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        prompt = messages[-1]["content"]
+        covered = max(1, sum(f"{name}:" in prompt for name in self.names))
+        if "executive overview" in prompt:
+            output = 100 + 20 * covered
+        else:
+            output = self.tokens_per_competitor * covered
+        with self._lock:
+            self.calls += 1
+        llm = FakeChatCompletions(latency=self.latency, token_latency=self.token_latency,
+                                  output_tokens=output)
+        return llm.create(model=model, messages=messages, **kwargs)
+
+
+def _entries(count: int, seed: int) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    return [
+        (f"Fund {i}", " ".join(rng.choice(WORDS) for _ in range(900)))
+        for i in range(count)
+    ]
+
+
+def _single(client: _ReportModel, entries: List[Tuple[str, str]]) -> str:
+    # Same shape as competitor_agent.build_report_messages.
+    criteria = "".join(f"- {item}\n" for item in REPORT_CRITERIA)
+    context = "\n\n".join(f"{name}: {text}" for name, text in entries)
+    resp = client.chat.completions.create(model="gpt-5", messages=[
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": f"Analyze competitors in detail.\n{criteria}\n{context}"},
+    ])
+    return resp.choices[0].message.content
+
+
+def _timed(fn: Any, *args: Any) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return round(time.perf_counter() - start, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 25, 50])
+    parser.add_argument("--concurrency", type=int, default=SECTION_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.0005)
+    parser.add_argument("--tokens-per-competitor", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    for top_k in args.top_k:
+        entries = _entries(top_k, args.seed)
+        client = _ReportModel([name for name, _ in entries], args.latency,
+                              args.token_latency, args.tokens_per_competitor)
+        with tempfile.TemporaryDirectory() as tmp:
+            reporter = SectionedReporter(client, model="gpt-5",
+                                         cache=DiskCache(f"{tmp}/sections.sqlite3"),
+                                         concurrency=args.concurrency)
+            changed = entries[:-1] + [(entries[-1][0], "New fees. " + entries[-1][1])]
+            row = {
+                "top_k": top_k,
+                "single_s": _timed(_single, client, entries),
+                "map_reduce_cold_s": _timed(reporter.report, "Vanguard Charitable", entries),
+            }
+            calls = client.calls
+            row["map_reduce_warm_s"] = _timed(reporter.report, "Vanguard Charitable", entries)
+            row["warm_llm_calls"] = client.calls - calls
+            calls = client.calls
+            row["one_changed_s"] = _timed(reporter.report, "Vanguard Charitable", changed)
+            row["one_changed_llm_calls"] = client.calls - calls
+        rows.append(row)
+        print(json.dumps(row))
+
+    print()
+    for row in rows:
+        print(f"top_k={row['top_k']:3d}: single {row['single_s']:6.2f}s, map-reduce "
+              f"cold {row['map_reduce_cold_s']:5.2f}s / warm {row['map_reduce_warm_s']:5.2f}s "
+              f"/ one changed {row['one_changed_s']:5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
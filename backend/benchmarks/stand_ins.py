@@ -0,0 +1,288 @@
+"""
+Local HTTP stand-ins for the backend's external services.
+
+* OpenAI: ``POST /v1/embeddings`` and ``POST /v1/chat/completions``
+  (JSON or SSE streaming), with latency from fakes.FakeEmbeddings /
+  fakes.FakeChatCompletions. Point the app at it with OPENAI_BASE_URL.
+* Pinecone: the data-plane REST API (upsert, fetch, query, update, delete,
+  describe_index_stats) backed by a LocalIndex. Use PINECONE_HOST.
+* SerpAPI: ``GET /search.json`` via fakes.FakeSearch. Use SERPAPI_BASE_URL.
+* Sites: serves the HTML fixtures as competitor landing pages, one site per
+  loopback address (127.0.0.N picks fixture N), so search results map to
+  distinct company IDs. It listens on all interfaces to receive them.
+
+Every server adds a configurable per-request latency.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Type
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from fakes import FakeChatCompletions, FakeEmbeddings, FakeSearch
+from vector_store import LocalIndex
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    def log_message(self, *_: Any) -> None:
+        pass
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve(handler: Type[BaseHTTPRequestHandler], host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def openai_server(embeddings: FakeEmbeddings, chat: FakeChatCompletions) -> ThreadingHTTPServer:
+    class Handler(_JSONHandler):
+        def do_POST(self) -> None:  # noqa: N802 (http.server API)
+            body = self._body()
+            if self.path.endswith("/embeddings"):
+                self._embeddings(body)
+            elif self.path.endswith("/chat/completions"):
+                self._chat(body)
+            else:
+                self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+        def _embeddings(self, body: Dict[str, Any]) -> None:
+            resp = embeddings.create(model=body["model"], input=body["input"])
+            data = []
+            for item in resp.data:
+                vector: Any = item.embedding
+                if body.get("encoding_format") == "base64":
+                    raw = np.asarray(vector, dtype=np.float32).tobytes()
+                    vector = base64.b64encode(raw).decode("ascii")
+                data.append({"object": "embedding", "index": item.index, "embedding": vector})
+            texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+            tokens = sum(len(str(text)) // 4 for text in texts)
+            self._send_json({
+                "object": "list", "model": resp.model, "data": data,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+        def _chat(self, body: Dict[str, Any]) -> None:
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            model = body.get("model", "gpt-5")
+            if not body.get("stream"):
+                resp = chat.create(model=model, messages=body["messages"])
+                self._send_json({
+                    "id": completion_id, "object": "chat.completion", "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0, "finish_reason": "stop",
+                        "message": {"role": "assistant",
+                                    "content": resp.choices[0].message.content},
+                    }],
+                    "usage": vars(resp.usage),
+                })
+                return
+
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for chunk in chat.create(model=model, messages=body["messages"], stream=True):
+                payload: Dict[str, Any] = {
+                    "id": completion_id, "object": "chat.completion.chunk",
+                    "created": created, "model": model, "choices": [],
+                }
+                if chunk.choices:
+                    payload["choices"] = [{
+                        "index": 0, "finish_reason": None,
+                        "delta": {"content": chunk.choices[0].delta.content},
+                    }]
+                elif include_usage:
+                    payload["usage"] = vars(chunk.usage)
+                else:
+                    payload["choices"] = [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    return _serve(Handler)
+
+
+def pinecone_server(index: LocalIndex, latency: float = 0.0) -> ThreadingHTTPServer:
+    class Handler(_JSONHandler):
+        def do_GET(self) -> None:  # noqa: N802 (http.server API)
+            time.sleep(latency)
+            url = urlparse(self.path)
+            if url.path != "/vectors/fetch":
+                self._send_json({"message": "not found"}, 404)
+                return
+            ids = parse_qs(url.query).get("ids", [])
+            self._send_json({**index.fetch(ids=ids), "namespace": ""})
+
+        def do_POST(self) -> None:  # noqa: N802 (http.server API)
+            time.sleep(latency)
+            body = self._body()
+            if self.path == "/vectors/upsert":
+                count = index.upsert(vectors=body["vectors"])["upserted_count"]
+                self._send_json({"upsertedCount": count})
+            elif self.path == "/query":
+                result = index.query(
+                    vector=body["vector"], top_k=body.get("topK", 10),
+                    include_metadata=body.get("includeMetadata", False),
+                    include_values=body.get("includeValues", False),
+                    filter=body.get("filter"),
+                )
+                self._send_json({**result, "namespace": ""})
+            elif self.path == "/vectors/update":
+                index.update(body["id"], values=body.get("values"),
+                             set_metadata=body.get("setMetadata"))
+                self._send_json({})
+            elif self.path == "/vectors/delete":
+                index.delete(ids=body.get("ids"), delete_all=body.get("deleteAll", False),
+                             filter=body.get("filter"))
+                self._send_json({})
+            elif self.path == "/describe_index_stats":
+                stats = index.describe_index_stats()
+                self._send_json({"dimension": stats["dimension"], "namespaces": {},
+                                 "totalVectorCount": stats["total_vector_count"]})
+            else:
+                self._send_json({"message": "not found"}, 404)
+
+    return _serve(Handler)
+
+
+def serpapi_server(search: FakeSearch) -> ThreadingHTTPServer:
+    class Handler(_JSONHandler):
+        def do_GET(self) -> None:  # noqa: N802 (http.server API)
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            self._send_json(search(params))
+
+    return _serve(Handler)
+
+
+def sites_server(latency: float = 0.0, fixtures_dir: str = FIXTURES_DIR) -> ThreadingHTTPServer:
+    pages: List[bytes] = []
+    for name in sorted(os.listdir(fixtures_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(fixtures_dir, name), "rb") as f:
+                pages.append(f.read())
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *_: Any) -> None:
+            pass
+
+        def do_GET(self) -> None:  # noqa: N802 (http.server API)
+            time.sleep(latency)
+            if urlparse(self.path).path != "/":
+                self.send_error(404)
+                return
+            host = self.headers.get("Host", "127.0.0.1").split(":")[0]
+            site = int(host.rsplit(".", 1)[-1]) if host[-1].isdigit() else 0
+            body = pages[site % len(pages)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return _serve(Handler, host="0.0.0.0")
+
+
+class StandIns:
+    """
+    Start all stand-ins; ``env()`` gives the variables that point the app at
+    them. Use as a context manager to shut everything down afterwards.
+    """
+
+    def __init__(
+        self,
+        *,
+        embed_latency: float = 0.05,
+        chat_latency: float = 0.5,
+        chat_token_latency: float = 0.002,
+        output_tokens: int = 400,
+        pinecone_latency: float = 0.02,
+        search_latency: float = 0.3,
+        site_latency: float = 0.1,
+        dim: int = 1536,
+        workdir: Optional[str] = None,
+    ) -> None:
+        # A temporary workdir of our own is removed by close().
+        self._tmp = None if workdir else tempfile.mkdtemp(prefix="stand-ins-")
+        self.workdir = workdir or self._tmp
+        self.embeddings = FakeEmbeddings(latency=embed_latency, dim=dim)
+        self.chat = FakeChatCompletions(
+            latency=chat_latency, token_latency=chat_token_latency,
+            output_tokens=output_tokens,
+        )
+        self.index = LocalIndex(os.path.join(self.workdir, "pinecone"), dim=dim)
+        sites = sites_server(site_latency)
+        self.search = FakeSearch(
+            latency=search_latency,
+            link_template=f"http://127.0.0.{{position}}:{sites.server_port}/",
+        )
+        self.servers: Dict[str, ThreadingHTTPServer] = {
+            "openai": openai_server(self.embeddings, self.chat),
+            "pinecone": pinecone_server(self.index, pinecone_latency),
+            "serpapi": serpapi_server(self.search),
+            "sites": sites,
+        }
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.servers[name].server_port}"
+
+    def env(self) -> Dict[str, str]:
+        return {
+            "OPENAI_BASE_URL": self.url("openai") + "/v1",
+            "OPENAI_API_KEY": "stand-in",
+            "PINECONE_HOST": self.url("pinecone"),
+            "PINECONE_API_KEY": "stand-in",
+            "VECTOR_BACKEND": "pinecone",
+            "SERPAPI_BASE_URL": self.url("serpapi"),
+            "SERPAPI_KEY": "stand-in",
+            "CACHE_DIR": os.path.join(self.workdir, "cache"),
+            "EMBEDDING_CACHE_PATH": os.path.join(self.workdir, "cache", "embeddings.sqlite3"),
+        }
+
+    def counters(self) -> Dict[str, int]:
+        return {
+            "embedding_requests": self.embeddings.calls,
+            "embedding_inputs": self.embeddings.inputs,
+            "chat_requests": self.chat.calls,
+            "chat_prompt_tokens": self.chat.prompt_tokens,
+            "search_requests": self.search.calls,
+        }
+
+    def close(self) -> None:
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+        if self._tmp is not None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def __enter__(self) -> "StandIns":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
@@ -0,0 +1,95 @@
+"""
+Compare LocalIndex against a Pinecone-compatible stub (fakes.FakePineconeIndex,
+which adds a per-call network delay) for upsert, fetch and query.
+
+From the backend folder:
+
+    python -m benchmarks.vector_index --vectors 5000 --queries 200
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from fakes import FakePineconeIndex
+from vector_store import LocalIndex
+
+
+def _timed(fn: Callable[[], Any], runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _ms(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return f"p50={statistics.median(samples) * 1000:7.2f}ms p95={p95 * 1000:7.2f}ms"
+
+
+def _run(name: str, index: Any, vectors: List[Dict[str, Any]], queries: List[List[float]],
+         args: argparse.Namespace) -> Dict[Any, List[str]]:
+    """Time upsert, query, filtered query and fetch; returns top-k IDs for 10 queries."""
+    start = time.perf_counter()
+    for i in range(0, len(vectors), 100):
+        index.upsert(vectors=vectors[i:i + 100])
+    upsert_s = time.perf_counter() - start
+
+    it = iter(queries)
+    query = _timed(
+        lambda: index.query(vector=next(it), top_k=args.top_k, include_metadata=True),
+        args.queries // 2,
+    )
+    filtered = _timed(
+        lambda: index.query(vector=next(it), top_k=args.top_k,
+                            filter={"kind": {"$eq": "site"}}),
+        args.queries // 2,
+    )
+    fetch = _timed(lambda: index.fetch(ids=["site::1", "site::2"]), 50)
+    print(f"{name:6s} upsert={upsert_s:6.2f}s  query {_ms(query)}  "
+          f"filtered {_ms(filtered)}  fetch {_ms(fetch)}")
+    return {
+        q: [m["id"] for m in index.query(vector=q, top_k=args.top_k)["matches"]]
+        for q in map(tuple, queries[:10])
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.03)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    vectors: List[Dict[str, Any]] = [
+        {"id": f"site::{i}", "values": data[i].tolist(),
+         "metadata": {"name": f"company {i}", "kind": "site" if i % 4 else "passage"}}
+        for i in range(args.vectors)
+    ]
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32).tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "local": LocalIndex(tmp, dim=args.dim),
+            "stub": FakePineconeIndex(latency=args.latency),
+        }
+        results = {
+            name: _run(name, index, vectors, queries, args) for name, index in backends.items()
+        }
+        agree = sum(results["local"][q] == results["stub"][q] for q in results["local"])
+        print(f"top-{args.top_k} agreement on 10 queries: {agree}/10")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import functools
+import re
+from typing import Any, List, Optional
+
+# gpt-5 and the 4o family share the o200k tokenizer.
+TOKENIZER_ENCODING = "o200k_base"
+PASSAGE_TOKENS = 200
+PASSAGE_OVERLAP_TOKENS = 30
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    try:
+        import tiktoken  # pylint: disable=import-outside-toplevel
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as exc:  # pylint: disable=broad-except
+        # Missing package or the encoding file can't be downloaded (offline).
+        print(f"tiktoken unavailable, estimating token counts: {exc}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the model's tokenizer (~4 chars/token estimate without it)."""
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def _token_windows(text: str, max_tokens: int, overlap_tokens: int) -> List[str]:
+    """Consecutive ``max_tokens`` windows over ``text``, each overlapping the last."""
+    encoding = _encoding()
+    if encoding is None:
+        units: Any = text
+        size, step = max_tokens * 4, max(1, max_tokens - overlap_tokens) * 4
+    else:
+        units = encoding.encode(text, disallowed_special=())
+        size, step = max_tokens, max(1, max_tokens - overlap_tokens)
+    windows = []
+    start = 0
+    while True:
+        window = units[start:start + size]
+        windows.append(window if encoding is None else encoding.decode(window))
+        if start + size >= len(units):
+            return [window.strip() for window in windows if window.strip()]
+        start += step
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = PASSAGE_TOKENS,
+    overlap_tokens: int = PASSAGE_OVERLAP_TOKENS,
+) -> List[str]:
+    """
+    Split text into passages of about ``max_tokens`` on sentence boundaries,
+    carrying roughly ``overlap_tokens`` of trailing sentences into the next
+    passage so facts that straddle a boundary stay retrievable. A sentence
+    longer than ``max_tokens`` (typical of headings and list items run
+    together without punctuation) is split into overlapping windows, so no
+    part of the text is left out.
+    """
+    sentences: List[str] = []
+    for sentence in _SENTENCE_RE.split(" ".join(text.split())):
+        if count_tokens(sentence) > max_tokens:
+            sentences.extend(_token_windows(sentence, max_tokens, overlap_tokens))
+        elif sentence:
+            sentences.append(sentence)
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for sentence in sentences:
+        tokens = min(count_tokens(sentence), max_tokens)
+        if current and current_tokens + tokens > max_tokens:
+            passages.append(" ".join(current))
+            carried: List[str] = []
+            carried_tokens = 0
+            for prev in reversed(current[1:]):  # never carry a whole passage
+                prev_tokens = count_tokens(prev)
+                if carried_tokens + prev_tokens > overlap_tokens:
+                    break
+                carried.insert(0, prev)
+                carried_tokens += prev_tokens
+            current, current_tokens = carried, carried_tokens
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
@@ -4,18 +4,40 @@ import os
 
 import openai
 import pinecone
+from disk_cache import cache_file
 from dotenv import load_dotenv
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import DEFAULT_CACHE_PATH, EmbeddingCache
+from vector_store import LocalIndex
 
 load_dotenv()
 
-# OpenAI client (v1+)
+# OpenAI client (v1+); honours OPENAI_BASE_URL
 CLIENT = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Pinecone client (v3+)
-PC = pinecone.Pinecone(
-    api_key=os.getenv("PINECONE_API_KEY"),
-    environment=os.getenv("PINECONE_ENV"),
-)
+# Shared embedding batcher: coalesces concurrent embedding calls into one request
+# and skips the API entirely for texts already in the (memory + SQLite) cache
+EMBEDDING_CACHE = EmbeddingCache(os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH))
+EMBEDDER = EmbeddingBatcher(CLIENT, cache=EMBEDDING_CACHE)
 
 INDEX_NAME = os.getenv("PINECONE_INDEX", "index2")
-INDEX = PC.Index(INDEX_NAME)
+
+# Vector store: Pinecone by default, or VECTOR_BACKEND=local for the
+# in-process memory-mapped index (no network round trips, works offline)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+if VECTOR_BACKEND == "local":
+    PC = None
+    INDEX = LocalIndex(
+        os.getenv("LOCAL_INDEX_PATH", cache_file(f"index-{INDEX_NAME}")),
+        dim=int(os.getenv("EMBEDDING_DIM", "1536")),
+    )
+else:
+    # Pinecone client (v3+); newer clients reject the legacy environment argument
+    PINECONE_ENV = os.getenv("PINECONE_ENV")
+    PC = pinecone.Pinecone(
+        api_key=os.getenv("PINECONE_API_KEY"),
+        **({"environment": PINECONE_ENV} if PINECONE_ENV else {}),
+    )
+    # PINECONE_HOST skips the host lookup (and lets tests point at a local stand-in)
+    PINECONE_HOST = os.getenv("PINECONE_HOST")
+    INDEX = PC.Index(INDEX_NAME, host=PINECONE_HOST) if PINECONE_HOST else PC.Index(INDEX_NAME)
@@ -1,25 +1,142 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from common import CLIENT, INDEX
-from utils import fetch_company_info
+from chunking import truncate_tokens
+from common import CLIENT, EMBEDDER, INDEX
+from context_builder import CONTEXT_TOKEN_BUDGET, build_competitor_context, format_context
+from disk_cache import DiskCache, cache_file
+from report_sections import (REPORT_CRITERIA, SECTION_INPUT_TOKENS, SYSTEM_MESSAGE,
+                             SectionedReporter, stream_deltas, use_map_reduce)
+from tracing import record_llm_usage, span
+from utils import fetch_many_company_info
+
+REPORT_MODEL = "gpt-5"
+
+# Map-reduce reports (see report_sections); sections are cached per competitor content.
+REPORTER = SectionedReporter(
+    CLIENT,
+    model=REPORT_MODEL,
+    cache=DiskCache(os.getenv("SECTION_CACHE_PATH", cache_file("report_sections.sqlite3"))),
+)
+
+# External snippets are a supplement; cap them so they can't crowd out site data.
+EXTRA_INFO_TOKENS = 150
 
 
 def get_embedding(text: str, model: str = "text-embedding-3-small") -> list[float]:
-    resp = CLIENT.embeddings.create(model=model, input=[text])
-    return resp.data[0].embedding
+    with span("embed", texts=1):
+        return EMBEDDER.embed(text, model=model)
 
 
 def find_similar_competitors(description: str, top_k: int = 15) -> List[Dict[str, Any]]:
     query_vec = get_embedding(description)
-    result = INDEX.query(vector=query_vec, top_k=top_k, include_metadata=True)
+    # Passage vectors are report context, not competitors of their own.
+    with span("query", dependency="pinecone", top_k=top_k):
+        result = INDEX.query(
+            vector=query_vec,
+            top_k=top_k,
+            include_metadata=True,
+            filter={"kind": {"$ne": "passage"}},
+        )
     matches = result.get("matches") if isinstance(result, dict) else getattr(result, "matches", [])
     return matches or []
 
 
+def build_report_messages(
+    user_company_name: str,
+    competitors: List[Dict[str, Any]],
+    company_description: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for the competitor report.
+
+    Scraped website data is the primary source; competitors with thin
+    descriptions are supplemented with Wikipedia or news snippets. Given
+    ``company_description``, each competitor is represented by its most
+    relevant stored passages within CONTEXT_TOKEN_BUDGET tokens (more for a
+    large top_k, see CONTEXT_TOKENS_PER_COMPETITOR) instead of its full
+    description.
+    """
+    if company_description and CONTEXT_TOKEN_BUDGET > 0:
+        entries = build_competitor_context(
+            INDEX, get_embedding(company_description), competitors
+        )
+    else:
+        entries = [
+            (
+                match["metadata"].get("name", match.get("id")),
+                match["metadata"].get("description", "").strip(),
+            )
+            for match in competitors
+        ]
+    context = format_context(_with_extra_info(entries, competitors))
+
+    criteria = "".join(f"- {item}\n" for item in REPORT_CRITERIA)
+    prompt = (
+        f"Analyze competitors of '{user_company_name}' in detail.\n"
+        f"{criteria}"
+        "Your tone should be professional and consultative, with enough detail "
+        "to inform strategic decisions."
+    )
+
+    messages = [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": f"{prompt}\n\n{context}"},
+    ]
+    return messages
+
+
+def build_section_inputs(competitors: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    (name, text) per competitor for map-reduce sections: the stored
+    description plus external snippets for thin ones. It does not depend on
+    the requesting company's description, so sections stay reusable.
+    """
+    entries = [
+        (
+            match["metadata"].get("name", match.get("id")),
+            truncate_tokens(match["metadata"].get("description", "").strip(),
+                            SECTION_INPUT_TOKENS - EXTRA_INFO_TOKENS),
+        )
+        for match in competitors
+    ]
+    return _with_extra_info(entries, competitors)
+
+
+def _with_extra_info(
+    entries: List[Tuple[str, str]], competitors: List[Dict[str, Any]]
+) -> List[Tuple[str, str]]:
+    """Append Wikipedia/news snippets to the entries of thinly described competitors."""
+    # Thinness is judged on the stored description, not the passages picked for it.
+    thin = [
+        match["metadata"].get("name", match.get("id"))
+        for match in competitors
+        if len(match["metadata"].get("description", "").split()) < 80
+    ]
+    # Look up every thin description at once instead of one SerpAPI call at a time.
+    extra = fetch_many_company_info(thin)
+
+    enriched: List[Tuple[str, str]] = []
+    for name, description in entries:
+        extra_info = extra.get(name)
+        if extra_info:
+            description = (
+                f"{description}\n\n"
+                "Additional context from external sources:\n"
+                f"{truncate_tokens(extra_info, EXTRA_INFO_TOKENS)}"
+            )
+
+        enriched.append((name, description))
+    return enriched
+
+
 def analyze_competitors(
-    user_company_name: str, competitors: List[Dict[str, any]]
+    user_company_name: str,
+    competitors: List[Dict[str, Any]],
+    company_description: Optional[str] = None,
+    mode: Optional[str] = None,
 ) -> str:
     """
     Generate a professional, detailed analysis of competitors.
@@ -32,56 +149,43 @@ def analyze_competitors(
         user_company_name: The name of the company requesting the analysis.
         competitors: A list of competitor match dictionaries containing
                      'metadata' with 'name' and 'description'.
+        company_description: The requesting company's description; enables
+                     the token-budgeted passage context.
+        mode: "single", "map_reduce" or "auto" (default: REPORT_MODE); see
+                     report_sections.
 
     Returns:
         A formatted string with competitor analyses.
     """
-    enriched_contexts: List[str] = []
-
-    for match in competitors:
-        name = match["metadata"].get("name", match.get("id"))
-        description = match["metadata"].get("description", "").strip()
-
-        if not description or len(description.split()) < 80:
-            extra_info = fetch_company_info(name)
-            if extra_info:
-                description = (
-                    f"{description}\n\n"
-                    f"Additional context from external sources:\n{extra_info}"
-                )
-
-        enriched_contexts.append(f"{name}: {description}")
-
-    context = "\n\n".join(enriched_contexts)
-
-    system_msg = (
-        "You are a precise and analytical SaaS market research assistant. "
-        "First, rely on the provided scraped and stored data to produce the "
-        "analysis. If the provided data is insufficient to form a complete, "
-        "professional report, integrate relevant facts from the additional "
-        "context section."
-    )
-
-    prompt = (
-        f"Analyze competitors of '{user_company_name}' in detail.\n"
-        "- Danger Rating (1 minimal risk — 5 maximum threat, with justification)\n"
-        "- Customer Experience (CX) strategy\n"
-        "- Target audience\n"
-        "- Donor portal UX (clunky, intuitive, etc.)\n"
-        "- Messaging approach\n"
-        "- Cross-selling of financial/charitable services\n"
-        "- Availability of a mobile website or app\n"
-        "Your tone should be professional and consultative, with enough detail "
-        "to inform strategic decisions."
-    )
+    if use_map_reduce(mode, len(competitors)):
+        return REPORTER.report(user_company_name, build_section_inputs(competitors))
+    messages = build_report_messages(user_company_name, competitors, company_description)
+    with span("llm", dependency="openai", operation="chat.completions", model=REPORT_MODEL):
+        resp = CLIENT.chat.completions.create(model=REPORT_MODEL, messages=messages)
+        record_llm_usage(REPORT_MODEL, getattr(resp, "usage", None))
+    return resp.choices[0].message.content
 
-    messages = [
-        {"role": "system", "content": system_msg},
-        {"role": "user", "content": f"{prompt}\n\n{context}"},
-    ]
 
-    resp = CLIENT.chat.completions.create(
-        model="gpt-5",
-        messages=messages,
+def stream_report(messages: List[Dict[str, str]]) -> Iterator[str]:
+    """
+    Stream the report for messages from build_report_messages, yielding
+    text deltas as the completion generates them.
+    """
+    with span("llm", dependency="openai", operation="chat.completions",
+              model=REPORT_MODEL, stream=True) as current:
+        yield from stream_deltas(CLIENT, REPORT_MODEL, messages, current)
+
+
+def stream_competitor_report(
+    user_company_name: str,
+    competitors: List[Dict[str, Any]],
+    company_description: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> Iterator[str]:
+    """Streaming counterpart of analyze_competitors (same ``mode`` selection)."""
+    if use_map_reduce(mode, len(competitors)):
+        yield from REPORTER.stream(user_company_name, build_section_inputs(competitors))
+        return
+    yield from stream_report(
+        build_report_messages(user_company_name, competitors, company_description)
     )
-    return resp.choices[0].message.content
@@ -0,0 +1,188 @@
+"""
+Token-budgeted report context from stored passages.
+
+Each ingested site is stored as a company vector plus passage vectors
+(see chunking.chunk_text). For a report, candidate passages of the matched
+companies are retrieved for the query, every company gets its most relevant
+passage first (so coverage matches the full-description prompt), and the
+rest of the budget is filled by maximal marginal relevance so near-duplicate
+passages are skipped. The budget grows with the number of competitors once
+an equal share would fall below CONTEXT_TOKENS_PER_COMPETITOR.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pinecone
+from chunking import count_tokens, truncate_tokens
+from tracing import span
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+# Floor per competitor: above CONTEXT_TOKEN_BUDGET / this many matches the
+# budget grows with top_k instead of thinning every company's share.
+CONTEXT_TOKENS_PER_COMPETITOR = int(os.getenv("CONTEXT_TOKENS_PER_COMPETITOR", "600"))
+CANDIDATES_PER_COMPANY = 12
+MMR_LAMBDA = 0.7  # 1.0 = pure relevance, 0.0 = pure diversity
+
+# Pinecone returns at most 1000 matches when values are included.
+MAX_CANDIDATES = 1000
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def format_context(entries: Sequence[Tuple[str, str]]) -> str:
+    return "\n\n".join(f"{name}: {text}" for name, text in entries)
+
+
+def _relevance(query_vec: Sequence[float], candidates: List[Dict[str, Any]]):
+    """Unit-normalised candidate matrix and each candidate's cosine to the query."""
+    matrix = np.asarray([c["values"] for c in candidates], dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vec, dtype=np.float32)
+    query /= max(float(np.linalg.norm(query)), 1e-12)
+    return matrix, matrix @ query
+
+
+class _Selection:
+    """Passages picked so far, the tokens left, and each candidate's similarity to them."""
+
+    def __init__(self, candidates: List[Dict[str, Any]], matrix: np.ndarray,
+                 token_budget: int) -> None:
+        self.candidates = candidates
+        self.matrix = matrix
+        self.tokens = np.array([c["tokens"] for c in candidates])
+        self.max_sim = np.zeros(len(candidates), dtype=np.float32)
+        self.available = np.ones(len(candidates), dtype=bool)
+        self.picked: List[Dict[str, Any]] = []
+        self.remaining = token_budget
+
+    def take(self, i: int, limit: int) -> None:
+        cost = min(int(self.tokens[i]), limit)
+        candidate = self.candidates[i]
+        self.picked.append(candidate if cost == self.tokens[i] else dict(candidate, tokens=cost))
+        self.remaining -= cost
+        self.available[i] = False
+        np.maximum(self.max_sim, self.matrix @ self.matrix[i], out=self.max_sim)
+
+
+def _top_per_parent(candidates: List[Dict[str, Any]], relevance: np.ndarray) -> List[int]:
+    """Index of each parent's most relevant candidate, in candidate order."""
+    best: Dict[str, int] = {}
+    for i in np.argsort(-relevance):
+        best.setdefault(candidates[i]["metadata"]["parent_id"], int(i))
+    return sorted(best.values())
+
+
+def mmr_select(
+    query_vec: Sequence[float],
+    candidates: List[Dict[str, Any]],
+    *,
+    token_budget: int,
+    parent_share: Optional[int] = None,
+    lambda_: float = MMR_LAMBDA,
+) -> List[Dict[str, Any]]:
+    """
+    Pick passages under ``token_budget``: the top passage of each parent
+    first (in candidate order, cut to ``parent_share`` tokens when the budget
+    can't fit them whole), then MMR over the rest. Each candidate needs
+    ``values``, ``tokens`` and ``metadata.parent_id``; a cut passage is
+    returned as a copy with the reduced ``tokens``.
+    """
+    if not candidates:
+        return []
+    matrix, relevance = _relevance(query_vec, candidates)
+    selection = _Selection(candidates, matrix, token_budget)
+
+    top = _top_per_parent(candidates, relevance)
+    share = parent_share or token_budget // len(top)
+    for i in top:
+        if selection.remaining > 0:
+            selection.take(i, min(share, selection.remaining))
+
+    while True:
+        fits = selection.available & (selection.tokens <= selection.remaining)
+        if not fits.any():
+            break
+        scores = lambda_ * relevance - (1 - lambda_) * selection.max_sim
+        scores[~fits] = -np.inf
+        best = int(np.argmax(scores))
+        selection.take(best, int(selection.tokens[best]))
+    return selection.picked
+
+
+def _candidates(result: Any, ids: List[Any]) -> List[Dict[str, Any]]:
+    """Passage matches as mmr_select candidates, in company rank order."""
+    rank = {cid: i for i, cid in enumerate(ids)}
+    candidates = []
+    for match in _field(result, "matches", []) or []:
+        metadata = dict(_field(match, "metadata", {}) or {})
+        candidates.append({
+            "values": _field(match, "values"),
+            "metadata": metadata,
+            "tokens": count_tokens(metadata.get("text", "")),
+        })
+    # Company rank order, so the coverage pass favours the closest competitors.
+    candidates.sort(key=lambda c: rank.get(c["metadata"].get("parent_id"), len(ids)))
+    return candidates
+
+
+def _entry(competitor: Dict[str, Any], passages: List[Dict[str, Any]],
+           share: int) -> Tuple[str, str]:
+    metadata = competitor.get("metadata") or {}
+    name = metadata.get("name", competitor.get("id"))
+    if passages:
+        passages = sorted(passages, key=lambda p: p["metadata"].get("position", 0))
+        text = " ... ".join(
+            truncate_tokens(p["metadata"].get("text", ""), p["tokens"]) for p in passages
+        )
+    else:
+        text = truncate_tokens(metadata.get("description", ""), share)
+    return name, text.strip()
+
+
+def build_competitor_context(
+    index: pinecone.Index,
+    query_vec: Sequence[float],
+    competitors: List[Dict[str, Any]],
+    *,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    competitor_tokens: int = CONTEXT_TOKENS_PER_COMPETITOR,
+) -> List[Tuple[str, str]]:
+    """
+    (name, text) per competitor, in match order. The budget is
+    ``token_budget``, raised to ``competitor_tokens`` per competitor when
+    there are many, so a large ``top_k`` doesn't starve each company.
+    """
+    if not competitors:
+        # Pinecone rejects the passage query's top_k of 0.
+        return []
+    ids = [c.get("id") for c in competitors]
+    with span("query", dependency="pinecone", operation="query.passages",
+              companies=len(ids)):
+        result = index.query(
+            vector=list(query_vec),
+            top_k=min(MAX_CANDIDATES, CANDIDATES_PER_COMPANY * len(ids)),
+            filter={"kind": {"$eq": "passage"}, "parent_id": {"$in": ids}},
+            include_metadata=True,
+            include_values=True,
+        )
+    candidates = _candidates(result, ids)
+
+    # Every competitor gets an equal share; companies stored before passages
+    # existed use a slice of their description for theirs.
+    token_budget = max(token_budget, competitor_tokens * len(competitors))
+    share = max(50, token_budget // len(competitors))
+    with_passages = {c["metadata"].get("parent_id") for c in candidates}
+    legacy = sum(1 for c in competitors if c.get("id") not in with_passages)
+    picked: Dict[str, List[Dict[str, Any]]] = {}
+    for passage in mmr_select(
+        query_vec, candidates, token_budget=token_budget - legacy * share, parent_share=share
+    ):
+        picked.setdefault(passage["metadata"]["parent_id"], []).append(passage)
+    return [_entry(c, picked.get(c.get("id"), []), share) for c in competitors]
@@ -0,0 +1,337 @@
+"""
+Bounded same-host crawler that turns a landing URL into site text.
+
+Besides the landing page, candidate pages come from the sitemap(s) and the
+landing page's links. They are ranked toward the pages that describe a
+DAF provider (about, products/accounts, fees, mobile app, donor portal) and
+the best ``max_pages - 1`` are fetched in parallel through the shared
+FETCHER. robots.txt is honoured for every URL, the landing page included.
+Page texts are concatenated in rank order with sentences already seen on
+earlier pages dropped.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import (Any, AsyncContextManager, AsyncIterator, Callable, Dict, List, Optional,
+                    Pattern, Set, Tuple)
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from extractors import get_extractor
+from http_client import DEFAULT_USER_AGENT, FETCHER, Fetcher
+from tracing import span
+from utils import canonicalize_url, run_blocking
+
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "6"))
+CRAWL_MAX_CHARS = int(os.getenv("CRAWL_MAX_CHARS", "12000"))
+PAGE_MAX_CHARS = 4000
+MAX_SITEMAP_URLS = 2000
+MAX_CHILD_SITEMAPS = 3
+ROBOTS_TTL = 24 * 3600.0
+# Pages scoring below this are not worth a fetch (penalized, or deep and unremarkable).
+MIN_PAGE_SCORE = -1.5
+
+# Path/anchor keywords and how much they say about the provider's offering,
+# matched as whole words or path segments (see _keyword_re).
+PAGE_KEYWORDS: Dict[str, float] = {
+    "about": 5.0, "who-we-are": 5.0, "our-story": 4.0, "mission": 3.0,
+    "donor-advised": 5.0, "daf": 4.0, "giving-account": 4.0, "product": 4.0,
+    "service": 3.0, "solution": 3.0, "how-it-works": 4.0, "features": 3.0,
+    "fees": 3.0, "pricing": 3.0, "minimum": 2.0, "invest": 2.0, "investment": 2.0,
+    "mobile": 4.0, "app": 3.0, "donor-portal": 4.0, "portal": 3.0,
+    "online-access": 3.0, "login": 1.0, "grant": 2.0, "advisor": 2.0,
+    "faq": 2.0, "why": 2.0,
+}
+# Pages that rarely describe the business (or are endless).
+PAGE_PENALTIES: Dict[str, float] = {
+    "blog": -4.0, "news": -3.0, "press": -3.0, "article": -3.0, "event": -3.0,
+    "career": -5.0, "job": -5.0, "privacy": -6.0, "terms": -6.0, "legal": -5.0,
+    "cookie": -6.0, "accessibility": -5.0, "sitemap": -6.0, "search": -5.0,
+    "tag": -4.0, "category": -4.0, "author": -4.0, "page/": -3.0,
+}
+SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".mp4",
+    ".mp3", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".xml", ".gz",
+    ".css", ".js", ".ico",
+)
+
+_LOC_RE = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_SPLIT_RE = re.compile(r"[\s_]+")
+
+StageFn = Callable[[str], AsyncContextManager[None]]
+
+
+@asynccontextmanager
+async def _no_stage(_: str) -> AsyncIterator[None]:
+    yield
+
+
+@dataclass
+class CrawlResult:
+    url: str
+    text: str = ""
+    pages: List[str] = field(default_factory=list)  # fetched, in rank order
+    skipped: List[str] = field(default_factory=list)  # "url: reason"
+
+
+class _LinkParser(HTMLParser):
+    """Collects (href, anchor text) pairs."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.links: List[Tuple[str, str]] = []
+        self._href: Optional[str] = None
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "a":
+            self._href = dict(attrs).get("href")
+            self._text = []
+
+    def handle_data(self, data: str) -> None:
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "a" and self._href is not None:
+            self.links.append((self._href, " ".join("".join(self._text).split())))
+            self._href = None
+
+
+def extract_links(html: str, base_url: str) -> List[Tuple[str, str]]:
+    """Absolute (url, anchor text) for every link on the page, fragments removed."""
+    parser = _LinkParser()
+    parser.feed(html)
+    return [
+        (urldefrag(urljoin(base_url, href.strip()))[0], text)
+        for href, text in parser.links
+        if href and not href.startswith(("mailto:", "tel:", "javascript:"))
+    ]
+
+
+def _keyword_re(keyword: str) -> Pattern[str]:
+    """
+    ``keyword`` as whole words or path segments: "-" also matches "_", a
+    trailing "/" must be a segment end, and a plural or -ing ending is
+    allowed ("apps", "grants"), so "app" does not match "application".
+    """
+    words = r"[-_]".join(re.escape(word) for word in keyword.rstrip("/").split("-"))
+    end = "/" if keyword.endswith("/") else r"(?:s|es|ing)?(?![a-z0-9])"
+    return re.compile(rf"(?<![a-z0-9]){words}{end}")
+
+
+_PAGE_WEIGHTS: List[Tuple[Pattern[str], float]] = [
+    (_keyword_re(word), weight)
+    for word, weight in {**PAGE_KEYWORDS, **PAGE_PENALTIES}.items()
+]
+
+
+def score_page(url: str, anchor: str = "") -> float:
+    """Higher for pages likely to describe the offering; shallower pages win ties."""
+    path = urlparse(url).path.lower().rstrip("/")
+    haystack = f"{path} {_WORD_SPLIT_RE.sub('-', anchor.lower())}"
+    score = sum(weight for pattern, weight in _PAGE_WEIGHTS if pattern.search(haystack))
+    return score - 0.5 * path.count("/")
+
+
+def _is_candidate(url: str, host: str) -> bool:
+    parsed = urlparse(url)
+    return (
+        parsed.scheme in ("http", "https")
+        and canonicalize_url(url) == host
+        and not parsed.path.lower().endswith(SKIP_EXTENSIONS)
+        and not parsed.query
+    )
+
+
+def _merge_text(texts: List[str], max_chars: int) -> str:
+    """Concatenate page texts, dropping sentences an earlier page already had."""
+    seen: Set[str] = set()
+    parts: List[str] = []
+    size = 0
+    for text in texts:
+        kept = []
+        for sentence in _SENTENCE_RE.split(text):
+            key = " ".join(sentence.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                kept.append(sentence)
+        if not kept:
+            continue
+        page = " ".join(kept)
+        parts.append(page[: max_chars - size])
+        size += len(parts[-1]) + 2
+        if size >= max_chars:
+            break
+    return "\n\n".join(parts).strip()
+
+
+class SiteCrawler:
+    """
+    Crawl up to ``max_pages`` pages of one host and return their merged text.
+
+    ``crawl`` takes an optional ``stage`` factory (``stage("fetch")`` /
+    ``stage("parse")`` async context managers) so callers such as the
+    ingestion pipeline can apply their own concurrency limits and timings.
+    """
+
+    def __init__(
+        self,
+        fetcher: Fetcher = FETCHER,
+        *,
+        max_pages: int = CRAWL_MAX_PAGES,
+        max_chars: int = CRAWL_MAX_CHARS,
+        page_max_chars: int = PAGE_MAX_CHARS,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ) -> None:
+        self.fetcher = fetcher
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.page_max_chars = page_max_chars
+        self.user_agent = user_agent
+        self._robots: Dict[str, Tuple[RobotFileParser, float]] = {}
+
+    async def crawl(self, url: str, *, stage: Optional[StageFn] = None) -> CrawlResult:
+        with span("scrape", url=url) as current:
+            result = await self._crawl(url, stage or _no_stage)
+            current.set(pages=len(result.pages), chars=len(result.text))
+        return result
+
+    async def _crawl(self, url: str, stage: StageFn) -> CrawlResult:
+        result = CrawlResult(url=url)
+        robots = await self._robots_for(url, stage)
+        if not robots.can_fetch(self.user_agent, url):
+            result.skipped.append(f"{url}: disallowed by robots.txt")
+            return result
+        # Network errors on the landing page propagate; the site is unreachable.
+        html = await self._get(url, stage)
+        result.pages.append(url)
+        if self.max_pages <= 1:
+            result.text = await self._extract(html, self.max_chars, stage)
+            return result
+
+        candidates = await self._candidates(url, html, robots, stage)
+        chosen = self._choose(url, candidates, robots, result)
+        pages = await asyncio.gather(
+            *(self._get(link, stage) for link in chosen), return_exceptions=True
+        )
+        htmls = [html]
+        for link, page in zip(chosen, pages):
+            if isinstance(page, BaseException):
+                result.skipped.append(f"{link}: {page}")
+                continue
+            result.pages.append(link)
+            htmls.append(page)
+
+        texts = await asyncio.gather(
+            *(self._extract(page, self.page_max_chars, stage) for page in htmls)
+        )
+        result.text = _merge_text(list(texts), self.max_chars)
+        return result
+
+    async def _candidates(
+        self, url: str, html: str, robots: RobotFileParser, stage: StageFn
+    ) -> Dict[str, float]:
+        """Same-host links of the landing page and the sitemap(s), with their scores."""
+        host = canonicalize_url(url)
+        candidates: Dict[str, float] = {}
+        for link, anchor in extract_links(html, url):
+            if _is_candidate(link, host):
+                candidates[link] = max(candidates.get(link, -1e9), score_page(link, anchor))
+        for link in await self._sitemap_urls(url, robots, stage):
+            if _is_candidate(link, host) and link not in candidates:
+                candidates[link] = score_page(link)
+        return candidates
+
+    def _choose(
+        self, url: str, candidates: Dict[str, float], robots: RobotFileParser, result: CrawlResult
+    ) -> List[str]:
+        """The best ``max_pages - 1`` candidates robots.txt allows, besides the landing page."""
+        landing = {url.rstrip("/"), urlparse(url)._replace(path="").geturl()}
+        ranked = sorted(
+            (link for link, score in candidates.items()
+             if link.rstrip("/") not in landing and score > MIN_PAGE_SCORE),
+            key=lambda link: -candidates[link],
+        )
+        chosen: List[str] = []
+        for link in ranked:
+            if len(chosen) >= self.max_pages - 1:
+                break
+            if robots.can_fetch(self.user_agent, link):
+                chosen.append(link)
+            else:
+                result.skipped.append(f"{link}: disallowed by robots.txt")
+        return chosen
+
+    async def _get(self, url: str, stage: StageFn) -> str:
+        async with stage("fetch"):
+            fetched = await self.fetcher.fetch_async(url)
+        if fetched.status >= 400:
+            raise requests.HTTPError(f"{fetched.status} for {url}")
+        return fetched.text
+
+    async def _extract(self, html: str, max_chars: int, stage: StageFn) -> str:
+        async with stage("parse"):
+            return await run_blocking(get_extractor(), html, max_chars)
+
+    async def _robots_for(self, url: str, stage: StageFn) -> RobotFileParser:
+        origin = urlparse(url)._replace(path="", params="", query="", fragment="").geturl()
+        cached = self._robots.get(origin)
+        if cached is not None and time.monotonic() - cached[1] < ROBOTS_TTL:
+            return cached[0]
+        robots = RobotFileParser(origin + "/robots.txt")
+        try:
+            async with stage("fetch"):
+                fetched = await self.fetcher.fetch_async(origin + "/robots.txt")
+            if fetched.status in (401, 403):
+                robots.disallow_all = True
+            elif fetched.status >= 400:
+                robots.allow_all = True
+            else:
+                robots.parse(fetched.text.splitlines())
+        except requests.RequestException:
+            robots.allow_all = True
+        self._robots[origin] = (robots, time.monotonic())
+        return robots
+
+    async def _sitemap_urls(
+        self, url: str, robots: RobotFileParser, stage: StageFn
+    ) -> List[str]:
+        origin = urlparse(url)._replace(path="", params="", query="", fragment="").geturl()
+        sitemaps = list(robots.site_maps() or []) or [origin + "/sitemap.xml"]
+        urls: List[str] = []
+        for _ in range(2):  # a sitemap index, then the sitemaps it lists
+            bodies = await asyncio.gather(
+                *(self._get(sm, stage) for sm in sitemaps[:MAX_CHILD_SITEMAPS]),
+                return_exceptions=True,
+            )
+            children: List[str] = []
+            for body in bodies:
+                if isinstance(body, BaseException):
+                    continue
+                locs = _LOC_RE.findall(body)
+                if "<sitemapindex" in body.lower():
+                    children.extend(locs)
+                else:
+                    urls.extend(locs)
+            if not children or len(urls) >= MAX_SITEMAP_URLS:
+                break
+            sitemaps = children
+        return urls[:MAX_SITEMAP_URLS]
+
+
+def crawl_site(url: str, **kwargs: Any) -> CrawlResult:
+    """Sync wrapper around ``SiteCrawler(**kwargs).crawl(url)``."""
+    return asyncio.run(SiteCrawler(**kwargs).crawl(url))
+
+
+# Shared crawler used by the ingestion pipeline
+CRAWLER = SiteCrawler()
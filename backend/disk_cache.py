@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+# A capped cache that overflows is trimmed to this share of its caps.
+TRIM_TARGET = 0.9
+
+
+def cache_file(name: str) -> str:
+    """Path of a cache file inside CACHE_DIR."""
+    return os.path.join(CACHE_DIR, name)
+
+
+class DiskCache:
+    """
+    Small persistent key -> JSON value store on SQLite.
+
+    Entries remember when they were written so callers can apply their own
+    freshness rules (``max_age``) per lookup. Safe to share between threads.
+
+    With ``max_entries`` and/or ``max_bytes`` (of JSON-encoded values), the
+    least recently written entries are evicted once a cap is exceeded. Size
+    is tracked as a running estimate, so the table is only counted when the
+    estimate says a cap may have been crossed.
+    """
+
+    def __init__(
+        self, path: str, *, max_entries: Optional[int] = None, max_bytes: Optional[int] = None
+    ) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._entries_estimate = self._bytes_estimate = 0
+        if max_entries or max_bytes:
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)"
+            )
+            self._entries_estimate, self._bytes_estimate = self._totals()
+        self._db.commit()
+
+    def get_with_age(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, age in seconds), or None when the key is missing."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        hit = self.get_with_age(key)
+        if hit is None:
+            return None
+        value, age = hit
+        if max_age is not None and age > max_age:
+            return None
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        blob = json.dumps(value)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, blob, time.time()),
+            )
+            # Replacements are counted too; _trim recounts before evicting.
+            self._entries_estimate += 1
+            self._bytes_estimate += len(blob)
+            if self._over(self._entries_estimate, self._bytes_estimate):
+                self._trim()
+            self._db.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Stored entries and the total size of their JSON values."""
+        with self._lock:
+            count, size = self._totals()
+        return {"entries": count, "bytes": size}
+
+    def _totals(self) -> Tuple[int, int]:
+        count, size = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries"
+        ).fetchone()
+        return count, size
+
+    def _over(self, count: int, size: int) -> bool:
+        return bool(
+            (self.max_entries and count > self.max_entries)
+            or (self.max_bytes and size > self.max_bytes)
+        )
+
+    def _trim(self) -> None:
+        """Evict the oldest writes until both caps are back under TRIM_TARGET."""
+        count, size = self._totals()
+        if self._over(count, size):
+            target_count = int(self.max_entries * TRIM_TARGET) if self.max_entries else count
+            target_size = int(self.max_bytes * TRIM_TARGET) if self.max_bytes else size
+            evict = []
+            for key, length in self._db.execute(
+                "SELECT key, LENGTH(value) FROM entries ORDER BY stored_at"
+            ):
+                if count <= target_count and size <= target_size:
+                    break
+                evict.append((key,))
+                count -= 1
+                size -= length
+            self._db.executemany("DELETE FROM entries WHERE key = ?", evict)
+        self._entries_estimate, self._bytes_estimate = count, size
@@ -1,63 +1,98 @@
 from __future__ import annotations
 
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Sequence
 
-import pinecone
-import requests
-from common import CLIENT
-from scrape_website import scrape_website
-from utils import fetch_company_info, vector_exists
+from chunking import chunk_text
+from common import EMBEDDER
+from tracing import span
+from utils import fetch_company_info
+
+# Scraped content shorter than this is supplemented with Wikipedia/news data.
+MIN_CONTENT_CHARS = 500
+# Pinecone metadata is capped, so only the head of the content is stored.
+MAX_DESCRIPTION_CHARS = 5000
 
 
 def embed_text(text: str) -> list[float]:
     """Create an embedding with text-embedding-3-small (dim=1536)."""
-    resp = CLIENT.embeddings.create(
-        model="text-embedding-3-small",
-        input=[text],
-    )
-    return resp.data[0].embedding
+    with span("embed", texts=1):
+        return EMBEDDER.embed(text, model="text-embedding-3-small")
 
 
-def upsert_website(
-    *,
-    index: pinecone.Index,
-    url: str,
-    company_id: str,
-    name: str,
-    fallback_summary: str = "",
-    extra_metadata: Optional[Dict[str, str]] = None,
-) -> None:
-    if vector_exists(index, company_id):
-        print(f"Skip (exists): {url} -> {company_id}")
-        return
-
-    content = fallback_summary
-    try:
-        scraped = scrape_website(url)
-        if scraped:
-            content = scraped
-    except requests.RequestException as exc:
-        print(f"Scrape failed for {url}: {exc}")
-
-    # If still too short, fetch Wikipedia/news data
-    if not content or len(content) < 500:
+def embed_texts(texts: Sequence[str]) -> List[list[float]]:
+    """Embed several texts; the shared batcher sends them as one request."""
+    with span("embed", texts=len(texts)):
+        return EMBEDDER.embed_many(texts, model="text-embedding-3-small")
+
+
+def needs_enrichment(content: str) -> bool:
+    """True when scraped content is too thin to describe the company on its own."""
+    return not content or len(content) < MIN_CONTENT_CHARS
+
+
+def enrich_content(content: str, name: str) -> str:
+    """Append Wikipedia/news snippets for ``name`` to ``content`` when available."""
+    with span("enrich", company=name):
         extra_info = fetch_company_info(name)
-        if extra_info:
-            content += "\n\n" + extra_info
+    if extra_info:
+        content += "\n\n" + extra_info
+    return content
 
-    if not content:
-        content = f"{name} ({url})"
 
-    embedding = embed_text(content)
-    metadata = {
+def build_metadata(
+    *,
+    name: str,
+    url: str,
+    content: str,
+    extra_metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    metadata: Dict[str, Any] = {
+        "kind": "site",
         "name": name,
         "url": url,
-        "description": content[:5000],
+        "description": content[:MAX_DESCRIPTION_CHARS],
     }
     if extra_metadata:
         metadata.update(extra_metadata)
+    return metadata
+
+
+def passage_id(company_id: str, position: int) -> str:
+    return f"{company_id}#p{position}"
 
-    index.upsert(
-        vectors=[{"id": company_id, "values": embedding, "metadata": metadata}]
+
+def build_site_vectors(
+    *,
+    company_id: str,
+    name: str,
+    url: str,
+    content: str,
+    extra_metadata: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Company vector (whole content) plus one vector per passage of the
+    content, so reports can pull only the relevant passages.
+    """
+    passages = chunk_text(content)
+    embeddings = embed_texts([content, *passages])
+    vectors = [
+        {
+            "id": passage_id(company_id, i),
+            "values": embedding,
+            "metadata": {
+                "kind": "passage",
+                "parent_id": company_id,
+                "name": name,
+                "url": url,
+                "position": i,
+                "text": passage,
+            },
+        }
+        for i, (passage, embedding) in enumerate(zip(passages, embeddings[1:]))
+    ]
+    metadata = build_metadata(
+        name=name, url=url, content=content, extra_metadata=extra_metadata
     )
-    print(f"Upserted {name} ({company_id}) from {url}")
+    metadata["passages"] = len(passages)
+    vectors.append({"id": company_id, "values": embeddings[0], "metadata": metadata})
+    return vectors
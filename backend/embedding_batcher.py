@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from embedding_cache import EmbeddingCache
+from tracing import count_cache, record_llm_usage, span
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# How long a caller waits for its embedding before giving up.
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "120"))
+
+# OpenAI caps an embeddings request at 2048 inputs and ~300k tokens; stay under both.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 250_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def chunk_by_limits(
+    texts: Sequence[str],
+    *,
+    max_inputs: int = MAX_INPUTS_PER_REQUEST,
+    max_tokens: int = MAX_TOKENS_PER_REQUEST,
+) -> List[Tuple[int, int]]:
+    """Split ``texts`` into [start, end) ranges that each fit in one API request."""
+    ranges: List[Tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if i > start and (i - start >= max_inputs or tokens + cost > max_tokens):
+            ranges.append((start, i))
+            start, tokens = i, 0
+        tokens += cost
+    if start < len(texts):
+        ranges.append((start, len(texts)))
+    return ranges
+
+
+def _is_input_error(exc: Exception) -> bool:
+    """A 400 from the API, e.g. one input over the model's per-input token limit."""
+    return getattr(exc, "status_code", None) == 400
+
+
+@dataclass
+class BatchLimits:
+    """When pending texts are flushed, how a flush is split, and how long callers wait."""
+
+    max_batch_size: int = 256
+    max_wait: float = 0.02
+    max_inputs_per_request: int = MAX_INPUTS_PER_REQUEST
+    max_tokens_per_request: int = MAX_TOKENS_PER_REQUEST
+    timeout: float = EMBED_TIMEOUT
+
+
+class _Collector:
+    """Gathers queued items into batches on a daemon thread started on first use."""
+
+    def __init__(self, limits: BatchLimits, on_batch: Callable[[List[Any]], None]) -> None:
+        self.limits = limits
+        self.on_batch = on_batch
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def put(self, item: Any) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._loop, name="embed-batcher", daemon=True
+                    )
+                    self._thread.start()
+        self._queue.put(item)
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.limits.max_wait
+            while len(batch) < self.limits.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.on_batch(batch)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce embedding requests from concurrent callers into batched API calls.
+
+    Callers get a Future per text. A background thread collects pending texts
+    and flushes them when ``max_batch_size`` texts are waiting or ``max_wait``
+    seconds have passed since the first one arrived. Each flush is split to
+    respect per-request input/token limits and sent on a small worker pool, so
+    the next batch keeps filling while the previous one is in flight. If the
+    API rejects a request's input (a 400, e.g. one text over the per-input
+    token limit), the request is retried in halves so only the offending
+    callers get the error.
+
+    With a ``cache``, hits resolve immediately without touching the API and
+    every fresh embedding is written back.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        max_batch_size: int = 256,
+        max_wait: float = 0.02,
+        max_concurrent_requests: int = 4,
+        max_inputs_per_request: int = MAX_INPUTS_PER_REQUEST,
+        max_tokens_per_request: int = MAX_TOKENS_PER_REQUEST,
+        cache: Optional[EmbeddingCache] = None,
+        timeout: float = EMBED_TIMEOUT,
+    ) -> None:
+        self.client = client
+        self.cache = cache
+        self.limits = BatchLimits(
+            max_batch_size, max_wait, max_inputs_per_request, max_tokens_per_request, timeout
+        )
+        self.stats = {"requests_sent": 0, "texts_embedded": 0}
+        self._stats_lock = threading.Lock()
+        self._collector = _Collector(self.limits, self._dispatch)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrent_requests, thread_name_prefix="embed-flush"
+        )
+
+    def submit(self, text: str, model: str = DEFAULT_EMBEDDING_MODEL) -> Future:
+        future: Future = Future()
+        if self.cache is not None:
+            cached = self.cache.get(model, text)
+            if cached is not None:
+                count_cache("embeddings", "hit")
+                future.set_result(cached)
+                return future
+            count_cache("embeddings", "miss")
+        self._collector.put((model, text, future))
+        return future
+
+    def embed(self, text: str, model: str = DEFAULT_EMBEDDING_MODEL) -> list[float]:
+        return self.submit(text, model).result(timeout=self.limits.timeout)
+
+    def embed_many(
+        self, texts: Sequence[str], model: str = DEFAULT_EMBEDDING_MODEL
+    ) -> List[list[float]]:
+        futures = [self.submit(text, model) for text in texts]
+        deadline = time.monotonic() + self.limits.timeout
+        return [f.result(timeout=max(0.0, deadline - time.monotonic())) for f in futures]
+
+    def _dispatch(self, batch: List[Tuple[str, str, Future]]) -> None:
+        by_model: Dict[str, List[Tuple[str, Future]]] = {}
+        for model, text, future in batch:
+            if future.set_running_or_notify_cancel():
+                by_model.setdefault(model, []).append((text, future))
+
+        for model, entries in by_model.items():
+            texts = [text for text, _ in entries]
+            for start, end in chunk_by_limits(
+                texts,
+                max_inputs=self.limits.max_inputs_per_request,
+                max_tokens=self.limits.max_tokens_per_request,
+            ):
+                self._pool.submit(self._flush, model, entries[start:end])
+
+    def _flush(self, model: str, entries: List[Tuple[str, Future]]) -> None:
+        try:
+            # Runs on the batcher's pool, so the span has no request ID: a batch
+            # can serve several requests.
+            with span("embed_request", dependency="openai", operation="embeddings",
+                      model=model, inputs=len(entries)):
+                resp = self.client.embeddings.create(
+                    model=model, input=[text for text, _ in entries]
+                )
+                record_llm_usage(model, getattr(resp, "usage", None))
+        except Exception as exc:  # pylint: disable=broad-except
+            if len(entries) > 1 and _is_input_error(exc):
+                # Other callers' texts share this request; find the bad input(s).
+                middle = len(entries) // 2
+                self._flush(model, entries[:middle])
+                self._flush(model, entries[middle:])
+                return
+            # Hand the failure to every waiting caller instead of losing it here.
+            for _, future in entries:
+                future.set_exception(exc)
+            return
+
+        with self._stats_lock:
+            self.stats["requests_sent"] += 1
+            self.stats["texts_embedded"] += len(entries)
+
+        for item in resp.data:
+            entries[item.index][1].set_result(item.embedding)
+        for _, future in entries:
+            if not future.done():
+                future.set_exception(ValueError("No embedding returned for input"))
+
+        if self.cache is not None:
+            # Best effort: callers already have their vectors, and the SQLite
+            # file may be locked by another worker process.
+            try:
+                self.cache.put_many(
+                    model, ((entries[item.index][0], item.embedding) for item in resp.data)
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"Embedding cache write failed: {exc}")
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from disk_cache import cache_file
+
+DEFAULT_CACHE_PATH = cache_file("embeddings.sqlite3")
+# When the disk tier overflows it is trimmed to this fraction of its cap, so
+# the row count only has to be recomputed once per many inserts.
+DISK_TRIM_TARGET = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies share one cache entry."""
+    return " ".join(text.split())
+
+
+def cache_key(model: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class _DiskTier:
+    """SQLite table of float32 blobs capped at ``max_items``; callers hold the cache lock."""
+
+    def __init__(self, path: str, max_items: int) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_items = max_items
+        self.touched: Set[str] = set()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self.db.commit()
+        self.items = self.count()  # upper bound on the row count, refreshed when trimming
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get(self, key: str) -> Optional["array[float]"]:
+        row = self.db.execute(
+            "SELECT vector FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.touched.add(key)
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector
+
+    def put_many(self, rows: List[Tuple[str, bytes]], now: float) -> int:
+        """Write ``rows`` and recency for keys read since; return the rows evicted."""
+        if self.touched:
+            self.db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in self.touched],
+            )
+            self.touched.clear()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, blob, now) for key, blob in rows],
+        )
+        self.items += len(rows)
+        evicted = self._trim()
+        self.db.commit()
+        return evicted
+
+    def _trim(self) -> int:
+        if self.items <= self.max_items:
+            return 0
+        count = self.count()
+        overflow = count - int(self.max_items * DISK_TRIM_TARGET)
+        evicted = 0
+        if count > self.max_items and overflow > 0:
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key IN"
+                " (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            evicted = overflow
+            count -= overflow
+        self.items = count
+        return evicted
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, normalized-text hash).
+
+    The memory tier is a bounded LRU of float32 arrays; every ``get`` returns
+    a fresh list, so callers cannot corrupt each other's vectors. The disk
+    tier is a SQLite table of float32 blobs capped at ``max_disk_items``;
+    when it overflows, the least recently used rows are dropped. Disk hits
+    are promoted to memory; their recency is written with the next
+    ``put_many`` rather than on every read. Pass ``path=None`` for a
+    memory-only cache.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        *,
+        max_memory_items: int = 2048,
+        max_disk_items: int = 100_000,
+    ) -> None:
+        self.max_memory_items = max_memory_items
+        self.counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        self._memory: "OrderedDict[str, array[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(path, max_disk_items) if path else None
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = cache_key(model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return vector.tolist()
+
+            vector = self._disk.get(key) if self._disk is not None else None
+            if vector is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._memory_put(key, vector)
+            return vector.tolist()
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        self.put_many(model, [(text, vector)])
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]) -> None:
+        rows = []
+        with self._lock:
+            for text, vector in items:
+                key = cache_key(model, text)
+                packed = array("f", vector)
+                self._memory_put(key, packed)
+                rows.append((key, packed.tobytes()))
+            if self._disk is not None and rows:
+                self.counters["disk_evictions"] += self._disk.put_many(rows, time.time())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_items"] = len(self._memory)
+            if self._disk is not None:
+                stats["disk_items"] = self._disk.count()
+        return stats
+
+    def _memory_put(self, key: str, vector: "array[float]") -> None:
+        # Expects self._lock to be held.
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.counters["memory_evictions"] += 1
@@ -0,0 +1,159 @@
+"""
+Pluggable HTML -> text extractors for the scraper.
+
+``soup`` is the original BeautifulSoup implementation (full tree, then
+truncate). ``streaming`` walks the document as parser events, drops
+boilerplate regions (nav, footer, cookie banners, scripts, ...) and stops
+parsing as soon as ``max_chars`` of text has been collected.
+"""
+from __future__ import annotations
+
+import os
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+CONTENT_TAGS = frozenset({"p", "h1", "h2", "h3", "h4"})
+
+# Whole subtrees under these tags never carry page copy.
+BOILERPLATE_TAGS = frozenset({
+    "script", "style", "noscript", "template", "svg", "iframe",
+    "nav", "footer", "aside", "form", "button", "dialog",
+})
+BOILERPLATE_ROLES = frozenset({
+    "navigation", "banner", "contentinfo", "dialog", "alertdialog", "menu",
+})
+# Class/id tokens that mark boilerplate. A token matches when it is one of
+# these words or starts or ends with one ("cookie-banner", "site-footer"), so
+# "has-social-links" or "shareholder-info" are kept.
+BOILERPLATE_ATTR_WORDS = frozenset({
+    "cookie", "cookies", "consent", "gdpr", "navbar", "nav", "menu", "footer",
+    "breadcrumb", "breadcrumbs", "newsletter", "subscribe", "popup", "modal",
+    "share", "sharing", "social", "skip",
+})
+# Document-level containers are never dropped, whatever their classes say.
+CONTAINER_TAGS = frozenset({"html", "body", "main", "article"})
+
+# Elements without an end tag; they must not be pushed on the open-element stack.
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+})
+
+FEED_CHUNK_CHARS = 16 * 1024
+
+_WS_RE = re.compile(r"\s+")
+_TOKEN_PART_RE = re.compile(r"[-_]+")
+
+
+def _is_boilerplate_token(token: str) -> bool:
+    parts = [part for part in _TOKEN_PART_RE.split(token.lower()) if part]
+    return bool(parts) and (
+        parts[0] in BOILERPLATE_ATTR_WORDS or parts[-1] in BOILERPLATE_ATTR_WORDS
+    )
+
+
+def _clean(text: str) -> str:
+    return _WS_RE.sub(" ", text).strip()
+
+
+def soup_extract(html: str, max_chars: int = 5000) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    elements = soup.find_all(["p", "h1", "h2", "h3", "h4"])
+    raw_text = " ".join([el.get_text() for el in elements])
+    return _clean(raw_text[:max_chars])
+
+
+class _ContentParser(HTMLParser):
+    def __init__(self, max_chars: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.collected = 0
+        self.done = False
+        self._stack: List[Tuple[str, bool]] = []  # (tag, opened a boilerplate region)
+        self._skip_depth = 0
+        self._content_depth = 0
+
+    @staticmethod
+    def _is_boilerplate(tag: str, attrs: List[Tuple[str, Optional[str]]]) -> bool:
+        if tag in BOILERPLATE_TAGS:
+            return True
+        if tag in CONTAINER_TAGS:
+            return False
+        for name, value in attrs:
+            if not value:
+                continue
+            if name == "role" and value.lower() in BOILERPLATE_ROLES:
+                return True
+            if name in ("id", "class") and any(
+                _is_boilerplate_token(token) for token in value.split()
+            ):
+                return True
+            if name == "aria-hidden" and value == "true":
+                return True
+        return False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in VOID_TAGS:
+            return
+        skip = self._is_boilerplate(tag, attrs)
+        self._stack.append((tag, skip))
+        if skip:
+            self._skip_depth += 1
+        if tag in CONTENT_TAGS:
+            self._content_depth += 1
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in VOID_TAGS or all(open_tag != tag for open_tag, _ in self._stack):
+            return
+        # Pop through unclosed children (e.g. <p> without </p>) up to the match.
+        while self._stack:
+            open_tag, skip = self._stack.pop()
+            if skip:
+                self._skip_depth -= 1
+            if open_tag in CONTENT_TAGS:
+                self._content_depth -= 1
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data: str) -> None:
+        if self.done or self._skip_depth or not self._content_depth:
+            return
+        self.parts.append(data)
+        self.collected += len(data)
+        if self.collected >= self.max_chars:
+            self.done = True
+
+
+def streaming_extract(html: str, max_chars: int = 5000) -> str:
+    parser = _ContentParser(max_chars)
+    # Feed in slices so parsing stops shortly after enough text is collected,
+    # rather than tokenizing the rest of a large page.
+    for start in range(0, len(html), FEED_CHUNK_CHARS):
+        parser.feed(html[start:start + FEED_CHUNK_CHARS])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return _clean("".join(parser.parts))[:max_chars].rstrip()
+
+
+EXTRACTORS: Dict[str, Callable[[str, int], str]] = {
+    "soup": soup_extract,
+    "streaming": streaming_extract,
+}
+
+
+def get_extractor(name: Optional[str] = None) -> Callable[[str, int], str]:
+    """Look up an extractor by name (default: the EXTRACTOR env var, else streaming)."""
+    name = name or os.getenv("EXTRACTOR", "streaming")
+    try:
+        return EXTRACTORS[name]
+    except KeyError as exc:
+        raise ValueError(
+            f"Unknown extractor {name!r}; choose from {sorted(EXTRACTORS)}"
+        ) from exc
@@ -0,0 +1,285 @@
+"""
+Offline stand-ins for the external services used by the backend.
+
+They mimic the response shapes of the real SDK clients closely enough for the
+code in this package, with configurable latency, so throughput and latency can
+be measured without network access or API keys.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from vector_store import matches_filter
+
+FAKE_EMBEDDING_DIM = 1536
+
+
+def _word_slot(word: str, dim: int) -> Tuple[int, float]:
+    digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "big")
+    return value % dim, 1.0 if (value >> 32) & 1 else -1.0
+
+
+def fake_embedding(text: str, dim: int = FAKE_EMBEDDING_DIM) -> List[float]:
+    """
+    Deterministic unit vector from hashed bag-of-words features, so texts that
+    share vocabulary land close together (enough for retrieval/MMR tests).
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in text.lower().split():
+        slot, sign = _word_slot(word.strip(".,;:!?()\"'"), dim)
+        vec[slot] += sign
+    norm = float(np.linalg.norm(vec))
+    if norm == 0:
+        vec[0] = 1.0
+        norm = 1.0
+    return (vec / norm).tolist()
+
+
+class FakeEmbeddings:
+    """Same call shape as ``openai.OpenAI().embeddings``."""
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.05,
+        per_input_latency: float = 0.0005,
+        dim: int = FAKE_EMBEDDING_DIM,
+    ) -> None:
+        self.latency = latency
+        self.per_input_latency = per_input_latency
+        self.dim = dim
+        self.calls = 0
+        self.inputs = 0
+        self._lock = threading.Lock()
+
+    def create(
+        self, *, model: str, input: Union[str, Sequence[str]]  # pylint: disable=redefined-builtin
+    ) -> Any:
+        texts = [input] if isinstance(input, str) else list(input)
+        with self._lock:
+            self.calls += 1
+            self.inputs += len(texts)
+        time.sleep(self.latency + self.per_input_latency * len(texts))
+        data = [
+            SimpleNamespace(index=i, embedding=fake_embedding(text, self.dim))
+            for i, text in enumerate(texts)
+        ]
+        return SimpleNamespace(model=model, data=data)
+
+
+class FakeChatCompletions:
+    """
+    Same call shape as ``openai.OpenAI().chat.completions``. Time to first
+    token grows with prompt size (``latency + prompt_tokens *
+    prompt_token_latency``), then ``output_tokens`` words are produced at
+    ``token_latency`` each. Token counts use the ~4 chars/token estimate.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.5,
+        prompt_token_latency: float = 0.0001,
+        token_latency: float = 0.002,
+        output_tokens: int = 400,
+    ) -> None:
+        self.latency = latency
+        self.prompt_token_latency = prompt_token_latency
+        self.token_latency = token_latency
+        self.output_tokens = output_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self._lock = threading.Lock()
+
+    def create(self, *, model: str, messages: List[Dict[str, str]],
+               stream: bool = False, **_: Any) -> Any:
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+        words = [f"insight{i % 50}" for i in range(self.output_tokens)]
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(words),
+            total_tokens=prompt_tokens + len(words),
+        )
+        time.sleep(self.latency + prompt_tokens * self.prompt_token_latency)
+        if stream:
+            return self._stream(model, words, usage)
+        time.sleep(self.token_latency * len(words))
+        message = SimpleNamespace(role="assistant", content=" ".join(words))
+        return SimpleNamespace(
+            model=model, choices=[SimpleNamespace(index=0, message=message)], usage=usage
+        )
+
+    def _stream(self, model: str, words: List[str], usage: Any) -> Iterator[Any]:
+        for i, word in enumerate(words):
+            time.sleep(self.token_latency)
+            delta = SimpleNamespace(content=word if i == 0 else " " + word)
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta)],
+                                  usage=None)
+        yield SimpleNamespace(model=model, choices=[], usage=usage)
+
+
+class FakeOpenAI:
+    """Minimal ``openai.OpenAI`` replacement exposing ``.embeddings`` and ``.chat``."""
+
+    def __init__(self, *, chat: Optional[Dict[str, Any]] = None,
+                 **embedding_kwargs: Any) -> None:
+        self.embeddings = FakeEmbeddings(**embedding_kwargs)
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(**(chat or {})))
+
+
+class FakePineconeIndex:
+    """
+    Pinecone ``Index`` stand-in: exact in-memory search plus a fixed per-call
+    delay that models the network round trip to the hosted service.
+    """
+
+    def __init__(self, *, latency: float = 0.03) -> None:
+        self.latency = latency
+        self.calls = 0
+        self._vectors: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._order: List[str] = []
+
+    def _round_trip(self) -> None:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+    def upsert(self, vectors: Sequence[Dict[str, Any]], **_: Any) -> Dict[str, int]:
+        self._round_trip()
+        with self._lock:
+            for v in vectors:
+                self._vectors[v["id"]] = {
+                    "id": v["id"],
+                    "values": list(v["values"]),
+                    "metadata": dict(v.get("metadata") or {}),
+                }
+            self._matrix = None
+        return {"upserted_count": len(vectors)}
+
+    def update(
+        self,
+        id: str,  # pylint: disable=redefined-builtin
+        values: Optional[Sequence[float]] = None,
+        set_metadata: Optional[Dict[str, Any]] = None,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            vec = self._vectors.get(id)
+            if vec is not None:
+                if values is not None:
+                    vec["values"] = list(values)
+                    self._matrix = None
+                if set_metadata:
+                    vec["metadata"].update(set_metadata)
+        return {}
+
+    def fetch(self, ids: Sequence[str], **_: Any) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            return {"vectors": {i: self._vectors[i] for i in ids if i in self._vectors}}
+
+    def delete(self, ids: Optional[Sequence[str]] = None, delete_all: bool = False,
+               **_: Any) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            if delete_all:
+                self._vectors.clear()
+            for i in ids or []:
+                self._vectors.pop(i, None)
+            self._matrix = None
+        return {}
+
+    def query(self, *, vector: Sequence[float], top_k: int = 10,
+              include_metadata: bool = False, include_values: bool = False,
+              filter: Optional[Dict[str, Any]] = None,  # pylint: disable=redefined-builtin
+              **_: Any) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            matches = []
+            for vid, score in self._ranked(vector, filter)[:top_k]:
+                vec = self._vectors[vid]
+                match: Dict[str, Any] = {"id": vec["id"], "score": score}
+                if include_metadata:
+                    match["metadata"] = dict(vec["metadata"])
+                if include_values:
+                    match["values"] = list(vec["values"])
+                matches.append(match)
+            return {"matches": matches}
+
+    def _ranked(
+        self, vector: Sequence[float], metadata_filter: Optional[Dict[str, Any]]
+    ) -> List[Tuple[str, float]]:
+        """(id, cosine score) of the vectors matching the filter, best first; lock held."""
+        if self._matrix is None:
+            self._order = list(self._vectors)
+            self._matrix = np.array(
+                [self._vectors[i]["values"] for i in self._order], dtype=np.float32
+            ).reshape(len(self._order), -1)
+        candidates = [
+            row for row, vid in enumerate(self._order)
+            if matches_filter(self._vectors[vid]["metadata"], metadata_filter)
+        ]
+        if not candidates:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        sub = self._matrix[candidates]
+        norms = np.linalg.norm(sub, axis=1) * (np.linalg.norm(q) or 1.0)
+        norms[norms == 0] = 1.0
+        scores = (sub @ q) / norms
+        return [(self._order[candidates[pos]], float(scores[pos])) for pos in np.argsort(-scores)]
+
+    def describe_index_stats(self, **_: Any) -> Dict[str, Any]:
+        self._round_trip()
+        with self._lock:
+            return {"total_vector_count": len(self._vectors)}
+
+
+class FakeSearch:
+    """
+    SerpAPI stand-in: call with SerpAPI params, get a response dict with
+    deterministic ``organic_results``. Links point at ``link_template``
+    (formatted with ``i``, the 0-based index, and ``position``) so they can
+    target a local server.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.3,
+        link_template: str = "https://www.example-daf-{i}.org/",
+    ) -> None:
+        self.latency = latency
+        self.link_template = link_template
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        query = str(params.get("q", ""))
+        results = [
+            {
+                "position": i + 1,
+                "title": f"Result {i + 1} for {query}",
+                "link": self.link_template.format(i=i, position=i + 1),
+                "snippet": (
+                    f"Example provider {i} offers donor-advised funds, grant "
+                    f"recommendations and charitable planning ({query})."
+                ),
+            }
+            for i in range(int(params.get("num", 10)))
+        ]
+        return {"search_parameters": params, "organic_results": results}
@@ -0,0 +1,71 @@
+"""
+Content fingerprints for incremental re-crawls.
+
+``content_hash`` catches byte-identical text after whitespace/case
+normalization. ``simhash`` is a 64-bit locality-sensitive hash over word
+shingles: small edits (a date, a counter, a rotated banner) flip only a few
+bits, so two versions whose SimHashes differ by at most
+SIMHASH_MAX_DISTANCE bits are treated as the same content.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from typing import Any, Dict, Optional
+
+SIMHASH_BITS = 64
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "3"))
+SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_for_fingerprint(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_for_fingerprint(text).encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> str:
+    """64-bit SimHash of the text's word shingles, as 16 hex digits."""
+    words = normalize_for_fingerprint(text).split()
+    shingles = [
+        " ".join(words[i:i + SHINGLE_WORDS])
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    ]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    result = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    return f"{result:016x}"
+
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def fingerprint(text: str) -> Dict[str, str]:
+    """Metadata fields stored on the company vector."""
+    return {"content_hash": content_hash(text), "simhash": simhash(text)}
+
+
+def content_changed(
+    metadata: Dict[str, Any],
+    new: Dict[str, str],
+    max_distance: Optional[int] = None,
+) -> bool:
+    """True unless ``new`` matches the stored fingerprint exactly or within ``max_distance``."""
+    old_hash = metadata.get("content_hash")
+    old_simhash = metadata.get("simhash")
+    if not old_hash or not old_simhash:
+        return True  # stored before fingerprints existed
+    if old_hash == new["content_hash"]:
+        return False
+    limit = SIMHASH_MAX_DISTANCE if max_distance is None else max_distance
+    return hamming_distance(old_simhash, new["simhash"]) > limit
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, Mapping, Optional
+
+import requests
+from disk_cache import DiskCache, cache_file
+from requests.adapters import HTTPAdapter
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+from tracing import count_cache, span
+from utils import canonicalize_url, run_blocking
+
+DEFAULT_USER_AGENT = "CompetitorAnalyzer/1.0 (+https://github.com/nbam1)"
+DEFAULT_MAX_BYTES = 2_000_000
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    text: str
+    not_modified: bool = False  # served from the local cache after a 304
+    truncated: bool = False  # body was cut off at max_bytes
+
+
+def _decode(body: bytes, headers: Mapping[str, str]) -> str:
+    encoding = "utf-8"
+    # requests falls back to ISO-8859-1 for text/* without a charset; most pages are UTF-8.
+    if "charset" in headers.get("Content-Type", "").lower():
+        encoding = get_encoding_from_headers(headers) or encoding
+    try:
+        return body.decode(encoding, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+class HostLimiter:
+    """
+    Per-host concurrency cap shared by threads and event loops.
+
+    Sync and async callers draw from the same slots, so mixing ``fetch`` and
+    ``fetch_async`` never puts more than ``limit`` requests on one host. A
+    released slot is handed straight to the oldest waiter of either kind.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {}
+        self._waiters: Dict[str, Deque[Callable[[], None]]] = {}
+
+    def _acquire_or_wait(self, host: str, wake: Callable[[], None]) -> bool:
+        """Take a free slot, or queue ``wake`` to be called with one; True if taken."""
+        with self._lock:
+            if self._active.get(host, 0) < self.limit:
+                self._active[host] = self._active.get(host, 0) + 1
+                return True
+            self._waiters.setdefault(host, deque()).append(wake)
+            return False
+
+    def _cancel_wait(self, host: str, wake: Callable[[], None]) -> bool:
+        """Drop a queued waiter; False if it was already handed a slot."""
+        with self._lock:
+            waiters = self._waiters.get(host)
+            if waiters is None or wake not in waiters:
+                return False
+            waiters.remove(wake)
+            if not waiters:
+                del self._waiters[host]
+            return True
+
+    def in_use(self, host: str) -> int:
+        """Slots currently held for ``host``."""
+        with self._lock:
+            return self._active.get(host, 0)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Held slots and queued waiters per host, for hosts with either."""
+        with self._lock:
+            return {
+                host: {
+                    "active": self._active.get(host, 0),
+                    "waiting": len(self._waiters.get(host, ())),
+                }
+                for host in set(self._active) | set(self._waiters)
+            }
+
+    def release(self, host: str) -> None:
+        with self._lock:
+            waiters = self._waiters.get(host)
+            if waiters:
+                wake = waiters.popleft()
+                if not waiters:
+                    del self._waiters[host]
+            else:
+                wake = None
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+        if wake is not None:
+            wake()  # the slot passes to the waiter without being freed
+
+    @contextmanager
+    def slot(self, host: str) -> Iterator[None]:
+        ready = threading.Event()
+        if not self._acquire_or_wait(host, ready.set):
+            ready.wait()
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    @asynccontextmanager
+    async def slot_async(self, host: str) -> AsyncIterator[None]:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def _grant() -> None:
+            if granted.cancelled():
+                self.release(host)
+            else:
+                granted.set_result(None)
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(_grant)
+
+        if not self._acquire_or_wait(host, wake):
+            try:
+                await granted
+            except asyncio.CancelledError:
+                # Already handed a slot: _grant releases it if the future was
+                # cancelled, otherwise it was granted and must be given back.
+                handed_over = not self._cancel_wait(host, wake)
+                if handed_over and granted.done() and not granted.cancelled():
+                    self.release(host)
+                raise
+        try:
+            yield
+        finally:
+            self.release(host)
+
+
+class Fetcher:
+    """
+    Pooled keep-alive HTTP fetcher with conditional requests.
+
+    One ``requests.Session`` is shared so connections (and TLS sessions) are
+    reused across pages. Responses carrying an ETag or Last-Modified header
+    are kept in a local cache and revalidated with If-None-Match /
+    If-Modified-Since, so unchanged pages come back as cheap 304s. Bodies are
+    streamed and cut off at ``max_bytes``, and concurrent requests are capped
+    per host across the sync and async entry points together.
+    """
+
+    def __init__(
+        self,
+        *,
+        cache: Optional[DiskCache] = None,
+        timeout: float = 10,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        per_host_limit: int = 2,
+        pool_size: int = 32,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ) -> None:
+        self.cache = cache
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.per_host_limit = per_host_limit
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts = HostLimiter(per_host_limit)
+
+    def fetch(self, url: str) -> FetchResult:
+        with self._hosts.slot(canonicalize_url(url)):
+            return self._fetch(url)
+
+    async def fetch_async(self, url: str) -> FetchResult:
+        async with self._hosts.slot_async(canonicalize_url(url)):
+            return await run_blocking(self._fetch, url)
+
+    def _fetch(self, url: str) -> FetchResult:
+        with span("fetch", dependency="sites", url=url) as current:
+            result = self._request(url)
+            current.set(http_status=result.status)
+        if self.cache is not None:
+            count_cache("http", "hit" if result.not_modified else "miss")
+        return result
+
+    def _request(self, url: str) -> FetchResult:
+        cached = self.cache.get(url) if self.cache is not None else None
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+            if resp.status_code == 304 and cached:
+                return FetchResult(url=url, status=304, text=cached["text"], not_modified=True)
+
+            body = bytearray()
+            truncated = False
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                body.extend(chunk)
+                if len(body) >= self.max_bytes:
+                    del body[self.max_bytes:]
+                    truncated = True
+                    break
+
+            text = _decode(bytes(body), resp.headers)
+
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            if self.cache is not None and resp.ok and (etag or last_modified):
+                self.cache.set(
+                    url, {"etag": etag, "last_modified": last_modified, "text": text}
+                )
+            return FetchResult(url=url, status=resp.status_code, text=text, truncated=truncated)
+
+
+# Shared fetcher used by the scraper and the ingestion pipeline
+FETCHER = Fetcher(
+    cache=DiskCache(
+        os.getenv("HTTP_CACHE_PATH", cache_file("http.sqlite3")),
+        max_entries=int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "20000")),
+        max_bytes=int(os.getenv("HTTP_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    ),
+    max_bytes=int(os.getenv("HTTP_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+)
@@ -0,0 +1,358 @@
+"""
+Durable ingestion job queue on SQLite, plus the async workers that drain it.
+
+Request handlers enqueue URLs and return immediately; workers (in the API
+process, in other uvicorn workers, or standalone via ``python job_queue.py``)
+claim jobs by priority and run them through the IngestionPipeline. There is
+one row per company ID (``make_company_id``), so a host is only ever queued
+once: enqueueing it again returns the existing job, and a finished job keeps
+it from being scraped again after a restart. Claims run in an IMMEDIATE
+transaction, so any number of processes can share one queue file; a job
+whose worker died is picked up again once its lease expires (counting as an
+attempt). Each claim hands out a lease token, and only the holder of the
+current lease can complete or fail the job.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from disk_cache import cache_file
+from pipeline import IngestionPipeline, IngestItem, IngestResult
+from tracing import REQUEST_ID, span
+from utils import make_company_id, run_blocking
+
+# Higher runs first: URLs a user is waiting on go ahead of bulk seeding.
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BACKGROUND = 0
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 30.0  # seconds, doubled on each further attempt
+LEASE_SECONDS = 300.0
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["item"] = json.loads(job["item"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of ingestion jobs (queued -> running -> done | failed).
+
+    Failed attempts are retried with exponential backoff up to
+    ``max_attempts``; after that the job stays ``failed`` until it is
+    enqueued again. Safe to share between threads and processes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_backoff: float = RETRY_BACKOFF,
+        lease_seconds: float = LEASE_SECONDS,
+    ) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " company_id TEXT NOT NULL UNIQUE,"
+            " item TEXT NOT NULL,"
+            " priority INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " run_after REAL NOT NULL,"
+            " lease_until REAL,"
+            " worker TEXT,"
+            " lease TEXT,"
+            " error TEXT NOT NULL DEFAULT '',"
+            " result TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "lease" not in columns:  # queue files created before lease tokens
+            self._db.execute("ALTER TABLE jobs ADD COLUMN lease TEXT")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, run_after)"
+        )
+
+    def enqueue(self, item: IngestItem, *, priority: int = PRIORITY_BACKGROUND) -> int:
+        return self.enqueue_many([item], priority=priority)[0]
+
+    def enqueue_many(
+        self, items: Iterable[IngestItem], *, priority: int = PRIORITY_BACKGROUND
+    ) -> List[int]:
+        """
+        Queue items and return their job IDs (one per item, in order).
+
+        A company that already has a job keeps it: a queued job is bumped to
+        ``priority`` if that is higher (and marked ``refresh`` if the item
+        asks for one), a running job is left alone, a failed job is reset for
+        a fresh set of attempts, and a done job is left alone unless the item
+        asks for a refresh.
+        """
+        now = time.time()
+        ids: List[int] = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for item in items:
+                    company_id = make_company_id(item.url)
+                    self._db.execute(
+                        "INSERT INTO jobs (company_id, item, priority, status, run_after,"
+                        " created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?)"
+                        " ON CONFLICT (company_id) DO UPDATE SET"
+                        "  priority = MAX(priority, excluded.priority),"
+                        "  item = CASE WHEN ? THEN json_set(item, '$.refresh', json('true'))"
+                        "   ELSE item END,"
+                        "  updated_at = excluded.updated_at"
+                        " WHERE status = 'queued'",
+                        (company_id, json.dumps(asdict(item)), priority, now, now, now,
+                         item.refresh),
+                    )
+                    # Refresh items also requeue finished jobs (the pipeline
+                    # then decides whether the site is due for a re-crawl).
+                    requeue = "('failed', 'done')" if item.refresh else "('failed')"
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'queued', attempts = 0, error = '',"
+                        " priority = ?, item = ?, run_after = ?, updated_at = ?"
+                        f" WHERE company_id = ? AND status IN {requeue}",
+                        (priority, json.dumps(asdict(item)), now, now, company_id),
+                    )
+                    row = self._db.execute(
+                        "SELECT id FROM jobs WHERE company_id = ?", (company_id,)
+                    ).fetchone()
+                    ids.append(row["id"])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return ids
+
+    def claim(self, worker: str, limit: int = 1) -> List[Dict[str, Any]]:
+        """
+        Take up to ``limit`` ready jobs, highest priority first, for ``worker``.
+        Each returned job carries the ``lease`` token that ``complete`` and
+        ``fail`` need. A job whose lease expired on its last attempt is failed
+        rather than claimed again.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired',"
+                    " lease_until = NULL, lease = NULL, updated_at = ?"
+                    " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                rows = self._db.execute(
+                    "SELECT * FROM jobs WHERE"
+                    " (status = 'queued' AND run_after <= ?)"
+                    " OR (status = 'running' AND lease_until < ?)"
+                    " ORDER BY priority DESC, id LIMIT ?",
+                    (now, now, limit),
+                ).fetchall()
+                jobs = [_row_to_job(row) for row in rows]
+                for job in jobs:
+                    job.update(
+                        status="running", attempts=job["attempts"] + 1, worker=worker,
+                        lease=uuid.uuid4().hex, lease_until=now + self.lease_seconds,
+                    )
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = ?, worker = ?,"
+                        " lease = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                        (job["attempts"], worker, job["lease"], job["lease_until"], now,
+                         job["id"]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return jobs
+
+    def complete(self, job: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        """Mark a claimed job done; False if its lease was lost (expired and reclaimed)."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'done', error = '', result = ?, lease_until = NULL,"
+                " lease = NULL, updated_at = ?"
+                " WHERE id = ? AND status = 'running' AND worker = ? AND lease = ?",
+                (json.dumps(result), time.time(), job["id"], job["worker"], job["lease"]),
+            )
+        return cursor.rowcount == 1
+
+    def fail(
+        self, job: Dict[str, Any], error: str, result: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Record a failed attempt of a claimed job; returns the new status
+        (queued for a retry, or failed), or "lost" if its lease was lost.
+        """
+        attempts = job["attempts"]
+        status = "queued" if attempts < self.max_attempts else "failed"
+        now = time.time()
+        run_after = now + self.retry_backoff * 2 ** max(0, attempts - 1)
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, run_after = ?,"
+                " lease_until = NULL, lease = NULL, updated_at = ?"
+                " WHERE id = ? AND status = 'running' AND worker = ? AND lease = ?",
+                (status, error, json.dumps(result) if result else None, run_after, now,
+                 job["id"], job["worker"], job["lease"]),
+            )
+        return status if cursor.rowcount == 1 else "lost"
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def get_many(self, job_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        ids = list(dict.fromkeys(job_ids))
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM jobs WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def job_summary(jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compact status of the jobs behind one request, for API responses."""
+    counts: Dict[str, int] = {}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+    return {"jobs": [job["id"] for job in jobs], "counts": counts}
+
+
+class IngestWorkers:  # pylint: disable=too-many-instance-attributes  # settings + run state
+    """
+    Pool of async workers draining a JobQueue through one IngestionPipeline.
+
+    Each worker claims up to ``batch_size`` jobs at a time so they share the
+    pipeline's bulk existence check and batched upserts. Results with status
+    upserted, exists, unchanged or duplicate complete the job; anything else
+    counts as a failed attempt.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        pipeline: IngestionPipeline,
+        *,
+        concurrency: int = 2,
+        batch_size: int = 8,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self.queue = queue
+        self.pipeline = pipeline
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.name = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        self._stopping = False
+        self._tasks = [
+            asyncio.ensure_future(self._work(f"{self.name}/{i}"))
+            for i in range(self.concurrency)
+        ]
+
+    async def join(self) -> None:
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def stop(self) -> None:
+        """Let in-flight batches finish, then stop polling."""
+        self._stopping = True
+        await self.join()
+        self._tasks = []
+
+    async def run_once(self, worker: Optional[str] = None) -> int:
+        """Claim and run one batch; returns the number of jobs processed."""
+        jobs = await run_blocking(self.queue.claim, worker or self.name, self.batch_size)
+        if not jobs:
+            return 0
+        # Background work has no HTTP request; tag its spans with the batch instead.
+        token = REQUEST_ID.set(f"jobs-{jobs[0]['id']}")
+        try:
+            with span("ingest", jobs=len(jobs)):
+                report = await self.pipeline.ingest_many(
+                    IngestItem(**job["item"]) for job in jobs
+                )
+        finally:
+            REQUEST_ID.reset(token)
+        for job, result in zip(jobs, report.results):
+            await run_blocking(self._record, job, result)
+        return len(jobs)
+
+    def _record(self, job: Dict[str, Any], result: IngestResult) -> None:
+        if result.status in ("upserted", "exists", "unchanged", "duplicate"):
+            if not self.queue.complete(job, result.as_dict()):
+                print(f"Ingest job {job['id']} ({result.url}) finished after its lease expired")
+            return
+        status = self.queue.fail(job, result.error or result.status, result.as_dict())
+        print(f"Ingest job {job['id']} ({result.url}) failed, now {status}: {result.error}")
+
+    async def _work(self, worker: str) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.run_once(worker)
+            except Exception as exc:  # pylint: disable=broad-except
+                # Claimed jobs come back once their lease expires.
+                print(f"Ingest worker {worker} error: {exc}")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+
+
+def default_queue() -> JobQueue:
+    return JobQueue(os.getenv("JOB_QUEUE_PATH", cache_file("jobs.sqlite3")))
+
+
+async def _run_forever(concurrency: int) -> None:
+    from common import INDEX  # pylint: disable=import-outside-toplevel
+
+    with IngestionPipeline(INDEX) as pipeline:
+        workers = IngestWorkers(default_queue(), pipeline, concurrency=concurrency)
+        workers.start()
+        print(f"Ingest workers {workers.name} x{concurrency} running; Ctrl+C to stop")
+        await workers.join()
+
+
+if __name__ == "__main__":
+    asyncio.run(_run_forever(int(os.getenv("INGEST_WORKERS", "2"))))
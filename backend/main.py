@@ -1,19 +1,34 @@
 from __future__ import annotations
 
+import sys
 from typing import List
 
 from common import INDEX
-from services import upsert_from_url
+from pipeline import IngestItem, IngestReport
+from services import upsert_from_urls
 
 
-def seed_once(urls: List[str]) -> None:
-    for i, url in enumerate(urls):
-        upsert_from_url(
-            INDEX,
-            url,
-            snippet="",
-            extra_metadata={"source": "manual", "position": i},
-        )
+def seed_once(urls: List[str], refresh: bool = False) -> IngestReport:
+    """
+    Ingest ``urls``. With ``refresh``, already indexed sites older than the
+    freshness window are re-crawled and re-embedded only if their text changed.
+    """
+    report = upsert_from_urls(
+        INDEX,
+        [
+            IngestItem(
+                url=url,
+                extra_metadata={"source": "manual", "position": i},
+                refresh=refresh,
+            )
+            for i, url in enumerate(urls)
+        ],
+    )
+    for result in report.results:
+        detail = result.error or "; ".join(result.warnings)
+        print(f"{result.status:9s} {result.company_id} {result.url} {detail}".rstrip())
+    print(f"Summary: {report.summary()}")
+    return report
 
 
 if __name__ == "__main__":
@@ -23,4 +38,4 @@ if __name__ == "__main__":
         "https://www.schwabcharitable.org/",
         "https://www.dafgiving360.org/",
     ]
-    seed_once(SEED_URLS)
+    seed_once(SEED_URLS, refresh="--refresh" in sys.argv[1:])
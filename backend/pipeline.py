@@ -0,0 +1,482 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import openai
+import pinecone
+import requests
+from crawler import CRAWLER
+from embed_and_store import build_site_vectors, enrich_content, needs_enrichment, passage_id
+from fingerprint import content_changed, fingerprint
+from result_cache import INDEX_GENERATION, IndexGeneration
+from tracing import span
+from utils import (EXECUTOR, canonicalize_url, existing_vector_metadata, make_company_id,
+                   run_blocking)
+
+
+# Try to import Pinecone's base exception in a version-agnostic way.
+try:
+    from pinecone.exceptions import \
+      PineconeException as _PineconeError  # type: ignore
+except ImportError:
+    class _PineconeError(Exception):  # type: ignore
+        """Fallback Pinecone exception base class."""
+
+
+# Errors that fail a single URL without aborting the rest of the batch.
+INGEST_ERRORS = (
+    openai.OpenAIError,
+    _PineconeError,
+    ValueError,
+    KeyError,
+    TypeError,
+)
+
+# Max number of in-flight calls per stage, across all URLs in the pipeline. Each
+# stage also gets a thread pool of that size, so the caps are not squeezed
+# under the loop's shared default executor (min(32, CPUs + 4) threads).
+DEFAULT_STAGE_LIMITS: Dict[str, int] = {
+    "exists": 8,
+    "fetch": 8,  # page, robots.txt and sitemap requests
+    "parse": 4,
+    "enrich": 4,
+    "embed": 32,  # calls are coalesced into batched requests by EMBEDDER
+    "upsert": 4,
+}
+
+# Pinecone caps an upsert request at 1000 vectors and 2 MB; stay well under both.
+UPSERT_BATCH_SIZE = 100
+UPSERT_BATCH_BYTES = 1_500_000
+UPSERT_RETRIES = 3
+UPSERT_BACKOFF = 0.5  # seconds, doubled on each retry
+
+# Refresh items re-crawl indexed sites whose last crawl is older than this.
+REFRESH_MAX_AGE = float(os.getenv("REFRESH_MAX_AGE", str(7 * 24 * 3600)))
+
+
+@dataclass
+class IngestItem:
+    url: str
+    snippet: str = ""
+    name: Optional[str] = None
+    extra_metadata: Optional[Dict[str, Any]] = None
+    # Re-crawl even if indexed, once the stored crawl is older than REFRESH_MAX_AGE.
+    refresh: bool = False
+
+
+@dataclass
+class IngestResult:
+    url: str
+    company_id: str
+    status: str = "failed"  # upserted | exists | unchanged | duplicate | failed
+    error: str = ""
+    warnings: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class IngestReport:
+    """Per-ID results of one batch plus total seconds spent in each stage."""
+
+    results: List[IngestResult] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + seconds, 4)
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for result in self.results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        return counts
+
+    def summary(self) -> Dict[str, Any]:
+        return {"counts": self.counts(), "timings": self.timings}
+
+
+def _estimate_vector_bytes(vector: Dict[str, Any]) -> int:
+    # ~12 bytes per float once JSON-encoded, plus the metadata payload.
+    return 12 * len(vector["values"]) + len(json.dumps(vector.get("metadata") or {}))
+
+
+def batch_vectors(
+    vectors: List[Dict[str, Any]],
+    *,
+    max_count: int = UPSERT_BATCH_SIZE,
+    max_bytes: int = UPSERT_BATCH_BYTES,
+) -> List[List[Dict[str, Any]]]:
+    """Split vectors into upsert requests bounded by count and estimated size."""
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    size = 0
+    for vector in vectors:
+        cost = _estimate_vector_bytes(vector)
+        if current and (len(current) >= max_count or size + cost > max_bytes):
+            batches.append(current)
+            current, size = [], 0
+        current.append(vector)
+        size += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+@dataclass
+class _Stage:
+    """One stage's concurrency cap, its thread pool and (per event loop) its semaphore."""
+
+    limit: int
+    executor: ThreadPoolExecutor
+    semaphore: Optional[asyncio.Semaphore] = None
+
+
+class _HostPacer:
+    """Spaces out requests to the same host by at least ``delay`` seconds."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last: Dict[str, float] = {}
+
+    def reset(self) -> None:
+        self._locks = {}  # asyncio locks belong to the loop that created them
+
+    async def wait(self, host: str) -> None:
+        if self.delay <= 0:
+            return
+        async with self._locks.setdefault(host, asyncio.Lock()):
+            wait = self._last.get(host, 0.0) + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last[host] = time.monotonic()
+
+
+class IngestionPipeline:
+    """
+    Async exists -> fetch -> parse -> enrich -> embed -> upsert pipeline.
+
+    A batch starts with one multi-ID fetch to drop IDs already in the index;
+    only the missing ones are scraped and embedded, and the resulting vectors
+    are upserted in size-bounded batches with retry and backoff: all passage
+    vectors first, then the company vectors of sites whose passages landed.
+
+    Items marked ``refresh`` re-crawl indexed sites past the freshness
+    window. A site is only re-embedded when its extracted text changed
+    beyond the fingerprint tolerance (see fingerprint.py); otherwise just
+    its ``crawled_at`` is bumped and the result is ``unchanged``.
+
+    Each stage has its own concurrency cap and a thread pool of the same
+    size that its blocking calls run in (via ``utils.EXECUTOR``), so one
+    busy stage cannot starve another of threads; ``close()`` (or leaving a
+    ``with`` block) shuts those pools down. Sites are read by the
+    shared CRAWLER (a few pages each, through the pooled FETCHER, which
+    caps concurrency per host) with an optional delay before each site's
+    crawl, and concurrent batches that contain the same company ID share a
+    single ingestion instead of serializing on a lock. Every write to the
+    index bumps ``generation``, the content version cached results are
+    keyed on.
+    """
+
+    def __init__(
+        self,
+        index: pinecone.Index,
+        *,
+        stage_limits: Optional[Dict[str, int]] = None,
+        host_delay: float = 0.0,
+        generation: Optional[IndexGeneration] = None,
+    ) -> None:
+        self.index = index
+        self.generation = generation or INDEX_GENERATION
+        self.stages = {
+            stage: _Stage(limit, ThreadPoolExecutor(
+                max_workers=limit, thread_name_prefix=f"ingest-{stage}"
+            ))
+            for stage, limit in {**DEFAULT_STAGE_LIMITS, **(stage_limits or {})}.items()
+        }
+        self._hosts = _HostPacer(host_delay)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._completed: set[str] = set()
+
+    def close(self) -> None:
+        """Shut down the stage thread pools; the pipeline can't be used afterwards."""
+        for stage in self.stages.values():
+            stage.executor.shutdown()
+
+    def __enter__(self) -> "IngestionPipeline":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def _bind_loop(self) -> None:
+        # asyncio primitives belong to one loop; rebuild them if the loop changes
+        # (e.g. repeated asyncio.run() calls from the sync wrapper).
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        for stage in self.stages.values():
+            stage.semaphore = asyncio.Semaphore(stage.limit)
+        self._hosts.reset()
+        self._inflight = {}
+
+    @asynccontextmanager
+    async def _limit(self, stage: str) -> AsyncIterator[None]:
+        """Hold a slot of ``stage``; blocking calls inside run on its thread pool."""
+        state = self.stages[stage]
+        async with state.semaphore:
+            token = EXECUTOR.set(state.executor)
+            try:
+                yield
+            finally:
+                EXECUTOR.reset(token)
+
+    @asynccontextmanager
+    async def _stage(self, stage: str, timings: Dict[str, float]) -> AsyncIterator[None]:
+        async with self._limit(stage):
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                timings[stage] = round(
+                    timings.get(stage, 0.0) + time.perf_counter() - start, 4
+                )
+
+    async def ingest(self, item: IngestItem) -> IngestResult:
+        return (await self.ingest_many([item])).results[0]
+
+    async def ingest_many(self, items: Iterable[IngestItem]) -> IngestReport:
+        self._bind_loop()
+        report = IngestReport()
+        owned: Dict[str, IngestResult] = {}
+        owned_items: Dict[str, IngestItem] = {}
+        waits: List[asyncio.Future] = []
+
+        for item in items:
+            company_id = make_company_id(item.url)
+            result = IngestResult(url=item.url, company_id=company_id)
+            report.results.append(result)
+            if (company_id in self._completed and not item.refresh) or company_id in owned:
+                result.status = "duplicate"
+            elif company_id in self._inflight:
+                # Another batch is ingesting this company; wait for it below.
+                result.status = "duplicate"
+                waits.append(self._inflight[company_id])
+            else:
+                owned[company_id] = result
+                owned_items[company_id] = item
+
+        futures = {cid: asyncio.get_running_loop().create_future() for cid in owned}
+        self._inflight.update(futures)
+        try:
+            await self._ingest_owned(owned_items, owned, report)
+        finally:
+            for cid, future in futures.items():
+                del self._inflight[cid]
+                future.set_result(None)
+                if owned[cid].status in ("upserted", "exists", "unchanged"):
+                    self._completed.add(cid)
+
+        if waits:
+            await asyncio.gather(*(asyncio.shield(w) for w in waits))
+        for result in report.results:
+            for stage, seconds in result.timings.items():
+                report.add_time(stage, seconds)
+        return report
+
+    async def _ingest_owned(
+        self,
+        items: Dict[str, IngestItem],
+        results: Dict[str, IngestResult],
+        report: IngestReport,
+    ) -> None:
+        if not items:
+            return
+
+        start = time.perf_counter()
+        async with self._limit("exists"):
+            existing = await run_blocking(existing_vector_metadata, self.index, list(items))
+        report.add_time("exists", time.perf_counter() - start)
+
+        now = time.time()
+        todo: Dict[str, Optional[Dict[str, Any]]] = {}
+        for cid, item in items.items():
+            metadata = existing.get(cid)
+            if metadata is None:
+                todo[cid] = None
+            elif item.refresh and now - float(metadata.get("crawled_at") or 0) > REFRESH_MAX_AGE:
+                todo[cid] = metadata
+            else:
+                results[cid].status = "exists"
+
+        prepared = await asyncio.gather(
+            *(self._prepare(items[cid], results[cid], stored) for cid, stored in todo.items())
+        )
+        vectors = [vector for site_vectors in prepared for vector in site_vectors]
+        passages = [vector for vector in vectors if _owner_id(vector) != vector["id"]]
+
+        start = time.perf_counter()
+        # Passages first: a company ID only appears in the index (and counts as
+        # ingested) once every passage of its site has been written.
+        await asyncio.gather(
+            *(self._upsert_batch(batch, results) for batch in batch_vectors(passages))
+        )
+        companies = [
+            vector for vector in vectors
+            if _owner_id(vector) == vector["id"] and not results[vector["id"]].error
+        ]
+        await asyncio.gather(
+            *(self._upsert_batch(batch, results) for batch in batch_vectors(companies))
+        )
+        await self._delete_stale_passages(companies, todo, results)
+        report.add_time("upsert", time.perf_counter() - start)
+
+    async def _prepare(
+        self,
+        item: IngestItem,
+        result: IngestResult,
+        stored: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Scrape, enrich and embed one URL; returns its company + passage vectors.
+        ``stored`` is the current metadata of a site being refreshed.
+        """
+        timings = result.timings
+        host = canonicalize_url(item.url)
+        name = item.name or host
+
+        try:
+            text = ""
+            try:
+                await self._hosts.wait(host)
+                crawled = await CRAWLER.crawl(
+                    item.url, stage=lambda name: self._stage(name, timings)
+                )
+                text = crawled.text
+                if not text:
+                    result.warnings.append("scrape returned no text")
+            except requests.RequestException as exc:
+                result.warnings.append(f"scrape failed: {exc}")
+            if not text and stored is not None:
+                # Keep the indexed copy rather than replace it with a snippet.
+                result.status = "exists"
+                return []
+            content = text or item.snippet
+
+            # Fingerprint what the site says, before search snippets are mixed in.
+            prints = fingerprint(content)
+            crawled_at = time.time()
+            if stored is not None and not content_changed(stored, prints):
+                async with self._stage("upsert", timings):
+                    with span("upsert", dependency="pinecone", operation="update"):
+                        await run_blocking(
+                            self.index.update,
+                            id=result.company_id,
+                            set_metadata={"crawled_at": crawled_at},
+                        )
+                    await run_blocking(self.generation.bump)
+                result.status = "unchanged"
+                return []
+
+            if needs_enrichment(content):
+                async with self._stage("enrich", timings):
+                    content = await run_blocking(enrich_content, content, name)
+
+            if not content:
+                content = f"{name} ({item.url})"
+
+            async with self._stage("embed", timings):
+                return await run_blocking(
+                    build_site_vectors,
+                    company_id=result.company_id,
+                    name=name,
+                    url=item.url,
+                    content=content,
+                    extra_metadata={
+                        **(item.extra_metadata or {"domain": host}),
+                        **prints,
+                        "crawled_at": crawled_at,
+                    },
+                )
+        except INGEST_ERRORS as exc:
+            result.error = str(exc)
+            return []
+
+    async def _upsert_batch(
+        self, batch: List[Dict[str, Any]], results: Dict[str, IngestResult]
+    ) -> None:
+        owners = {_owner_id(vector) for vector in batch}
+        error = ""
+        for attempt in range(UPSERT_RETRIES):
+            if attempt:
+                await asyncio.sleep(UPSERT_BACKOFF * 2 ** (attempt - 1))
+            try:
+                async with self._limit("upsert"):
+                    with span("upsert", dependency="pinecone", vectors=len(batch),
+                              attempt=attempt + 1):
+                        resp = await run_blocking(self.index.upsert, vectors=batch)
+                    await run_blocking(self.generation.bump)
+            except INGEST_ERRORS as exc:
+                error = str(exc)
+                continue
+            upserted = _upserted_count(resp)
+            if upserted is None or upserted >= len(batch):
+                for owner in owners:
+                    # A site whose vectors span batches succeeds only if all of them did.
+                    if not results[owner].error:
+                        results[owner].status = "upserted"
+                return
+            # Partial write: upserts are idempotent, so resend the whole batch.
+            error = f"upserted {upserted} of {len(batch)} vectors"
+
+        for owner in owners:
+            results[owner].status = "failed"
+            results[owner].error = error
+
+    async def _delete_stale_passages(
+        self,
+        vectors: List[Dict[str, Any]],
+        stored: Dict[str, Optional[Dict[str, Any]]],
+        results: Dict[str, IngestResult],
+    ) -> None:
+        """Drop passages a re-embedded site no longer has (its text got shorter)."""
+        stale: List[str] = []
+        for vector in vectors:
+            cid = vector["id"]
+            previous = stored.get(cid)
+            if previous is None or results[cid].status != "upserted":
+                continue
+            old_count = int(previous.get("passages") or 0)
+            new_count = int(vector["metadata"].get("passages") or 0)
+            stale.extend(passage_id(cid, i) for i in range(new_count, old_count))
+        if not stale:
+            return
+        try:
+            async with self._limit("upsert"):
+                with span("delete", dependency="pinecone", ids=len(stale)):
+                    await run_blocking(self.index.delete, ids=stale)
+                await run_blocking(self.generation.bump)
+        except INGEST_ERRORS as exc:
+            print(f"Deleting {len(stale)} stale passages failed: {exc}")
+
+
+def _owner_id(vector: Dict[str, Any]) -> str:
+    """Company ID a vector belongs to (passages point at their parent)."""
+    return (vector.get("metadata") or {}).get("parent_id", vector["id"])
+
+
+def _upserted_count(resp: Any) -> Optional[int]:
+    if isinstance(resp, dict):
+        return resp.get("upserted_count")
+    return getattr(resp, "upserted_count", None)
@@ -0,0 +1,272 @@
+"""
+Map-reduce report generation for large competitor sets.
+
+The map step analyzes each competitor on its own against REPORT_CRITERIA,
+on a shared pool of ``concurrency`` threads, so wall-clock time follows the
+slowest section rather than the number of competitors. Sections are cached
+on disk under a hash of the prompt version, model, requesting company and
+the competitor's input text: a competitor whose stored content has not
+changed is not analyzed again. A short reduce call then ranks the
+competitors from the head of each section (rating and summary) and writes
+the overview. The report is that overview followed by the sections, highest
+danger rating first. A failed section is marked unavailable, and a failed
+reduce falls back to the sections alone, so one bad completion no longer
+loses the whole report; ``is_degraded`` tells callers not to keep such a
+report for long.
+"""
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from chunking import truncate_tokens
+from disk_cache import DiskCache
+from fingerprint import content_hash
+from tracing import Span, count_cache, log_event, record_llm_usage, span
+
+# "single": one completion over all competitors. "map_reduce": per-competitor
+# sections plus a reduce call. "auto": map-reduce from MAP_REDUCE_MIN_COMPETITORS.
+REPORT_MODES = ("auto", "single", "map_reduce")
+REPORT_MODE = os.getenv("REPORT_MODE", "auto")
+MAP_REDUCE_MIN_COMPETITORS = int(os.getenv("MAP_REDUCE_MIN_COMPETITORS", "8"))
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "16"))
+SECTION_CACHE_TTL = float(os.getenv("SECTION_CACHE_TTL", str(30 * 24 * 3600)))
+# Per-competitor input cap, and how much of each section the reduce call sees.
+SECTION_INPUT_TOKENS = 1500
+REDUCE_EXCERPT_TOKENS = 120
+# Bump when the section prompt changes so cached sections are not reused.
+SECTION_PROMPT_VERSION = "1"
+
+REPORT_CRITERIA = (
+    "Danger Rating (1 minimal risk — 5 maximum threat, with justification)",
+    "Customer Experience (CX) strategy",
+    "Target audience",
+    "Donor portal UX (clunky, intuitive, etc.)",
+    "Messaging approach",
+    "Cross-selling of financial/charitable services",
+    "Availability of a mobile website or app",
+)
+
+SYSTEM_MESSAGE = (
+    "You are a precise and analytical SaaS market research assistant. "
+    "First, rely on the provided scraped and stored data to produce the "
+    "analysis. If the provided data is insufficient to form a complete, "
+    "professional report, integrate relevant facts from the additional "
+    "context section."
+)
+
+_RATING_RE = re.compile(r"danger rating\W{0,8}([1-5])", re.IGNORECASE)
+# Stands in for a section whose completion failed.
+UNAVAILABLE_MARKER = "_Analysis unavailable:"
+
+
+def use_map_reduce(mode: Optional[str], competitor_count: int) -> bool:
+    """Whether a report over ``competitor_count`` matches should be map-reduced."""
+    mode = mode or REPORT_MODE
+    if mode not in REPORT_MODES:
+        raise ValueError(f"Unknown report mode {mode!r}; expected one of {REPORT_MODES}")
+    if mode == "auto":
+        return competitor_count >= MAP_REDUCE_MIN_COMPETITORS
+    return mode == "map_reduce"
+
+
+def is_degraded(report: str) -> bool:
+    """Whether a report has sections whose analysis failed."""
+    return UNAVAILABLE_MARKER in report
+
+
+def danger_rating(section: str) -> Optional[int]:
+    match = _RATING_RE.search(section)
+    return int(match.group(1)) if match else None
+
+
+def section_messages(user_company_name: str, name: str, text: str) -> List[Dict[str, str]]:
+    criteria = "\n".join(f"- {item}" for item in REPORT_CRITERIA)
+    prompt = (
+        f"Analyze '{name}' as a competitor of '{user_company_name}'.\n"
+        f"Start with one line 'Danger Rating: N/5 — <justification>', then a "
+        f"two-sentence summary, then cover:\n{criteria}\n"
+        "Be professional and consultative, and stay under 300 words."
+    )
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": f"{prompt}\n\n{name}: {text}"},
+    ]
+
+
+def reduce_messages(
+    user_company_name: str, sections: Sequence[Tuple[str, str]]
+) -> List[Dict[str, str]]:
+    excerpts = "\n\n".join(
+        f"{name}: {truncate_tokens(section, REDUCE_EXCERPT_TOKENS)}" for name, section in sections
+    )
+    prompt = (
+        f"Below are the opening lines of per-competitor analyses for "
+        f"'{user_company_name}'. Write a short executive overview: rank the "
+        "competitors by threat (name and danger rating, one line each), then "
+        "summarize the main patterns across them in a few sentences. Do not "
+        "repeat the individual analyses; they follow your overview."
+    )
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": f"{prompt}\n\n{excerpts}"},
+    ]
+
+
+def _content(resp: Any) -> str:
+    return (resp.choices[0].message.content or "").strip()
+
+
+class SectionedReporter:
+    """
+    Competitor report as concurrent per-competitor sections plus a reduce call.
+
+    ``entries`` are (name, input text) pairs, one per competitor; the text
+    should not depend on the request (e.g. the stored description and
+    external snippets, not query-ranked passages) so sections can be reused.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        model: str,
+        cache: Optional[DiskCache] = None,
+        cache_ttl: float = SECTION_CACHE_TTL,
+        concurrency: int = SECTION_CONCURRENCY,
+    ) -> None:
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        # Shared by every request, so the cap bounds concurrent section calls overall.
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, concurrency), thread_name_prefix="report-section"
+        )
+
+    def section_key(self, user_company_name: str, name: str, text: str) -> str:
+        blob = json.dumps([
+            SECTION_PROMPT_VERSION, self.model,
+            " ".join(user_company_name.lower().split()), name, content_hash(text),
+        ])
+        return "section:" + hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def section(self, user_company_name: str, name: str, text: str) -> str:
+        """Analysis of one competitor, from the cache when its input is unchanged."""
+        text = truncate_tokens(text, SECTION_INPUT_TOKENS)
+        key = self.section_key(user_company_name, name, text)
+        if self.cache is not None:
+            cached = self.cache.get(key, max_age=self.cache_ttl)
+            if cached is not None:
+                count_cache("sections", "hit")
+                return cached
+            count_cache("sections", "miss")
+
+        with span("llm", dependency="openai", operation="chat.completions.section",
+                  model=self.model, competitor=name):
+            resp = self.client.chat.completions.create(
+                model=self.model, messages=section_messages(user_company_name, name, text)
+            )
+            record_llm_usage(self.model, getattr(resp, "usage", None))
+        section = _content(resp)
+        if self.cache is not None and section:
+            self.cache.set(key, section)
+        return section
+
+    def sections(
+        self, user_company_name: str, entries: Sequence[Tuple[str, str]]
+    ) -> List[Tuple[str, str]]:
+        """(name, section) per entry, highest danger rating first (ties keep match order)."""
+        futures = [
+            # One context copy per call, so section spans keep the request ID.
+            self._pool.submit(
+                contextvars.copy_context().run, self.section, user_company_name, name, text
+            )
+            for name, text in entries
+        ]
+        results: List[Tuple[str, str]] = []
+        with span("sections", sections=len(entries)) as current:
+            failed = 0
+            for (name, _), future in zip(entries, futures):
+                try:
+                    results.append((name, future.result()))
+                except Exception as exc:  # pylint: disable=broad-except
+                    failed += 1
+                    log_event("section_failed", competitor=name, error=str(exc)[:200])
+                    results.append((name, f"{UNAVAILABLE_MARKER} {exc}_"))
+            current.set(failed=failed)
+        # Rank by position rather than name, so duplicate names keep their own slot.
+        ranked = sorted(
+            enumerate(results),
+            key=lambda item: (-(danger_rating(item[1][1]) or 0), item[0]),
+        )
+        return [result for _, result in ranked]
+
+    def report(self, user_company_name: str, entries: Sequence[Tuple[str, str]]) -> str:
+        sections = self.sections(user_company_name, entries)
+        try:
+            with span("llm", dependency="openai", operation="chat.completions.reduce",
+                      model=self.model, sections=len(sections)):
+                resp = self.client.chat.completions.create(
+                    model=self.model, messages=reduce_messages(user_company_name, sections)
+                )
+                record_llm_usage(self.model, getattr(resp, "usage", None))
+            overview = _content(resp)
+        except Exception as exc:  # pylint: disable=broad-except
+            log_event("overview_failed", error=str(exc)[:200])
+            overview = ""
+        return _assemble(overview, sections)
+
+    def stream(
+        self, user_company_name: str, entries: Sequence[Tuple[str, str]]
+    ) -> Iterator[str]:
+        """
+        Like ``report``, but streams the overview's deltas, then yields the
+        sections. If the overview fails, even part way, the sections still follow.
+        """
+        sections = self.sections(user_company_name, entries)
+        try:
+            with span("llm", dependency="openai", operation="chat.completions.reduce",
+                      model=self.model, sections=len(sections), stream=True) as current:
+                yield from stream_deltas(
+                    self.client, self.model, reduce_messages(user_company_name, sections),
+                    current,
+                )
+        except Exception as exc:  # pylint: disable=broad-except
+            log_event("overview_failed", error=str(exc)[:200], stream=True)
+        yield "\n\n" + _assemble("", sections)
+
+
+def stream_deltas(
+    client: Any, model: str, messages: List[Dict[str, str]], current: Span
+) -> Iterator[str]:
+    """
+    Text deltas of a streamed chat completion, with its token usage recorded
+    on ``current``. Closing the generator early closes the HTTP stream too.
+    """
+    with closing(client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        # The final chunk then carries the token usage (and no choices).
+        stream_options={"include_usage": True},
+    )) as stream:
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                record_llm_usage(model, chunk.usage, current)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+def _assemble(overview: str, sections: Sequence[Tuple[str, str]]) -> str:
+    body = "\n\n".join(f"### {name}\n\n{section}" for name, section in sections)
+    return f"{overview}\n\n{body}" if overview else body
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import pinecone
+from disk_cache import cache_file
+from tracing import count_cache
+from utils import run_blocking
+
+
+def result_key(
+    company_name: str, description: str, top_k: int, version: str, mode: str = ""
+) -> str:
+    """Cache key for one analysis; case and whitespace differences don't matter."""
+    name = " ".join(company_name.lower().split())
+    desc = " ".join(description.lower().split())
+    digest = hashlib.sha256(desc.encode("utf-8")).hexdigest()[:32]
+    key = f"{name}|{digest}|{top_k}|{version}"
+    return f"{key}|{mode}" if mode else key
+
+
+class IndexGeneration:
+    """
+    Persisted counter of writes to the vector index.
+
+    The ingestion pipeline bumps it after every upsert, metadata update and
+    delete, so it changes when stored content does even if the vector count
+    stays the same (a re-embedded or refreshed site). It lives in SQLite,
+    so API processes and queue workers sharing CACHE_DIR see each other's
+    writes.
+    """
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS generation ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+        )
+        self._db.execute("INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0)")
+        self._db.commit()
+
+    def bump(self) -> None:
+        with self._lock:
+            self._db.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+            self._db.commit()
+
+    def get(self) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM generation WHERE id = 0").fetchone()
+        return int(row[0]) if row else 0
+
+
+INDEX_GENERATION = IndexGeneration(
+    os.getenv("INDEX_GENERATION_PATH", cache_file("index_generation.sqlite3"))
+)
+
+
+def _stat(stats: Any, name: str) -> Any:
+    return stats.get(name) if isinstance(stats, dict) else getattr(stats, name, None)
+
+
+class IndexVersion:
+    """
+    Cheap version tag for the vector index, so cached results are keyed to
+    the corpus they were computed from: the vector count, the index's own
+    write generation when it reports one (LocalIndex), and the persisted
+    ``generation`` bumped by the ingestion pipeline. The lookup is memoized
+    for ``ttl`` seconds to keep it off the hot path.
+    """
+
+    def __init__(
+        self, index: pinecone.Index, ttl: float = 5.0,
+        generation: Optional[IndexGeneration] = None,
+    ) -> None:
+        self.index = index
+        self.ttl = ttl
+        self.generation = generation or INDEX_GENERATION
+        self._value = "unknown"
+        self._fetched_at = 0.0
+
+    def invalidate(self) -> None:
+        self._fetched_at = 0.0
+
+    def _read(self) -> str:
+        stats = self.index.describe_index_stats()
+        count = _stat(stats, "total_vector_count")
+        local = _stat(stats, "generation")
+        prefix = "unknown" if count is None else str(count)
+        if local is not None:
+            prefix = f"{prefix}.{local}"
+        return f"{prefix}.g{self.generation.get()}"
+
+    async def get(self) -> str:
+        if time.monotonic() - self._fetched_at < self.ttl:
+            return self._value
+        try:
+            self._value = await run_blocking(self._read)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Index version lookup failed, keeping {self._value}: {exc}")
+            return self._value
+        self._fetched_at = time.monotonic()
+        return self._value
+
+
+class ResultCache:
+    """
+    In-memory async result cache with TTL, stale-while-revalidate and
+    single-flight.
+
+    Entries younger than ``ttl`` are served as-is. Entries up to
+    ``ttl + stale_ttl`` old are served immediately while one background task
+    recomputes them. Concurrent misses for the same key share one
+    computation. At most ``max_entries`` results are kept (LRU).
+
+    ``ttl_for`` may give a value its own, usually shorter, fresh TTL (e.g. a
+    report missing some sections); returning None keeps ``ttl``.
+    """
+
+    def __init__(self, ttl: float = 900.0, stale_ttl: float = 3600.0,
+                 max_entries: int = 256,
+                 ttl_for: Optional[Callable[[Any], Optional[float]]] = None) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.ttl_for = ttl_for
+        self.counters: Dict[str, int] = {"hit": 0, "stale": 0, "miss": 0, "shared": 0}
+        # key -> (value, stored_at, fresh TTL)
+        self._entries: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        # Also keeps background refreshes referenced until they finish.
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def peek(self, key: str) -> Optional[Tuple[Any, str]]:
+        """Return (value, "hit" | "stale") without computing anything."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at, ttl = entry
+        age = time.monotonic() - stored_at
+        if age < ttl:
+            self._entries.move_to_end(key)
+            return value, "hit"
+        if age < ttl + self.stale_ttl:
+            return value, "stale"
+        del self._entries[key]
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        ttl = self.ttl_for(value) if self.ttl_for is not None else None
+        self._entries[key] = (value, time.monotonic(), self.ttl if ttl is None else ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, str]:
+        """Return (value, status) where status is hit, stale, miss or shared."""
+        cached = self.peek(key)
+        if cached is not None:
+            value, status = cached
+            if status == "stale" and key not in self._inflight:
+                self._start(key, compute).add_done_callback(self._finish_background)
+            self._count(status)
+            return value, status
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count("shared")
+            return await asyncio.shield(task), "shared"
+
+        self._count("miss")
+        return await asyncio.shield(self._start(key, compute)), "miss"
+
+    def _count(self, status: str) -> None:
+        self.counters[status] += 1
+        count_cache("results", status)
+
+    def _start(self, key: str, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        async def run() -> Any:
+            try:
+                value = await compute()
+                self.put(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return task
+
+    @staticmethod
+    def _finish_background(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Background refresh failed, serving stale result: {task.exception()}")
@@ -1,16 +1,25 @@
 import re
 
-import requests
-from bs4 import BeautifulSoup
+from extractors import get_extractor
+from http_client import FETCHER
 
 
 def clean_text(text):
     return re.sub(r'\s+', ' ', text).strip()
 
 
-def scrape_website(url, max_chars=5000):
-    response = requests.get(url, timeout=10)
-    soup = BeautifulSoup(response.text, "html.parser")
-    elements = soup.find_all(["p", "h1", "h2", "h3", "h4"])
-    raw_text = " ".join([el.get_text() for el in elements])
-    return clean_text(raw_text[:max_chars])
+def fetch_html(url):
+    return FETCHER.fetch(url).text
+
+
+def extract_text(html, max_chars=5000, extractor=None):
+    return get_extractor(extractor)(html, max_chars)
+
+
+def scrape_website(url, max_chars=5000, max_pages=None):
+    """Text of the landing page plus the site's most descriptive pages (see crawler)."""
+    from crawler import CRAWL_MAX_PAGES, crawl_site  # pylint: disable=import-outside-toplevel
+
+    return crawl_site(
+        url, max_chars=max_chars, max_pages=max_pages or CRAWL_MAX_PAGES
+    ).text
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+import requests
+from disk_cache import DiskCache, cache_file
+from serpapi import GoogleSearch
+from tracing import count_cache, span
+
+T = TypeVar("T")
+
+SearchBackend = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# Seconds a cached response stays valid, per kind of query.
+DEFAULT_TTLS: Dict[str, float] = {
+    "competitors": float(os.getenv("SERPAPI_TTL_COMPETITORS", str(24 * 3600))),
+    "company_info": float(os.getenv("SERPAPI_TTL_COMPANY_INFO", str(7 * 24 * 3600))),
+    "default": float(os.getenv("SERPAPI_TTL_DEFAULT", str(24 * 3600))),
+}
+
+
+def serpapi_backend(params: Dict[str, Any]) -> Dict[str, Any]:
+    return GoogleSearch(params).get_dict()
+
+
+def http_backend(base_url: str, timeout: float = 30) -> SearchBackend:
+    """Backend speaking SerpAPI's REST protocol (GET /search.json) at ``base_url``."""
+    session = requests.Session()
+
+    def search(params: Dict[str, Any]) -> Dict[str, Any]:
+        resp = session.get(f"{base_url.rstrip('/')}/search.json", params=params, timeout=timeout)
+        return resp.json()
+
+    return search
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens/sec, bursts up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SearchClient:
+    """
+    SerpAPI access with a persistent response cache and a rate limiter.
+
+    Responses are cached on disk keyed by the query parameters (minus the API
+    key), with a TTL that depends on the kind of query. Live calls pass
+    through a token bucket so bursts of enrichment lookups stay within the
+    account's rate limit. ``backend`` is any callable taking SerpAPI params
+    and returning the response dict (see fakes.FakeSearch for offline runs).
+    """
+
+    def __init__(
+        self,
+        backend: SearchBackend = serpapi_backend,
+        *,
+        cache: Optional[DiskCache] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        rate: float = 2.0,
+        burst: int = 5,
+        max_workers: int = 8,
+    ) -> None:
+        self.backend = backend
+        self.cache = cache
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.bucket = TokenBucket(rate, burst)
+        self.max_workers = max_workers
+        self.counters: Dict[str, int] = {"cache_hits": 0, "calls": 0}
+        self._counters_lock = threading.Lock()  # map() updates them from worker threads
+
+    @staticmethod
+    def _cache_key(params: Dict[str, Any]) -> str:
+        public = {k: v for k, v in params.items() if k != "api_key"}
+        blob = json.dumps(public, sort_keys=True, default=str)
+        return "serpapi:" + hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def search(self, params: Dict[str, Any], *, kind: str = "default") -> Dict[str, Any]:
+        key = self._cache_key(params)
+        ttl = self.ttls.get(kind, self.ttls["default"])
+        if self.cache is not None:
+            cached = self.cache.get(key, max_age=ttl)
+            if cached is not None:
+                self._count("cache_hits")
+                count_cache("serpapi", "hit")
+                return cached
+            count_cache("serpapi", "miss")
+
+        self.bucket.acquire()
+        self._count("calls")
+        with span("search", dependency="serpapi", kind=kind):
+            results = self.backend(params)
+        if self.cache is not None and not results.get("error"):
+            self.cache.set(key, results)
+        return results
+
+    def _count(self, name: str) -> None:
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def organic_results(
+        self, query: str, num: int = 10, *, kind: str = "default"
+    ) -> List[Dict[str, Any]]:
+        params = {
+            "engine": "google",
+            "q": query,
+            "num": num,
+            "api_key": os.getenv("SERPAPI_KEY"),
+        }
+        return self.search(params, kind=kind).get("organic_results", []) or []
+
+    def map(self, fn: Callable[[str], T], queries: Iterable[str]) -> Dict[str, T]:
+        """
+        Run ``fn`` over distinct ``queries`` concurrently; the bucket still
+        paces calls. Results keep the order of first appearance. A query whose
+        call raises is logged and left out, without affecting the others.
+        """
+        unique = list(dict.fromkeys(queries))
+        if not unique:
+            return {}
+        results: Dict[str, T] = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique))) as pool:
+            # One context copy per call, so each thread sees the caller's request ID.
+            futures = [pool.submit(contextvars.copy_context().run, fn, q) for q in unique]
+            for query, future in zip(unique, futures):
+                try:
+                    results[query] = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    print(f"Search for {query!r} failed: {exc}")
+        return results
+
+
+def _make_backend() -> SearchBackend:
+    if os.getenv("SEARCH_BACKEND", "serpapi") == "fake":
+        from fakes import FakeSearch  # pylint: disable=import-outside-toplevel
+
+        return FakeSearch()
+    if os.getenv("SERPAPI_BASE_URL"):
+        return http_backend(os.environ["SERPAPI_BASE_URL"])
+    return serpapi_backend
+
+
+# Shared client used by the API and enrichment lookups
+SEARCH = SearchClient(
+    _make_backend(),
+    cache=DiskCache(os.getenv("SERPAPI_CACHE_PATH", cache_file("serpapi.sqlite3"))),
+    rate=float(os.getenv("SERPAPI_RATE", "2")),
+    burst=int(os.getenv("SERPAPI_BURST", "5")),
+)
@@ -1,21 +1,10 @@
 from __future__ import annotations
 
-from typing import Dict, Optional
+import asyncio
+from typing import Dict, Iterable, Optional
 
-import openai
 import pinecone
-import requests
-from embed_and_store import upsert_website
-from utils import canonicalize_url, make_company_id
-
-
-# Try to import Pinecone's base exception in a version-agnostic way.
-try:
-    from pinecone.exceptions import \
-      PineconeException as _PineconeError  # type: ignore
-except ImportError:
-    class _PineconeError(Exception):  # type: ignore
-        """Fallback Pinecone exception base class."""
+from pipeline import IngestionPipeline, IngestItem, IngestReport, IngestResult
 
 
 def upsert_from_url(
@@ -25,30 +14,18 @@ def upsert_from_url(
     snippet: str = "",
     name: Optional[str] = None,
     extra_metadata: Optional[Dict[str, str]] = None,
-) -> None:
+) -> IngestResult:
     """
-    Build a stable ID + friendly name from URL, then upsert once.
-    Any errors are narrowed and logged (pylint-friendly).
+    Sync wrapper around the async ingestion pipeline for one URL.
+    Builds a stable ID + friendly name from the URL and upserts once;
+    errors are narrowed by the pipeline and reported on the result.
     """
-    domain = canonicalize_url(url)
-    company_id = make_company_id(url)
-    display_name = name or domain
+    item = IngestItem(url=url, snippet=snippet, name=name, extra_metadata=extra_metadata)
+    with IngestionPipeline(index) as pipeline:
+        return asyncio.run(pipeline.ingest(item))
+
 
-    try:
-        upsert_website(
-            index=index,
-            url=url,
-            company_id=company_id,
-            name=display_name,
-            fallback_summary=snippet,
-            extra_metadata=(extra_metadata or {"domain": domain}),
-        )
-    except (
-        requests.RequestException,
-        openai.OpenAIError,
-        _PineconeError,
-        ValueError,
-        KeyError,
-        TypeError,
-    ) as exc:
-        print(f"Could not upsert {url} ({company_id}): {exc}")
+def upsert_from_urls(index: pinecone.Index, items: Iterable[IngestItem]) -> IngestReport:
+    """Sync wrapper that ingests many URLs as one batch (bulk exists check + batched upserts)."""
+    with IngestionPipeline(index) as pipeline:
+        return asyncio.run(pipeline.ingest_many(items))
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Modules import each other by bare name from the backend folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the shared module-level caches (SEARCH, FETCHER, ...) out of the working tree.
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="competitor-tests-"))
+# Importing the pipeline builds the shared clients; keep them local and offline.
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
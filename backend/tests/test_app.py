@@ -0,0 +1,92 @@
+"""API middleware and streaming behaviour, with the search, ingest and report steps faked."""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, Iterator, List
+
+import app as api
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from tracing import SPAN_SECONDS
+
+
+def _request_seconds() -> float:
+    for name, labels, value in SPAN_SECONDS.samples():
+        if name.endswith("_sum") and dict(labels).get("span") == "request":
+            return value
+    return 0.0
+
+
+def _traced_app() -> FastAPI:
+    test_app = FastAPI()
+    test_app.middleware("http")(api._trace_request)  # pylint: disable=protected-access
+
+    @test_app.get("/slow-stream")
+    async def slow_stream() -> StreamingResponse:
+        async def body():
+            for part in (b"a", b"b"):
+                await asyncio.sleep(0.1)
+                yield part
+        return StreamingResponse(body())
+
+    return test_app
+
+
+def test_request_span_covers_the_streamed_body():
+    before = _request_seconds()
+
+    with TestClient(_traced_app()) as client:
+        response = client.get("/slow-stream", headers={"X-Request-ID": "req-1"})
+
+    assert response.text == "ab"
+    assert response.headers["X-Request-ID"] == "req-1"
+    assert _request_seconds() - before >= 0.2
+
+
+@pytest.fixture(name="fake_steps")
+def _fake_steps(monkeypatch) -> Dict[str, int]:
+    calls = {"search": 0}
+
+    def search(*_: Any) -> List[Dict[str, Any]]:
+        calls["search"] += 1
+        return [{"link": "https://example.org"}]
+
+    async def ingest(*_: Any) -> Dict[str, Any]:
+        return {"mode": "queue", "counts": {}}
+
+    def report(*_: Any) -> Iterator[str]:
+        yield from ("Fund ", "report")
+
+    monkeypatch.setattr(api, "find_competitor_websites", search)
+    monkeypatch.setattr(api, "_ingest_candidates", ingest)
+    monkeypatch.setattr(api, "find_similar_competitors", lambda *_, **__: [{"id": "a"}])
+    monkeypatch.setattr(api, "stream_competitor_report", report)
+    monkeypatch.setattr(api, "analyze_competitors", lambda *_: "Fund report")
+    monkeypatch.setattr(api, "RESULT_CACHE", api.ResultCache(ttl_for=api.RESULT_CACHE.ttl_for))
+    return calls
+
+
+def test_streamed_results_share_the_result_cache(fake_steps):
+    request = {"company_name": "Acme", "company_description": "A donor advised fund", "top_k": 5}
+    client = TestClient(api.app)
+
+    def stream() -> List[Dict[str, Any]]:
+        response = client.post("/search-and-analyze/stream", json=request)
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    events = stream()
+    assert [e["text"] for e in events if e["event"] == "token"] == ["Fund ", "report"]
+    assert events[-1] == {"event": "done"}
+
+    result = client.post("/search-and-analyze", json=request).json()
+    assert result["cache"] == "hit" and result["report"] == "Fund report"
+    assert set(result["timings"]) == {"search", "ingest", "retrieve", "report"}
+
+    events = stream()
+    assert {"event": "progress", "stage": "cache", "status": "hit"} in events
+    assert [e["text"] for e in events if e["event"] == "token"] == ["Fund report"]
+    assert api.RESULT_CACHE.counters == {"hit": 2, "stale": 0, "miss": 1, "shared": 0}
+    assert fake_steps["search"] == 1
@@ -0,0 +1,21 @@
+"""chunk_text keeps all of the text, including runs without sentence punctuation."""
+from __future__ import annotations
+
+from chunking import chunk_text, count_tokens
+
+
+def test_unpunctuated_text_is_fully_covered():
+    words = [f"item{n}" for n in range(1200)]
+
+    passages = chunk_text(" ".join(words), max_tokens=200, overlap_tokens=30)
+
+    covered = {word for passage in passages for word in passage.split()}
+    assert not set(words) - covered
+    assert all(count_tokens(passage) <= 200 for passage in passages)
+    assert len(passages) > 1
+
+
+def test_short_sentences_share_a_passage():
+    passages = chunk_text("One fact. Another fact! A third?", max_tokens=200)
+
+    assert passages == ["One fact. Another fact! A third?"]
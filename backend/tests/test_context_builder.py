@@ -0,0 +1,38 @@
+"""build_competitor_context edge cases and fact coverage at a large top_k."""
+from __future__ import annotations
+
+from typing import Any
+
+from benchmarks.context import QUERY, _build_corpus, _coverage
+from context_builder import CONTEXT_TOKEN_BUDGET, build_competitor_context, format_context
+from fakes import fake_embedding
+from vector_store import LocalIndex
+
+
+class _Index:
+    """Rejects a top_k below 1 the way Pinecone does."""
+
+    def query(self, *, top_k: int, **_: Any) -> Any:
+        if top_k < 1:
+            raise ValueError("top_k must be a positive integer")
+        return {"matches": []}
+
+
+def test_no_competitors_skips_the_passage_query():
+    assert not build_competitor_context(_Index(), [1.0, 0.0, 0.0], [])
+
+
+def test_budget_grows_with_top_k_to_keep_facts(tmp_path):
+    query_vec = fake_embedding(QUERY)
+    index = LocalIndex(str(tmp_path / "index"), dim=len(query_vec))
+    facts = _build_corpus(index, companies=60, seed=0)
+    matches = index.query(vector=query_vec, top_k=50, include_metadata=True,
+                          filter={"kind": {"$ne": "passage"}})["matches"]
+
+    context = format_context(build_competitor_context(
+        index, query_vec, matches, token_budget=CONTEXT_TOKEN_BUDGET
+    ))
+
+    company_coverage, fact_coverage = _coverage(context, matches, facts)
+    assert company_coverage == 1.0
+    assert fact_coverage >= 0.75
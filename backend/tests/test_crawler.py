@@ -0,0 +1,90 @@
+"""SiteCrawler link scoring, robots.txt and sitemap handling against a fake fetcher."""
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Tuple
+
+from crawler import CrawlResult, SiteCrawler, score_page
+from http_client import FetchResult
+
+SITE = "https://example.org"
+HOME = f"""<html><body><p>Example Foundation funds community projects.</p>
+<a href="{SITE}/about">About us</a> <a href="{SITE}/research">Research</a>
+<a href="{SITE}/private/grants">Grants</a></body></html>"""
+
+
+class _Fetcher:
+    """Serves ``pages`` (url -> (status, body)); anything else is a 404."""
+
+    def __init__(self, pages: Dict[str, Tuple[int, str]]) -> None:
+        self.pages = pages
+        self.fetched: List[str] = []
+
+    async def fetch_async(self, url: str) -> FetchResult:
+        self.fetched.append(url)
+        status, text = self.pages.get(url, (404, ""))
+        return FetchResult(url=url, status=status, text=text)
+
+
+def _page(text: str) -> Tuple[int, str]:
+    return 200, f"<html><body><p>{text}</p></body></html>"
+
+
+def _crawl(fetcher: _Fetcher, url: str = SITE + "/", **kwargs: int) -> CrawlResult:
+    return asyncio.run(SiteCrawler(fetcher, **kwargs).crawl(url))
+
+
+def test_keywords_match_whole_words_and_path_segments():
+    assert score_page(SITE + "/app") > score_page(SITE + "/application")
+    assert score_page(SITE + "/apps") == score_page(SITE + "/app")
+    assert score_page(SITE + "/happen") == score_page(SITE + "/advantage") == -0.5
+    assert score_page(SITE + "/research") == -0.5
+    assert score_page(SITE + "/search") < -0.5
+    assert score_page(SITE + "/x", "Who we are") == score_page(SITE + "/who-we-are")
+    assert score_page(SITE + "/news/page/2") < score_page(SITE + "/news/front-page")
+
+
+def test_robots_is_checked_for_the_landing_page():
+    fetcher = _Fetcher({
+        SITE + "/robots.txt": (200, "User-agent: *\nDisallow: /\n"),
+        SITE + "/": (200, HOME),
+    })
+
+    result = _crawl(fetcher, max_pages=1)
+
+    assert not result.pages and result.text == ""
+    assert result.skipped == [f"{SITE}/: disallowed by robots.txt"]
+    assert fetcher.fetched == [SITE + "/robots.txt"]
+
+
+def test_disallowed_links_are_skipped():
+    fetcher = _Fetcher({
+        SITE + "/robots.txt": (200, "User-agent: *\nDisallow: /private/\n"),
+        SITE + "/": (200, HOME),
+        SITE + "/about": _page("We support local arts."),
+        SITE + "/research": _page("Our research reports."),
+        SITE + "/private/grants": _page("Internal grants."),
+    })
+
+    result = _crawl(fetcher, max_pages=3)
+
+    assert result.pages == [SITE + "/", SITE + "/about", SITE + "/research"]
+    assert f"{SITE}/private/grants: disallowed by robots.txt" in result.skipped
+    assert SITE + "/private/grants" not in fetcher.fetched
+    assert "We support local arts." in result.text
+
+
+def test_sitemap_index_links_are_followed():
+    index = f"""<sitemapindex><sitemap><loc>{SITE}/pages.xml</loc></sitemap></sitemapindex>"""
+    fetcher = _Fetcher({
+        SITE + "/robots.txt": (200, f"User-agent: *\nSitemap: {SITE}/index.xml\n"),
+        SITE + "/index.xml": (200, index),
+        SITE + "/pages.xml": (200, f"<urlset><url><loc>{SITE}/programs</loc></url></urlset>"),
+        SITE + "/": (200, "<html><body><p>Home.</p></body></html>"),
+        SITE + "/programs": _page("Scholarships for students."),
+    })
+
+    result = _crawl(fetcher, max_pages=2)
+
+    assert result.pages == [SITE + "/", SITE + "/programs"]
+    assert "Scholarships for students." in result.text
@@ -0,0 +1,94 @@
+"""EmbeddingBatcher coalescing, request splitting and error fan-out against fakes."""
+from __future__ import annotations
+
+from concurrent.futures import wait
+from typing import Any, Optional, Sequence, Union
+
+import pytest
+from embedding_batcher import EmbeddingBatcher, chunk_by_limits
+from fakes import FakeEmbeddings, fake_embedding
+
+
+class _InputTooLong(Exception):
+    status_code = 400
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+class _Embeddings(FakeEmbeddings):
+    """Rejects a whole request when any input is ``too_long``, like the API's 400."""
+
+    def __init__(self, too_long: str = "", error: Optional[Exception] = None) -> None:
+        super().__init__(latency=0, per_input_latency=0)
+        self.too_long = too_long
+        self.error = error
+        self.batches = []
+
+    def create(
+        self, *, model: str, input: Union[str, Sequence[str]]  # pylint: disable=redefined-builtin
+    ) -> Any:
+        self.batches.append(list(input))
+        if self.error is not None:
+            raise self.error
+        if self.too_long and self.too_long in input:
+            raise _InputTooLong("maximum context length is 8192 tokens")
+        return super().create(model=model, input=input)
+
+
+def _batcher(embeddings: _Embeddings, **kwargs: Any) -> EmbeddingBatcher:
+    client = type("Client", (), {"embeddings": embeddings})()
+    return EmbeddingBatcher(client, timeout=5, **kwargs)
+
+
+def test_concurrent_callers_share_one_request():
+    embeddings = _Embeddings()
+    batcher = _batcher(embeddings, max_wait=0.2)
+
+    futures = [batcher.submit(f"text {n}") for n in range(20)]
+
+    assert [f.result(timeout=5) for f in futures] == [
+        fake_embedding(f"text {n}") for n in range(20)
+    ]
+    assert len(embeddings.batches) == 1
+    assert batcher.stats == {"requests_sent": 1, "texts_embedded": 20}
+
+
+def test_batches_are_split_at_the_request_limits():
+    assert chunk_by_limits(["a" * 40] * 5, max_inputs=3, max_tokens=1000) == [(0, 3), (3, 5)]
+    assert chunk_by_limits(["a" * 40] * 5, max_inputs=10, max_tokens=25) == [
+        (0, 2), (2, 4), (4, 5)
+    ]
+
+    embeddings = _Embeddings()
+    batcher = _batcher(embeddings, max_wait=0.2, max_inputs_per_request=4)
+    batcher.embed_many([f"text {n}" for n in range(10)])
+
+    assert sorted(len(batch) for batch in embeddings.batches) == [2, 4, 4]
+
+
+def test_only_the_offending_input_fails():
+    embeddings = _Embeddings(too_long="huge")
+    batcher = _batcher(embeddings, max_wait=0.2)
+    texts = ["one", "two", "huge", "three", "four"]
+
+    futures = [batcher.submit(text) for text in texts]
+    wait(futures, timeout=5)
+
+    with pytest.raises(_InputTooLong):
+        futures[2].result()
+    for text, future in zip(texts, futures):
+        if text != "huge":
+            assert future.result() == fake_embedding(text)
+
+
+def test_other_errors_reach_every_caller_once():
+    embeddings = _Embeddings(error=_RateLimited("slow down"))
+    batcher = _batcher(embeddings, max_wait=0.2)
+
+    futures = [batcher.submit(text) for text in ("one", "two", "three")]
+    wait(futures, timeout=5)
+
+    assert all(isinstance(f.exception(), _RateLimited) for f in futures)
+    assert len(embeddings.batches) == 1
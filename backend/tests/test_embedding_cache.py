@@ -0,0 +1,58 @@
+"""EmbeddingCache memory LRU and SQLite disk tier."""
+from __future__ import annotations
+
+import pytest
+from embedding_cache import EmbeddingCache
+
+MODEL = "text-embedding-3-small"
+
+
+def test_hit_and_miss():
+    cache = EmbeddingCache(None)
+    cache.put(MODEL, "hello   world", [0.5, 0.25])
+
+    assert cache.get(MODEL, "hello world") == [0.5, 0.25]
+    assert cache.get("other-model", "hello world") is None
+    assert cache.get(MODEL, "goodbye") is None
+    assert cache.stats() == {
+        "memory_hits": 1, "disk_hits": 0, "misses": 2,
+        "memory_evictions": 0, "disk_evictions": 0, "memory_items": 1,
+    }
+
+
+def test_callers_get_their_own_copy():
+    cache = EmbeddingCache(None)
+    cache.put(MODEL, "text", [1.0, 2.0])
+
+    cache.get(MODEL, "text").append(3.0)
+
+    assert cache.get(MODEL, "text") == [1.0, 2.0]
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = EmbeddingCache(None, max_memory_items=2)
+    cache.put(MODEL, "a", [1.0])
+    cache.put(MODEL, "b", [2.0])
+    cache.get(MODEL, "a")
+    cache.put(MODEL, "c", [3.0])
+
+    assert cache.get(MODEL, "b") is None
+    assert cache.get(MODEL, "a") == [1.0] and cache.get(MODEL, "c") == [3.0]
+    assert cache.stats()["memory_evictions"] == 1
+
+
+def test_disk_tier_survives_restarts_and_stays_capped(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(path, max_memory_items=1, max_disk_items=10)
+    cache.put_many(MODEL, [(f"t{n}", [float(n), 0.5]) for n in range(5)])
+
+    assert cache.get(MODEL, "t0") == [0.0, 0.5]
+    assert cache.stats()["disk_hits"] == 1
+
+    reopened = EmbeddingCache(path, max_memory_items=1, max_disk_items=10)
+    assert reopened.get(MODEL, "t3") == pytest.approx([3.0, 0.5])
+    reopened.put_many(MODEL, [(f"u{n}", [float(n)]) for n in range(10)])
+
+    stats = reopened.stats()
+    assert stats["disk_items"] <= 10 and stats["disk_evictions"] > 0
+    assert reopened.get(MODEL, "u9") == [9.0]
@@ -0,0 +1,53 @@
+"""streaming_extract truncation, boilerplate skipping and early stop."""
+from __future__ import annotations
+
+import extractors
+from extractors import streaming_extract
+
+COPY = "Donor advised funds with low minimums and an online portal. "
+
+
+class _SlicedHtml(str):
+    """Records the offset of every slice taken, i.e. every chunk fed to the parser."""
+
+    def __new__(cls, value: str) -> "_SlicedHtml":
+        page = super().__new__(cls, value)
+        page.fed = []
+        return page
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self.fed.append(key.start)
+        return super().__getitem__(key)
+
+
+def test_output_is_truncated_at_max_chars():
+    html = "<html><body>" + f"<p>{COPY}</p>" * 20 + "</body></html>"
+
+    text = streaming_extract(html, max_chars=100)
+
+    assert len(text) <= 100
+    assert text.startswith("Donor advised funds")
+
+
+def test_boilerplate_regions_are_skipped():
+    html = """<html><head><style>p { color: red; }</style></head><body>
+    <nav><p>Home | About | Login</p></nav>
+    <script>var tracking = "p";</script>
+    <div class="cookie-banner"><p>We use cookies.</p></div>
+    <main><h1>Our funds</h1><p>Grants in three days.</p></main>
+    <div aria-hidden="true"><p>Hidden menu</p></div>
+    <footer><p>Copyright 2024</p></footer>
+    </body></html>"""
+
+    assert streaming_extract(html) == "Our funds Grants in three days."
+
+
+def test_parsing_stops_once_enough_text_is_collected(monkeypatch):
+    monkeypatch.setattr(extractors, "FEED_CHUNK_CHARS", 1024)
+    html = _SlicedHtml("<html><body>" + f"<p>{COPY}</p>" * 500 + "</body></html>")
+
+    streaming_extract(html, max_chars=200)
+
+    assert html.fed == [0]
+    assert len(html) > 30 * 1024
@@ -0,0 +1,95 @@
+"""HostLimiter shared by sync and async fetches, and the capped DiskCache."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from disk_cache import DiskCache
+from http_client import HostLimiter
+
+HOST = "https://example.org/"
+
+
+class _Peak:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+
+    def __enter__(self) -> None:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def __exit__(self, *exc) -> None:
+        with self.lock:
+            self.active -= 1
+
+
+def test_sync_and_async_fetches_share_the_host_limit():
+    limiter = HostLimiter(2)
+    peak = _Peak()
+
+    def sync_fetch() -> None:
+        with limiter.slot(HOST), peak:
+            time.sleep(0.02)
+
+    async def async_fetch() -> None:
+        async with limiter.slot_async(HOST):
+            with peak:
+                await asyncio.sleep(0.02)
+
+    async def main() -> None:
+        await asyncio.gather(*(async_fetch() for _ in range(6)))
+
+    threads = [threading.Thread(target=sync_fetch) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(main())
+    for thread in threads:
+        thread.join()
+
+    assert peak.peak == 2
+    assert limiter.in_use(HOST) == 0 and not limiter.stats()
+
+
+def test_cancelled_async_waiter_gives_its_slot_back():
+    limiter = HostLimiter(1)
+
+    async def wait_for_slot() -> None:
+        async with limiter.slot_async(HOST):
+            pass
+
+    async def main() -> None:
+        async with limiter.slot_async(HOST):
+            waiter = asyncio.ensure_future(wait_for_slot())
+            await asyncio.sleep(0)
+            assert limiter.stats() == {HOST: {"active": 1, "waiting": 1}}
+            waiter.cancel()
+        await asyncio.sleep(0)
+        async with limiter.slot_async(HOST):
+            assert limiter.in_use(HOST) == 1
+
+    asyncio.run(asyncio.wait_for(main(), 1))
+    assert limiter.in_use(HOST) == 0 and not limiter.stats()
+
+
+def test_disk_cache_evicts_the_oldest_writes(tmp_path):
+    path = str(tmp_path / "http.sqlite3")
+    cache = DiskCache(path, max_entries=10)
+    for n in range(11):
+        cache.set(f"k{n}", n)
+
+    assert cache.get("k0") is None and cache.get("k1") is None
+    assert cache.get("k10") == 10
+    assert DiskCache(path, max_entries=10).stats()["entries"] == 9
+
+
+def test_disk_cache_respects_a_byte_cap(tmp_path):
+    cache = DiskCache(str(tmp_path / "http.sqlite3"), max_bytes=1000)
+    for n in range(20):
+        cache.set(f"k{n}", "x" * 98)  # 100 bytes once JSON-encoded
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 1000 and stats["entries"] >= 8
+    assert cache.get("k19") == "x" * 98
@@ -0,0 +1,42 @@
+"""IndexVersion follows index contents, not just the vector count."""
+from __future__ import annotations
+
+import asyncio
+
+from result_cache import IndexGeneration, IndexVersion
+from vector_store import LocalIndex
+
+
+def _version(index: LocalIndex, generation: IndexGeneration) -> str:
+    return asyncio.run(IndexVersion(index, ttl=0, generation=generation).get())
+
+
+def test_in_place_reembed_changes_version(tmp_path):
+    index = LocalIndex(str(tmp_path / "index"), dim=3)
+    generation = IndexGeneration(str(tmp_path / "generation.sqlite3"))
+    index.upsert(vectors=[{"id": "a", "values": [1, 0, 0], "metadata": {"text": "old"}}])
+    before = _version(index, generation)
+
+    index.upsert(vectors=[{"id": "a", "values": [0, 1, 0], "metadata": {"text": "new"}}])
+
+    assert len(index) == 1
+    assert _version(index, generation) != before
+
+
+def test_local_generation_survives_reopen(tmp_path):
+    path = str(tmp_path / "index")
+    index = LocalIndex(path, dim=3)
+    index.upsert(vectors=[{"id": "a", "values": [1, 0, 0]}])
+    index.update(id="a", set_metadata={"crawled_at": 1.0})
+
+    assert LocalIndex(path).describe_index_stats()["generation"] == index.generation == 2
+
+
+def test_pipeline_generation_is_shared_through_the_file(tmp_path):
+    index = LocalIndex(str(tmp_path / "index"), dim=3)
+    path = str(tmp_path / "generation.sqlite3")
+    before = _version(index, IndexGeneration(path))
+
+    IndexGeneration(path).bump()  # e.g. a queue worker in another process
+
+    assert _version(index, IndexGeneration(path)) != before
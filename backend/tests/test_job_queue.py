@@ -0,0 +1,57 @@
+"""JobQueue leases, attempt limits and refresh on re-enqueue."""
+from __future__ import annotations
+
+import time
+
+import pytest
+from job_queue import JobQueue
+from pipeline import IngestItem
+
+URL = "https://example.org/"
+
+
+@pytest.fixture(name="job_queue_db")
+def _job_queue_db(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2, retry_backoff=0,
+                    lease_seconds=0.05)
+
+
+def _expire(jobs: JobQueue) -> None:
+    time.sleep(jobs.lease_seconds * 2)
+
+
+def test_expired_leases_count_toward_max_attempts(job_queue_db):
+    job_id = job_queue_db.enqueue(IngestItem(URL))
+
+    assert job_queue_db.claim("w1")[0]["attempts"] == 1
+    _expire(job_queue_db)
+    assert job_queue_db.claim("w2")[0]["attempts"] == 2
+    _expire(job_queue_db)
+
+    assert job_queue_db.claim("w3") == []
+    job = job_queue_db.get(job_id)
+    assert (job["status"], job["error"]) == ("failed", "lease expired")
+
+
+def test_only_the_current_lease_can_finish_a_job(job_queue_db):
+    job_id = job_queue_db.enqueue(IngestItem(URL))
+    stale = job_queue_db.claim("w1")[0]
+    _expire(job_queue_db)
+    current = job_queue_db.claim("w2")[0]
+
+    assert not job_queue_db.complete(stale, {"status": "upserted"})
+    assert job_queue_db.fail(stale, "boom") == "lost"
+    assert job_queue_db.get(job_id)["status"] == "running"
+
+    assert job_queue_db.complete(current, {"status": "upserted"})
+    assert job_queue_db.get(job_id)["status"] == "done"
+
+
+def test_refresh_marks_a_queued_job(job_queue_db):
+    job_id = job_queue_db.enqueue(IngestItem(URL, snippet="first"))
+
+    assert job_queue_db.enqueue(IngestItem(URL, refresh=True)) == job_id
+
+    item = job_queue_db.get(job_id)["item"]
+    assert item["refresh"] is True
+    assert item["snippet"] == "first"
@@ -0,0 +1,140 @@
+"""IngestionPipeline refresh behaviour against a LocalIndex, without network access."""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, List, Optional
+
+import embed_and_store
+import pipeline
+import services
+from crawler import CrawlResult
+from pipeline import IngestionPipeline, IngestItem
+from result_cache import IndexGeneration
+from utils import make_company_id
+from vector_store import LocalIndex
+
+URL = "https://example.org/"
+
+
+class _Crawler:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    async def crawl(self, url: str, **_: object) -> CrawlResult:
+        return CrawlResult(url=url, text=self.text)
+
+
+class _RecordingIndex(LocalIndex):
+    """LocalIndex that logs upserted IDs and can reject batches holding passages."""
+
+    def __init__(self, path: str, fail_passages: bool = False) -> None:
+        super().__init__(path, dim=3)
+        self.fail_passages = fail_passages
+        self.upserts: List[List[str]] = []
+
+    def upsert(self, vectors: Any, namespace: Optional[str] = None, **_: Any) -> Any:
+        ids = [vector["id"] for vector in vectors]
+        if self.fail_passages and any("#p" in vid for vid in ids):
+            raise ValueError("passage batch rejected")
+        self.upserts.append(ids)
+        return super().upsert(vectors, namespace)
+
+
+def _fresh_pipeline(tmp_path, monkeypatch, index: LocalIndex) -> IngestionPipeline:
+    monkeypatch.setattr(pipeline, "CRAWLER", _Crawler("Donor advised funds. " * 400))
+    monkeypatch.setattr(embed_and_store, "embed_texts", lambda texts: [[1, 0, 0]] * len(texts))
+    return IngestionPipeline(
+        index, generation=IndexGeneration(str(tmp_path / "generation.sqlite3"))
+    )
+
+
+def _stale_index(tmp_path) -> LocalIndex:
+    index = LocalIndex(str(tmp_path / "index"), dim=3)
+    index.upsert(vectors=[{
+        "id": make_company_id(URL),
+        "values": [1, 0, 0],
+        "metadata": {"description": "indexed copy", "crawled_at": 0},
+    }])
+    return index
+
+
+def test_empty_refresh_crawl_keeps_indexed_vectors(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "CRAWLER", _Crawler(""))
+    index = _stale_index(tmp_path)
+    ingest = IngestionPipeline(
+        index, generation=IndexGeneration(str(tmp_path / "generation.sqlite3"))
+    )
+
+    result = asyncio.run(ingest.ingest(IngestItem(URL, snippet="a snippet", refresh=True)))
+
+    assert result.status == "exists"
+    assert result.warnings == ["scrape returned no text"]
+    stored = index.fetch([make_company_id(URL)])["vectors"][make_company_id(URL)]
+    assert stored["values"] == [1, 0, 0]
+    assert stored["metadata"]["description"] == "indexed copy"
+
+
+def test_company_vector_is_written_after_its_passages(tmp_path, monkeypatch):
+    index = _RecordingIndex(str(tmp_path / "index"))
+    ingest = _fresh_pipeline(tmp_path, monkeypatch, index)
+
+    result = asyncio.run(ingest.ingest(IngestItem(URL)))
+
+    company_id = make_company_id(URL)
+    assert result.status == "upserted"
+    assert index.upserts[-1] == [company_id]
+    assert all(company_id not in ids for ids in index.upserts[:-1])
+    metadata = index.fetch([company_id])["vectors"][company_id]["metadata"]
+    assert len(index) == metadata["passages"] + 1
+
+
+def test_failed_passages_keep_the_company_out_of_the_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "UPSERT_BACKOFF", 0)
+    index = _RecordingIndex(str(tmp_path / "index"), fail_passages=True)
+    ingest = _fresh_pipeline(tmp_path, monkeypatch, index)
+
+    result = asyncio.run(ingest.ingest(IngestItem(URL)))
+
+    assert result.status == "failed"
+    assert result.error == "passage batch rejected"
+    assert len(index) == 0
+
+
+def test_stages_run_on_their_own_thread_pools(tmp_path, monkeypatch):
+    index = _RecordingIndex(str(tmp_path / "index"))
+    ingest = _fresh_pipeline(tmp_path, monkeypatch, index)
+    threads = []
+
+    def embed(texts):
+        threads.append(threading.current_thread().name)
+        return [[1, 0, 0]] * len(texts)
+
+    monkeypatch.setattr(embed_and_store, "embed_texts", embed)
+    asyncio.run(ingest.ingest(IngestItem(URL)))
+
+    assert threads and all(name.startswith("ingest-embed") for name in threads)
+
+
+def test_sync_wrappers_close_their_pipelines(tmp_path, monkeypatch):
+    index = _RecordingIndex(str(tmp_path / "index"))
+    monkeypatch.setattr(pipeline, "CRAWLER", _Crawler("Donor advised funds. " * 40))
+    monkeypatch.setattr(embed_and_store, "embed_texts", lambda texts: [[1, 0, 0]] * len(texts))
+    opened: List[IngestionPipeline] = []
+    closed: List[IngestionPipeline] = []
+
+    class _Pipeline(IngestionPipeline):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+        def close(self) -> None:
+            closed.append(self)
+            super().close()
+
+    monkeypatch.setattr(services, "IngestionPipeline", _Pipeline)
+
+    assert services.upsert_from_url(index, URL).status == "upserted"
+    assert services.upsert_from_urls(index, [IngestItem(URL)]).counts() == {"exists": 1}
+
+    assert len(opened) == 2 and closed == opened
@@ -0,0 +1,66 @@
+"""SectionedReporter fallbacks against fakes.FakeChatCompletions."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from fakes import FakeChatCompletions
+from report_sections import SectionedReporter, is_degraded
+from result_cache import ResultCache
+
+
+class _Client:
+    """Chat client whose section calls for ``fail`` and/or the reduce call raise."""
+
+    def __init__(self, fail: str = "", fail_reduce: bool = False) -> None:
+        self.fail = fail
+        self.fail_reduce = fail_reduce
+        self.llm = FakeChatCompletions(latency=0, token_latency=0, output_tokens=5)
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        prompt = messages[-1]["content"]
+        if self.fail_reduce and "executive overview" in prompt:
+            raise RuntimeError("reduce timed out")
+        if self.fail and f"Analyze '{self.fail}'" in prompt:
+            raise RuntimeError("section timed out")
+        return self.llm.create(model=model, messages=messages, **kwargs)
+
+
+def test_failed_section_is_marked_unavailable():
+    reporter = SectionedReporter(_Client(fail="Fund B"), model="gpt-5")
+
+    report = reporter.report("Acme", [("Fund A", "text a"), ("Fund B", "text b")])
+
+    assert "### Fund A" in report
+    assert is_degraded(report)
+
+
+def test_equal_ratings_keep_match_order_with_duplicate_names():
+    reporter = SectionedReporter(_Client(), model="gpt-5")
+
+    sections = reporter.sections(
+        "Acme", [("Fund A", "one"), ("Fund B", "two"), ("Fund A", "three")]
+    )
+
+    assert [name for name, _ in sections] == ["Fund A", "Fund B", "Fund A"]
+
+
+def test_stream_falls_back_to_sections_when_reduce_fails():
+    reporter = SectionedReporter(_Client(fail_reduce=True), model="gpt-5")
+
+    parts = list(reporter.stream("Acme", [("Fund A", "text a"), ("Fund B", "text b")]))
+
+    assert len(parts) == 1
+    assert "### Fund A" in parts[0] and "### Fund B" in parts[0]
+    assert not is_degraded(parts[0])
+
+
+def test_result_cache_keeps_degraded_reports_briefly():
+    cache = ResultCache(ttl=900, stale_ttl=0,
+                        ttl_for=lambda value: 0 if is_degraded(value) else None)
+    cache.put("good", "report")
+    cache.put("bad", "_Analysis unavailable: timeout_")
+
+    assert cache.peek("good") == ("report", "hit")
+    assert cache.peek("bad") is None
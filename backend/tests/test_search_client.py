@@ -0,0 +1,165 @@
+"""SearchClient against fakes.FakeSearch: caching, TTLs, rate limiting and map()."""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict
+
+import disk_cache
+import pytest
+from disk_cache import DiskCache
+from fakes import FakeSearch
+from search_client import SearchClient, TokenBucket
+
+
+def _params(query: str, **extra: Any) -> Dict[str, Any]:
+    return {"engine": "google", "q": query, "num": 3, "api_key": "secret", **extra}
+
+
+@pytest.fixture(name="search_cache")
+def _search_cache(tmp_path):
+    return DiskCache(str(tmp_path / "serpapi.sqlite3"))
+
+
+def test_repeated_search_is_served_from_cache(search_cache):
+    backend = FakeSearch(latency=0)
+    client = SearchClient(backend, cache=search_cache, rate=1000, burst=1000)
+
+    first = client.search(_params("daf providers"))
+    second = client.search(_params("daf providers"))
+
+    assert second == first
+    assert len(first["organic_results"]) == 3
+    assert backend.calls == 1
+    assert client.counters == {"cache_hits": 1, "calls": 1}
+
+
+def test_cache_key_ignores_api_key(search_cache):
+    backend = FakeSearch(latency=0)
+    client = SearchClient(backend, cache=search_cache, rate=1000, burst=1000)
+
+    client.search(_params("daf providers"))
+    client.search(_params("daf providers", api_key="another-key"))
+
+    assert backend.calls == 1
+
+
+def test_cache_persists_across_clients(tmp_path):
+    path = str(tmp_path / "serpapi.sqlite3")
+    backend = FakeSearch(latency=0)
+    SearchClient(backend, cache=DiskCache(path)).search(_params("donor portals"))
+
+    reopened = SearchClient(backend, cache=DiskCache(path))
+    reopened.search(_params("donor portals"))
+
+    assert backend.calls == 1
+    assert reopened.counters["cache_hits"] == 1
+
+
+def test_ttl_depends_on_kind(search_cache, monkeypatch):
+    backend = FakeSearch(latency=0)
+    client = SearchClient(
+        backend, cache=search_cache, ttls={"short": 60, "long": 3600}, rate=1000, burst=1000
+    )
+    client.search(_params("short lived"), kind="short")
+    client.search(_params("long lived"), kind="long")
+    assert backend.calls == 2
+
+    now = time.time()
+    monkeypatch.setattr(disk_cache.time, "time", lambda: now + 600)
+    client.search(_params("short lived"), kind="short")
+    client.search(_params("long lived"), kind="long")
+
+    assert backend.calls == 3  # only the expired "short" entry was fetched again
+    assert client.counters == {"cache_hits": 1, "calls": 3}
+
+
+def test_error_responses_are_not_cached(search_cache):
+    calls = []
+
+    def failing(params: Dict[str, Any]) -> Dict[str, Any]:
+        calls.append(params)
+        return {"error": "quota exceeded"}
+
+    client = SearchClient(failing, cache=search_cache, rate=1000, burst=1000)
+    client.search(_params("daf"))
+    client.search(_params("daf"))
+
+    assert len(calls) == 2
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=20, capacity=2)
+
+    start = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    burst = time.monotonic() - start
+    for _ in range(4):
+        bucket.acquire()
+    total = time.monotonic() - start
+
+    assert burst < 0.05
+    assert total >= 4 / 20 * 0.9
+
+
+def test_live_calls_are_throttled_but_cache_hits_are_not(search_cache):
+    client = SearchClient(FakeSearch(latency=0), cache=search_cache, rate=20, burst=1)
+
+    start = time.monotonic()
+    for i in range(5):
+        client.search(_params(f"query {i}"))
+    live = time.monotonic() - start
+
+    start = time.monotonic()
+    for i in range(5):
+        client.search(_params(f"query {i}"))
+    cached = time.monotonic() - start
+
+    assert live >= 4 / 20 * 0.9
+    assert cached < 0.1
+
+
+def test_map_fans_out_dedups_and_keeps_order(search_cache):
+    backend = FakeSearch(latency=0.2)
+    client = SearchClient(backend, cache=search_cache, rate=1000, burst=1000, max_workers=8)
+    queries = ["c", "a", "b", "a", "d", "c"]
+
+    start = time.monotonic()
+    results = client.map(lambda q: client.organic_results(q, 2)[0]["title"], queries)
+    elapsed = time.monotonic() - start
+
+    assert list(results) == ["c", "a", "b", "d"]
+    assert results["b"] == "Result 1 for b"
+    assert backend.calls == 4
+    assert elapsed < 0.2 * 4 * 0.75  # concurrent, not one after another
+
+
+def test_map_isolates_failures():
+    client = SearchClient(FakeSearch(latency=0), rate=1000, burst=1000)
+
+    def lookup(query: str) -> str:
+        if query == "bad":
+            raise RuntimeError("boom")
+        return query.upper()
+
+    assert client.map(lookup, ["ok", "bad", "fine"]) == {"ok": "OK", "fine": "FINE"}
+    assert not client.map(lookup, [])
+
+
+def test_counters_are_exact_under_concurrency(search_cache):
+    client = SearchClient(FakeSearch(latency=0.001), cache=search_cache, rate=1e6, burst=1000,
+                          max_workers=16)
+    queries = [f"q{i}" for i in range(200)]
+
+    client.map(lambda q: client.search(_params(q)), queries)
+    threads = [
+        threading.Thread(target=lambda: [client.search(_params(q)) for q in queries])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert client.counters == {"cache_hits": 800, "calls": 200}
@@ -0,0 +1,54 @@
+"""iterate_blocking closes the wrapped iterator when the consumer stops early."""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Iterator
+
+from utils import iterate_blocking
+
+
+def _stream(closed: threading.Event) -> Iterator[str]:
+    try:
+        while True:
+            yield "token"
+    finally:
+        closed.set()
+
+
+def test_aclose_closes_the_blocking_iterator():
+    closed = threading.Event()
+
+    async def main() -> None:
+        deltas = iterate_blocking(_stream(closed))
+        try:
+            async for _ in deltas:
+                break
+        finally:
+            await deltas.aclose()
+
+    asyncio.run(main())
+    assert closed.wait(1)
+
+
+def test_cancelled_consumer_closes_the_blocking_iterator():
+    closed = threading.Event()
+    started = threading.Event()
+
+    def slow() -> Iterator[str]:
+        started.set()
+        yield from _stream(closed)
+
+    async def consume() -> None:
+        async for _ in iterate_blocking(slow()):
+            await asyncio.sleep(1)
+
+    async def main() -> None:
+        task = asyncio.ensure_future(consume())
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert closed.wait(1)
@@ -0,0 +1,70 @@
+"""LocalIndex persistence: SQLite metadata, failed writes and several handles on one path."""
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pytest
+from vector_store import LocalIndex
+
+
+def _vec(vid: str, values, **metadata):
+    return {"id": vid, "values": values, "metadata": metadata}
+
+
+def test_bad_dimension_leaves_the_index_untouched(tmp_path):
+    path = str(tmp_path / "index")
+    index = LocalIndex(path, dim=3)
+    index.upsert(vectors=[_vec("a", [1, 0, 0], text="a")])
+
+    with pytest.raises(ValueError):
+        index.upsert(vectors=[_vec("b", [0, 1, 0]), _vec("c", [0, 1])])
+
+    for handle in (index, LocalIndex(path)):
+        assert len(handle) == 1
+        assert handle.fetch(["a", "b"])["vectors"].keys() == {"a"}
+
+
+def test_deletes_survive_reopen(tmp_path):
+    path = str(tmp_path / "index")
+    index = LocalIndex(path, dim=3, initial_capacity=2)
+    index.upsert(vectors=[_vec(v, values, name=v) for v, values in (
+        ("a", [1, 0, 0]), ("b", [0, 1, 0]), ("c", [0, 0, 1]), ("d", [1, 1, 0]))])
+    index.delete(ids=["a", "c"])
+
+    reopened = LocalIndex(path)
+    found = reopened.fetch(["a", "b", "c", "d"])["vectors"]
+    assert sorted(found) == ["b", "d"]
+    assert found["d"]["values"] == [1, 1, 0]
+    assert found["d"]["metadata"] == {"name": "d"}
+    top = reopened.query(vector=[1, 1, 0], top_k=1, include_metadata=True)["matches"][0]
+    assert top["id"] == "d" and np.isclose(top["score"], 1.0)
+
+
+def test_writes_from_another_handle_are_visible(tmp_path):
+    path = str(tmp_path / "index")
+    reader = LocalIndex(path, dim=3)
+    writer = LocalIndex(path, dim=3, initial_capacity=1)
+
+    writer.upsert(vectors=[_vec("a", [1, 0, 0]), _vec("b", [0, 1, 0])])
+    writer.update(id="b", set_metadata={"crawled_at": 5})
+
+    assert reader.describe_index_stats()["total_vector_count"] == 2
+    assert reader.fetch(["b"])["vectors"]["b"]["metadata"] == {"crawled_at": 5}
+    assert reader.query(vector=[0, 1, 0], top_k=1)["matches"][0]["id"] == "b"
+
+
+def test_imports_a_legacy_meta_json(tmp_path):
+    path = tmp_path / "index"
+    path.mkdir()
+    np.memmap(str(path / "vectors.f32"), dtype=np.float32, mode="w+",
+              shape=(4, 3))[:1] = [1, 0, 0]
+    (path / "meta.json").write_text(json.dumps({
+        "dim": 3, "capacity": 4, "ids": ["a"], "metadata": [{"name": "a"}],
+    }))
+
+    index = LocalIndex(str(path))
+
+    assert index.fetch(["a"])["vectors"]["a"] == {
+        "id": "a", "values": [1, 0, 0], "metadata": {"name": "a"},
+    }
@@ -0,0 +1,347 @@
+"""
+Built-in tracing and metrics.
+
+``span(name)`` times a stage (search, vector_exists, scrape, fetch, enrich,
+embed, upsert, query, llm, ...) and tags it with the current request ID and
+parent span. Spans that wrap a call to an external service also pass
+``dependency=`` so its request count, outcome and latency are tracked per
+dependency. Cache lookups are counted with ``count_cache`` and LLM token
+usage with ``record_llm_usage``. Recoverable failures (a step that falls
+back instead of raising) are logged with ``log_event``.
+
+Metrics are kept in-process and rendered in the Prometheus text format by
+``METRICS.render()`` (served at GET /metrics). Each uvicorn worker keeps its
+own, so scrape every worker. Finished spans are logged as JSON lines on the
+"competitor_analyzer.trace" logger; TRACE_LOG=1 sends them to stderr.
+Events are logged there too, at WARNING, so they show up without it.
+
+TRACING=0 disables spans and metrics: ``span`` returns a shared no-op and
+the counting helpers return immediately.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+TRACING = os.getenv("TRACING", "1").lower() not in ("0", "false", "off", "no")
+
+LOGGER = logging.getLogger("competitor_analyzer.trace")
+if os.getenv("TRACE_LOG", "0") == "1":
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    LOGGER.addHandler(_handler)
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False
+
+# Seconds; covers sub-10ms cache lookups up to long report generations.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Set per HTTP request by the API middleware. Context variables follow awaits
+# and tasks; utils.run_blocking copies them into executor threads.
+REQUEST_ID: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_CURRENT_SPAN: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> Iterator[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, value
+
+
+class Histogram:
+    """Bucketed distribution with labels (Prometheus cumulative ``le`` buckets)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf bucket, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[slot] += 1
+            row[-1] += value
+
+    def samples(self) -> Iterator[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            items = [(key, list(row)) for key, row in self._values.items()]
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", key + (("le", le),), cumulative
+            yield f"{self.name}_sum", key, row[-1]
+            yield f"{self.name}_count", key, cumulative
+
+
+Metric = Union[Counter, Histogram]
+
+
+class Registry:
+    """Named metrics of one process, rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))  # type: ignore[return-value]
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+SPAN_SECONDS = METRICS.histogram(
+    "competitor_span_duration_seconds", "Duration of traced stages."
+)
+SPAN_ERRORS = METRICS.counter(
+    "competitor_span_errors_total", "Traced stages that raised an exception."
+)
+DEPENDENCY_SECONDS = METRICS.histogram(
+    "competitor_dependency_request_duration_seconds",
+    "Latency of calls to external dependencies.",
+)
+DEPENDENCY_REQUESTS = METRICS.counter(
+    "competitor_dependency_requests_total",
+    "Calls to external dependencies by outcome (ok, error, cancelled).",
+)
+CACHE_EVENTS = METRICS.counter(
+    "competitor_cache_events_total", "Cache lookups by cache and result."
+)
+LLM_TOKENS = METRICS.counter(
+    "competitor_llm_tokens_total", "OpenAI tokens reported by API responses."
+)
+
+
+class Span:  # pylint: disable=too-many-instance-attributes  # one slot per logged field
+    """One timed stage; use as a context manager (see ``span``)."""
+
+    __slots__ = ("name", "dependency", "operation", "attrs", "span_id", "parent_id",
+                 "request_id", "_start", "_token")
+
+    def __init__(
+        self, name: str, dependency: Optional[str], operation: Optional[str],
+        attrs: Dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.dependency = dependency
+        self.operation = operation or name
+        self.attrs = attrs
+        self.span_id = ""
+        self.parent_id: Optional[str] = None
+        self.request_id: Optional[str] = None
+        self._start = 0.0
+        self._token: Any = None
+
+    def set(self, **attrs: Any) -> None:
+        """Attach attributes known only once the stage has run (status, counts, ...)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _CURRENT_SPAN.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.request_id = REQUEST_ID.get()
+        self.span_id = os.urandom(6).hex()
+        self._token = _CURRENT_SPAN.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        duration = time.perf_counter() - self._start
+        try:
+            _CURRENT_SPAN.reset(self._token)
+        except ValueError:
+            # Entered in another context, e.g. a generator resumed from different threads.
+            pass
+        if exc_type is None:
+            status = "ok"
+        elif issubclass(exc_type, Exception):
+            status = "error"
+        else:
+            status = "cancelled"  # GeneratorExit, CancelledError, KeyboardInterrupt
+
+        SPAN_SECONDS.observe(duration, span=self.name)
+        if status == "error":
+            SPAN_ERRORS.inc(span=self.name)
+        if self.dependency:
+            DEPENDENCY_SECONDS.observe(
+                duration, dependency=self.dependency, operation=self.operation
+            )
+            DEPENDENCY_REQUESTS.inc(
+                dependency=self.dependency, operation=self.operation, outcome=status
+            )
+        if LOGGER.isEnabledFor(logging.INFO):
+            record: Dict[str, Any] = {
+                "event": "span",
+                "span": self.name,
+                "request_id": self.request_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "duration_ms": round(duration * 1000, 2),
+                "status": status,
+            }
+            if self.dependency:
+                record["dependency"] = self.dependency
+                record["operation"] = self.operation
+            if exc is not None and status == "error":
+                record["error"] = str(exc)[:200]
+            record.update(self.attrs)
+            LOGGER.info(json.dumps(record, default=str))
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *_: Any) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(
+    name: str, *, dependency: Optional[str] = None, operation: Optional[str] = None,
+    **attrs: Any,
+) -> Union[Span, _NoopSpan]:
+    """
+    Context manager timing the stage ``name``. With ``dependency`` (openai,
+    pinecone, serpapi, sites) the call also counts toward that dependency's
+    request and latency metrics under ``operation`` (default: ``name``).
+    """
+    if not TRACING:
+        return _NOOP
+    return Span(name, dependency, operation, attrs)
+
+
+def current_span() -> Union[Span, _NoopSpan]:
+    return (_CURRENT_SPAN.get() or _NOOP) if TRACING else _NOOP
+
+
+def count_cache(cache: str, result: str) -> None:
+    """Count one lookup in ``cache`` (result: hit, miss, stale, shared, ...)."""
+    if TRACING:
+        CACHE_EVENTS.inc(cache=cache, result=result)
+
+
+def _usage_field(usage: Any, name: str) -> int:
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return int(value or 0)
+
+
+def record_llm_usage(
+    model: str, usage: Any, into: Optional[Union[Span, _NoopSpan]] = None
+) -> None:
+    """
+    Count the token usage from an OpenAI response and note it on ``into``
+    (default: the current span; generators resumed from other threads pass
+    their own span, as the current one is then the caller's).
+    """
+    if not TRACING or usage is None:
+        return
+    prompt = _usage_field(usage, "prompt_tokens")
+    completion = _usage_field(usage, "completion_tokens")
+    if prompt:
+        LLM_TOKENS.inc(prompt, model=model, kind="prompt")
+    if completion:
+        LLM_TOKENS.inc(completion, model=model, kind="completion")
+    (into or current_span()).set(prompt_tokens=prompt, completion_tokens=completion)
+
+
+def log_event(event: str, level: int = logging.WARNING, **fields: Any) -> None:
+    """Log one JSON event line tagged with the current request ID and span."""
+    if not LOGGER.isEnabledFor(level):
+        return
+    parent = _CURRENT_SPAN.get()
+    record: Dict[str, Any] = {
+        "event": event,
+        "request_id": REQUEST_ID.get(),
+        "span_id": parent.span_id if parent is not None else None,
+        **fields,
+    }
+    LOGGER.log(level, json.dumps(record, default=str))
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import functools
 import hashlib
-import os
+import threading
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Set
 from urllib.parse import urlparse
 
 import pinecone
-from serpapi import GoogleSearch
+from search_client import SEARCH
+from tracing import span
 
 
 # Try to import Pinecone's base exception in a version-agnostic way.
@@ -37,39 +43,120 @@ def hash_key(s: str, length: int = 16) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()[:length]
 
 
-def vector_exists(index: pinecone.Index, vector_id: str) -> bool:
-    """Return True if a vector ID already exists in Pinecone (v3 fetch)."""
-    try:
-        res = index.fetch(ids=[vector_id])
-    except _PineconeError:
-        # Treat transient Pinecone errors as "not found" to avoid blocking progress.
-        return False
+# Executor for run_blocking; None means the loop's default. The ingestion
+# pipeline sets it to the current stage's own thread pool.
+EXECUTOR: contextvars.ContextVar[Optional[Executor]] = contextvars.ContextVar(
+    "executor", default=None
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking call in an executor (``EXECUTOR``, else the loop's default)
+    so the event loop stays free. Context variables (request ID, current
+    span) carry over to the thread.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(EXECUTOR.get(), call)
+
+
+async def iterate_blocking(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """
+    Drain a blocking iterator (e.g. an SDK stream) without stalling the event loop.
+
+    If the consumer stops early (cancelled, or closed with ``aclose``), the
+    iterator's ``close()`` is called in the executor once any in-flight
+    ``next`` returns, so a generator holding a network stream lets it go.
+    """
+    done = object()
+    lock = threading.Lock()  # next() and close() must not overlap
+
+    def step() -> Any:
+        with lock:
+            return next(iterator, done)
 
+    def close() -> None:
+        with lock:
+            getattr(iterator, "close", lambda: None)()
+
+    exhausted = False
+    try:
+        while True:
+            item = await run_blocking(step)
+            if item is done:
+                exhausted = True
+                return
+            yield item
+    finally:
+        if not exhausted:
+            asyncio.get_running_loop().run_in_executor(EXECUTOR.get(), close)
+
+
+def _fetched_vectors(res: Any) -> Dict[str, Any]:
     # SDK may return object-like or dict-like; support both.
     vectors = getattr(res, "vectors", None)
     if vectors is None and isinstance(res, dict):
         vectors = res.get("vectors", {})
+    return vectors or {}
+
+
+def _vector_metadata(vector: Any) -> Dict[str, Any]:
+    metadata = vector.get("metadata") if isinstance(vector, dict) else getattr(
+        vector, "metadata", None
+    )
+    return dict(metadata or {})
+
+
+def existing_vector_metadata(
+    index: pinecone.Index, vector_ids: Iterable[str], batch_size: int = 100
+) -> Dict[str, Dict[str, Any]]:
+    """Metadata of the ``vector_ids`` already in the index (one fetch per batch)."""
+    ids = list(dict.fromkeys(vector_ids))
+    found: Dict[str, Dict[str, Any]] = {}
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        try:
+            with span("vector_exists", dependency="pinecone", operation="fetch", ids=len(chunk)):
+                res = index.fetch(ids=chunk)
+        except _PineconeError:
+            # Treat transient Pinecone errors as "not found" to avoid blocking progress.
+            continue
+        try:
+            vectors = _fetched_vectors(res)
+            found.update(
+                (vid, _vector_metadata(vectors[vid])) for vid in chunk if vid in vectors
+            )
+        except (TypeError, KeyError, AttributeError):
+            continue
+    return found
+
+
+def existing_vector_ids(
+    index: pinecone.Index, vector_ids: Iterable[str], batch_size: int = 100
+) -> Set[str]:
+    """Return the subset of ``vector_ids`` already in the index (one fetch per batch)."""
+    return set(existing_vector_metadata(index, vector_ids, batch_size))
 
-    try:
-        return vector_id in (vectors or {})
-    except (TypeError, KeyError, AttributeError):
-        return False
+
+def vector_exists(index: pinecone.Index, vector_id: str) -> bool:
+    """Return True if a vector ID already exists in Pinecone (v3 fetch)."""
+    return vector_id in existing_vector_ids(index, [vector_id])
 
 
 def fetch_company_info(company_name: str) -> str:
     """Fetch supplemental company info from Wikipedia/news via SerpAPI."""
     try:
-        params = {
-            "engine": "google",
-            "q": f"{company_name} site:wikipedia.org OR news",
-            "num": 5,
-            "api_key": os.getenv("SERPAPI_KEY"),
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict().get("organic_results", [])
+        results = SEARCH.organic_results(
+            f"{company_name} site:wikipedia.org OR news", 5, kind="company_info"
+        )
         snippets = [r["snippet"] for r in results if r.get("snippet")]
         return " ".join(snippets)
     except Exception as exc:  # pylint: disable=broad-except
         print(f"Extra info search failed for {company_name}: {exc}")
         return ""
-    
\ No newline at end of file
+
+
+def fetch_many_company_info(company_names: Iterable[str]) -> Dict[str, str]:
+    """fetch_company_info for several companies concurrently (rate-limited, cached)."""
+    return SEARCH.map(fetch_company_info, company_names)
@@ -0,0 +1,472 @@
+"""
+Vector store backends behind ``common.INDEX``.
+
+Callers only use the Pinecone ``Index`` surface (``upsert``, ``fetch``,
+``query``, ``update``, ``delete``, ``describe_index_stats``), so any object
+implementing :class:`VectorStore` can be swapped in. :class:`LocalIndex`
+keeps everything in-process: a memory-mapped float32 matrix on disk plus a
+SQLite table of IDs and metadata, with exact cosine top-k in NumPy.
+Every write bumps a persisted ``generation``, reported by
+``describe_index_stats`` so callers can tell when the contents changed.
+"""
+from __future__ import annotations
+
+import json
+import operator
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence,
+                    Tuple)
+
+import numpy as np
+
+
+class VectorStore(Protocol):
+    def upsert(self, vectors: Sequence[Any], **kwargs: Any) -> Any: ...
+
+    def fetch(self, ids: Sequence[str], **kwargs: Any) -> Any: ...
+
+    def query(self, *, vector: Sequence[float], top_k: int, **kwargs: Any) -> Any: ...
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$in": lambda actual, expected: actual in expected,
+    "$nin": lambda actual, expected: actual not in expected,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+def _compare(op: str, actual: Any, expected: Any) -> bool:
+    if op == "$exists":
+        return (actual is not None) == bool(expected)
+    if op not in _OPERATORS:
+        raise ValueError(f"Unsupported filter operator: {op}")
+    if actual is None:
+        return op in ("$ne", "$nin")
+    try:
+        return _OPERATORS[op](actual, expected)
+    except TypeError:  # e.g. "$gt" between a string and a number
+        return False
+
+
+def matches_filter(metadata: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter against one metadata dict."""
+    if not flt:
+        return True
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in cond):
+                return False
+        elif isinstance(cond, dict):
+            actual = metadata.get(key)
+            if not all(_compare(op, actual, expected) for op, expected in cond.items()):
+                return False
+        elif metadata.get(key) != cond:
+            return False
+    return True
+
+
+def _as_vector_dict(vector: Any) -> Dict[str, Any]:
+    """Accept the dict, tuple and object forms the Pinecone client accepts."""
+    if isinstance(vector, dict):
+        return vector
+    if isinstance(vector, (tuple, list)):
+        return {
+            "id": vector[0],
+            "values": vector[1],
+            "metadata": vector[2] if len(vector) > 2 else None,
+        }
+    return {
+        "id": vector.id,
+        "values": vector.values,
+        "metadata": getattr(vector, "metadata", None),
+    }
+
+
+class _VectorFile:
+    """The float32 memmap of vector rows (``<path>/vectors.f32``) and their norms."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+
+    @property
+    def capacity(self) -> int:
+        return self.matrix.shape[0]
+
+    def create(self, capacity: int, dim: int) -> None:
+        if not os.path.exists(self.path):
+            np.memmap(self.path, dtype=np.float32, mode="w+", shape=(capacity, dim)).flush()
+
+    def open(self, capacity: int, dim: int, count: int) -> None:
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        self.norms = np.zeros(capacity, dtype=np.float32)
+        if count:
+            self.norms[:count] = np.linalg.norm(self.matrix[:count], axis=1)
+
+    def grow(self, needed: int) -> None:
+        capacity, dim = self.matrix.shape
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.matrix.flush()
+        del self.matrix
+        with open(self.path, "r+b") as f:
+            f.truncate(capacity * dim * 4)
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[: len(self.norms)] = self.norms
+        self.norms = norms
+
+
+@dataclass
+class _Entries:
+    """In-memory copy of the vectors table: IDs and metadata by row, and each ID's row."""
+
+    ids: List[str] = field(default_factory=list)
+    metadata: List[Dict[str, Any]] = field(default_factory=list)
+    rows: Dict[str, int] = field(default_factory=dict)
+
+    def copy(self) -> "_Entries":
+        return _Entries(list(self.ids), list(self.metadata), dict(self.rows))
+
+    def remove(self, vid: str) -> Optional[Tuple[int, int]]:
+        """
+        Drop ``vid`` by moving the last row into its place; returns the
+        (to row, from row) copy the matrix needs, if any.
+        """
+        row = self.rows.pop(vid)
+        last = len(self.ids) - 1
+        tail = self.ids.pop()
+        tail_metadata = self.metadata.pop()
+        if row == last:
+            return None
+        self.ids[row] = tail
+        self.metadata[row] = tail_metadata
+        self.rows[tail] = row
+        return row, last
+
+
+class LocalIndex:
+    """
+    In-process vector index with the Pinecone ``Index`` call surface.
+
+    Vectors live in ``<path>/vectors.f32`` (a float32 memmap that doubles in
+    capacity as it fills). IDs, their rows and metadata live in SQLite
+    (``<path>/meta.sqlite3``), so a write only touches the rows it changes.
+    Queries are exact cosine similarity over all rows, top-k picked with
+    ``argpartition``. Deletes swap the last row into the hole, so the matrix
+    stays dense. Namespaces are accepted and ignored.
+
+    Each write runs in one SQLite write transaction (``BEGIN IMMEDIATE``),
+    which also serializes writers across processes, and the in-memory copy
+    of IDs and metadata is only changed once that transaction has committed.
+    A process that sees a newer ``generation`` on disk reloads its copy.
+    """
+
+    def __init__(self, path: str, dim: int = 1536, initial_capacity: int = 1024) -> None:
+        self.path = path
+        self.dim = dim
+        self.generation = 0
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._vectors = _VectorFile(os.path.join(path, "vectors.f32"))
+        self._entries = _Entries()
+        self._db = sqlite3.connect(
+            os.path.join(path, "meta.sqlite3"),
+            check_same_thread=False, isolation_level=None, timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " id TEXT PRIMARY KEY, row INTEGER NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            if not self._db.execute("SELECT 1 FROM state").fetchone():
+                self._init_state(initial_capacity)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries.ids)
+
+    def _init_state(self, capacity: int) -> None:
+        """Create the state of a new index, importing a pre-SQLite meta.json if present."""
+        generation = 0
+        legacy = os.path.join(self.path, "meta.json")
+        if os.path.exists(legacy):
+            with open(legacy, encoding="utf-8") as f:
+                old = json.load(f)
+            self.dim = old["dim"]
+            capacity = old["capacity"]
+            generation = old.get("generation", 0)
+            self._db.executemany(
+                "INSERT INTO vectors (id, row, metadata) VALUES (?, ?, ?)",
+                ((vid, row, json.dumps(meta))
+                 for row, (vid, meta) in enumerate(zip(old["ids"], old["metadata"]))),
+            )
+        self._db.executemany(
+            "INSERT INTO state (key, value) VALUES (?, ?)",
+            [("dim", self.dim), ("capacity", capacity), ("generation", generation)],
+        )
+        self._vectors.create(capacity, self.dim)
+
+    def _state(self) -> Dict[str, int]:
+        return dict(self._db.execute("SELECT key, value FROM state").fetchall())
+
+    def _load(self) -> None:
+        """Rebuild the in-memory copy (IDs, metadata, norms, memmap) from disk."""
+        state = self._state()
+        self.dim = state["dim"]
+        self.generation = state["generation"]
+        rows = self._db.execute("SELECT id, metadata FROM vectors ORDER BY row").fetchall()
+        ids = [vid for vid, _ in rows]
+        self._entries = _Entries(
+            ids, [json.loads(meta) for _, meta in rows], {vid: row for row, vid in enumerate(ids)}
+        )
+        self._vectors.open(state["capacity"], self.dim, len(ids))
+
+    def _sync(self) -> None:
+        """Reload if another process wrote since we last looked."""
+        row = self._db.execute(
+            "SELECT value FROM state WHERE key = 'generation'"
+        ).fetchone()
+        if row[0] != self.generation:
+            self._load()
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """
+        One write transaction. The body writes the vectors table, then the
+        matrix; on success the matrix is flushed, the generation bumped and
+        the transaction committed, on failure it is rolled back and the
+        in-memory copy reloaded.
+        """
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._sync()
+            yield
+            self._vectors.matrix.flush()
+            self._db.execute(
+                "UPDATE state SET value = ? WHERE key = 'capacity'", (self._vectors.capacity,)
+            )
+            self._db.execute("UPDATE state SET value = value + 1 WHERE key = 'generation'")
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            self._load()
+            raise
+        self.generation += 1
+
+    def _values(self, vid: str, values: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(values, dtype=np.float32)
+        if vec.shape != (self.dim,):
+            raise ValueError(f"Vector {vid} has dimension {vec.size}, expected {self.dim}")
+        return vec
+
+    def upsert(self, vectors: Iterable[Any], namespace: Optional[str] = None,
+               **_: Any) -> Dict[str, int]:
+        del namespace
+        items = [_as_vector_dict(v) for v in vectors]
+        with self._lock:
+            # Validate everything before anything is written.
+            latest = {
+                item["id"]: (self._values(item["id"], item["values"]),
+                             dict(item.get("metadata") or {}))
+                for item in items
+            }
+            with self._write():
+                entries = self._entries
+                placed: Dict[str, int] = {}
+                added: List[str] = []
+                for vid in latest:
+                    row = entries.rows.get(vid)
+                    if row is None:
+                        row = len(entries.ids) + len(added)
+                        added.append(vid)
+                    placed[vid] = row
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO vectors (id, row, metadata) VALUES (?, ?, ?)",
+                    ((vid, placed[vid], json.dumps(meta))
+                     for vid, (_, meta) in latest.items()),
+                )
+                self._vectors.grow(len(entries.ids) + len(added))
+                for vid, (values, _) in latest.items():
+                    self._vectors.matrix[placed[vid]] = values
+            for vid in added:
+                entries.rows[vid] = len(entries.ids)
+                entries.ids.append(vid)
+                entries.metadata.append({})
+            for vid, (values, meta) in latest.items():
+                row = placed[vid]
+                self._vectors.norms[row] = np.linalg.norm(values)
+                entries.metadata[row] = meta
+        return {"upserted_count": len(items)}
+
+    def update(
+        self,
+        id: str,  # pylint: disable=redefined-builtin
+        values: Optional[Sequence[float]] = None,
+        set_metadata: Optional[Dict[str, Any]] = None,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._sync()
+            if id not in self._entries.rows:
+                return {}
+            vec = self._values(id, values) if values is not None else None
+            with self._write():
+                # _write may have reloaded after another process's write.
+                row = self._entries.rows.get(id)
+                if row is None:
+                    return {}
+                metadata = {**self._entries.metadata[row], **(set_metadata or {})}
+                self._db.execute(
+                    "UPDATE vectors SET metadata = ? WHERE id = ?", (json.dumps(metadata), id)
+                )
+                if vec is not None:
+                    self._vectors.matrix[row] = vec
+            if vec is not None:
+                self._vectors.norms[row] = np.linalg.norm(vec)
+            self._entries.metadata[row] = metadata
+        return {}
+
+    def fetch(self, ids: Sequence[str], namespace: Optional[str] = None,
+              **_: Any) -> Dict[str, Any]:
+        del namespace
+        with self._lock:
+            self._sync()
+            vectors = {}
+            for vid in ids:
+                row = self._entries.rows.get(vid)
+                if row is not None:
+                    vectors[vid] = {
+                        "id": vid,
+                        "values": self._vectors.matrix[row].tolist(),
+                        "metadata": dict(self._entries.metadata[row]),
+                    }
+        return {"vectors": vectors}
+
+    def _candidate_rows(self, flt: Optional[Dict[str, Any]]) -> np.ndarray:
+        metadata = self._entries.metadata
+        if not flt:
+            return np.arange(len(metadata))
+        return np.fromiter(
+            (row for row, meta in enumerate(metadata) if matches_filter(meta, flt)),
+            dtype=np.int64,
+        )
+
+    def _top_rows(self, rows: np.ndarray, query_vec: np.ndarray,
+                  top_k: int) -> List[Tuple[int, float]]:
+        """(row, cosine score) of the ``top_k`` best ``rows``, best first."""
+        norms = self._vectors.norms[rows]
+        norms[norms == 0] = 1.0
+        query_norm = float(np.linalg.norm(query_vec)) or 1.0
+        scores = (self._vectors.matrix[rows] @ query_vec) / (norms * query_norm)
+        k = min(top_k, rows.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def query(
+        self,
+        *,
+        vector: Sequence[float],
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: Optional[Dict[str, Any]] = None,  # pylint: disable=redefined-builtin
+        namespace: Optional[str] = None,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        del namespace
+        query_vec = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._sync()
+            rows = self._candidate_rows(filter)
+            if rows.size == 0 or top_k <= 0:
+                return {"matches": []}
+            matches = []
+            for row, score in self._top_rows(rows, query_vec, top_k):
+                match: Dict[str, Any] = {"id": self._entries.ids[row], "score": score}
+                if include_metadata:
+                    match["metadata"] = dict(self._entries.metadata[row])
+                if include_values:
+                    match["values"] = self._vectors.matrix[row].tolist()
+                matches.append(match)
+        return {"matches": matches}
+
+    def _delete_targets(self, ids: Optional[Sequence[str]], delete_all: bool,
+                        flt: Optional[Dict[str, Any]]) -> List[str]:
+        entries = self._entries
+        if delete_all:
+            return list(entries.ids)
+        if flt:
+            return [vid for vid, meta in zip(entries.ids, entries.metadata)
+                    if matches_filter(meta, flt)]
+        return list(ids or [])
+
+    def delete(self, ids: Optional[Sequence[str]] = None, delete_all: bool = False,
+               filter: Optional[Dict[str, Any]] = None,  # pylint: disable=redefined-builtin
+               namespace: Optional[str] = None, **_: Any) -> Dict[str, Any]:
+        del namespace
+        with self._lock:
+            with self._write():
+                # Plan the swaps on a copy; the in-memory entries change after commit.
+                entries = self._entries.copy()
+                copies: List[Tuple[int, int]] = []  # (to row, from row), in order
+                moved: Dict[str, int] = {}
+                removed: List[str] = []
+                for vid in self._delete_targets(ids, delete_all, filter):
+                    if vid not in entries.rows:
+                        continue
+                    copy = entries.remove(vid)
+                    moved.pop(vid, None)
+                    if copy is not None:
+                        copies.append(copy)
+                        moved[entries.ids[copy[0]]] = copy[0]
+                    removed.append(vid)
+                self._db.executemany(
+                    "DELETE FROM vectors WHERE id = ?", ((vid,) for vid in removed)
+                )
+                self._db.executemany(
+                    "UPDATE vectors SET row = ? WHERE id = ?",
+                    ((row, vid) for vid, row in moved.items()),
+                )
+                for row, last in copies:
+                    self._vectors.matrix[row] = self._vectors.matrix[last]
+            for row in moved.values():
+                self._vectors.norms[row] = np.linalg.norm(self._vectors.matrix[row])
+            self._vectors.norms[len(entries.ids):len(self._entries.ids)] = 0.0
+            self._entries = entries
+        return {}
+
+    def describe_index_stats(self, **_: Any) -> Dict[str, Any]:
+        with self._lock:
+            self._sync()
+            return {
+                "dimension": self.dim,
+                "total_vector_count": len(self._entries.ids),
+                "generation": self.generation,
+            }